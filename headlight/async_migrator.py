@@ -0,0 +1,463 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import sys
+import time
+import typing
+from types import TracebackType
+
+from headlight.database import create_async_database
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    AppliedMigration,
+    AsyncDbDriver,
+    AsyncDummyTransaction,
+    DbDriver,
+    HistoryEntry,
+    MigrationStats,
+    StatementError,
+)
+from headlight.migrator import (
+    BaseMigrator,
+    LockRetry,
+    MigrateHooks,
+    Migration,
+    MigrationError,
+    MigrationProgress,
+    MigrationStatus,
+    RetryPolicy,
+    StatementBatch,
+    TransactionLockTimeout,
+)
+from headlight.profiler import Profiler
+from headlight.schema.ops import BackfillOp, CreateIndexOp, Operation
+from headlight.tracing import Tracer
+
+
+class AsyncMigrator(BaseMigrator):
+    def __init__(
+        self,
+        db: AsyncDbDriver,
+        directory: str,
+        table_name: str = "migrations",
+        batch_size: int = 1,
+        single_transaction: bool = False,
+        wait_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        lock_retry: RetryPolicy | None = None,
+        coalesce: bool = False,
+        migrations: list[Migration] | None = None,
+        profiler: Profiler | None = None,
+        tracer: Tracer | None = None,
+        rewrite_threshold: int | None = None,
+        refuse_rewrites: bool = False,
+        statement_timings: bool = False,
+    ) -> None:
+        super().__init__(
+            directory,
+            table_name,
+            batch_size=batch_size,
+            single_transaction=single_transaction,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=lock_retry,
+            coalesce=coalesce,
+            migrations=migrations,
+            profiler=profiler,
+            tracer=tracer,
+            rewrite_threshold=rewrite_threshold,
+            refuse_rewrites=refuse_rewrites,
+            statement_timings=statement_timings,
+        )
+        self.db = db
+
+    @property
+    def dialect(self) -> DbDriver:
+        return self.db.dialect
+
+    async def initialize_db(self) -> None:
+        if not await self.db.is_migrations_table_current(self.table):
+            await self.db.create_migrations_table(self.table)
+
+    async def ensure_migrations_table(self) -> None:
+        if not await self.db.is_migrations_table_current(self.table):
+            async with self.run_lock():
+                await self.initialize_db()
+
+    async def get_applied_migrations(self, limit: int | None = None) -> dict[str, AppliedMigration]:
+        return {am["revision"]: am for am in await self.db.get_applied_migrations(self.table, limit)}
+
+    async def get_pending_migrations(self) -> list[Migration]:
+        migrations = self.get_migrations()
+        missing = await self.db.get_missing_revisions(self.table, [migration.revision for migration in migrations])
+        return [migration for migration in migrations if migration.revision in missing]
+
+    async def is_up_to_date(self) -> bool:
+        revisions = [migration.revision for migration in self.get_migrations()]
+        if not revisions:
+            return True
+        return await self.db.count_applied_migrations(self.table, revisions) == len(revisions)
+
+    def run_lock(self) -> typing.AsyncContextManager[None]:
+        return self.db.advisory_lock(f"headlight:{self.table}", self.wait_timeout)
+
+    async def upgrade(
+        self,
+        *,
+        dry_run: bool = False,
+        fake: bool = False,
+        print_sql: bool = False,
+        hooks: MigrateHooks | None = None,
+    ) -> list[Migration]:
+        hooks = hooks or MigrateHooks()
+        try:
+            with self.tracer.span("headlight.upgrade", {"headlight.table": self.table}) as span:
+                async with self.run_lock():
+                    await self.initialize_db()
+                    pending = await self.get_pending_migrations()
+                    self.preload_migrations(pending)
+                    span.attributes["headlight.migrations"] = len(pending)
+                    if not fake:
+                        await self.check_rewrites(pending, hooks)
+
+                    for group in self.group_migrations(pending):
+                        await self.apply_migrations(group, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks)
+        finally:
+            hooks.after_run()
+        return pending
+
+    async def downgrade(
+        self,
+        *,
+        steps: int,
+        fake: bool = False,
+        dry_run: bool = False,
+        print_sql: bool = False,
+        hooks: MigrateHooks | None = None,
+    ) -> list[Migration]:
+        hooks = hooks or MigrateHooks()
+        try:
+            with self.tracer.span("headlight.downgrade", {"headlight.table": self.table}) as span:
+                async with self.run_lock():
+                    await self.initialize_db()
+                    applied = await self.get_applied_migrations(steps)
+                    pending = [migration for migration in self.get_migrations() if migration.revision in applied]
+                    pending = list(reversed(sorted(pending, key=lambda x: x.revision)))
+                    self.preload_migrations(pending)
+                    span.attributes["headlight.migrations"] = len(pending)
+
+                    for group in self.group_migrations(pending):
+                        await self.apply_migrations(
+                            group, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks, upgrade=False
+                        )
+        finally:
+            hooks.after_run()
+        return pending
+
+    async def check_rewrites(self, migrations: list[Migration], hooks: MigrateHooks) -> None:
+        if self.rewrite_threshold is None:
+            return
+
+        for migration in migrations:
+            for op, stmt, table_name in self.get_rewrites(migration):
+                stats = await self.db.get_table_stats(table_name)
+                self.report_rewrite(migration, op, stmt, table_name, stats, hooks)
+
+    async def reset(self, hooks: MigrateHooks | None = None) -> list[Migration]:
+        return await self.downgrade(steps=999_999, hooks=hooks)
+
+    async def apply_migrations(
+        self,
+        migrations: list[Migration],
+        *,
+        fake: bool,
+        dry_run: bool,
+        upgrade: bool = True,
+        print_sql: bool = False,
+        hooks: MigrateHooks | None = None,
+        writer: typing.TextIO = sys.stderr,
+    ) -> None:
+        hooks = hooks or MigrateHooks()
+        attempt = 0
+        retried_lock_wait: dict[str, float] = {}
+        while True:
+            try:
+                return await self.run_migrations(
+                    migrations,
+                    fake=fake,
+                    dry_run=dry_run,
+                    upgrade=upgrade,
+                    print_sql=print_sql and attempt == 0,
+                    hooks=hooks,
+                    writer=writer,
+                    attempt=attempt,
+                    retried_lock_wait=retried_lock_wait,
+                )
+            except LockRetry as retry:
+                attempt += 1
+                revision = retry.migration.revision
+                retried_lock_wait[revision] = retried_lock_wait.get(revision, 0.0) + retry.lock_wait
+                if self.profiler:
+                    self.profiler.add(retry.migration, "lock_wait", retry.lock_wait)
+                hooks.on_lock_retry(retry.migration, retry.stmt, attempt, retry.lock_wait)
+                await asyncio.sleep(retry.delay)
+
+    async def run_migrations(
+        self,
+        migrations: list[Migration],
+        *,
+        fake: bool,
+        dry_run: bool,
+        upgrade: bool,
+        print_sql: bool,
+        hooks: MigrateHooks,
+        writer: typing.TextIO,
+        attempt: int,
+        retried_lock_wait: dict[str, float],
+    ) -> None:
+        transactional = all(migration.transactional for migration in migrations)
+        tx = self.db.transaction() if transactional else AsyncDummyTransaction(self.db)
+        start_time = time.time()
+        migration = migrations[0]
+        stats: list[MigrationStats] = []
+        backfills: list[tuple[Migration, BackfillOp]] = []
+        progresses: list[MigrationProgress] = []
+        try:
+            async with tx:
+                for migration in migrations:
+                    with self.tracer.span("headlight.migration", self.get_migration_attributes(migration)):
+                        start_time = time.time()
+                        lock_wait = 0.0
+                        hooks.before_migrate(migration)
+                        with self.profile(migration, "compile"):
+                            statements = self.compile_migration(migration, upgrade=upgrade)
+                        if print_sql:
+                            self.write_sql(writer, migration, statements)
+
+                        execute_start_time = time.time()
+                        if not dry_run and not fake:
+                            groups = self.get_transaction_groups(statements, transactional=transactional)
+                            backfills.extend(
+                                (migration, op) for group, _ in groups for op, _ in group if isinstance(op, BackfillOp)
+                            )
+                            progress = self.get_progress(
+                                migration, groups, transactional=transactional, upgrade=upgrade
+                            )
+                            if progress:
+                                progresses.append(progress)
+                                await self.load_progress(progress)
+                                groups = self.skip_committed(groups, progress.committed)
+                            for group, suspends in groups:
+                                if progress and suspends:
+                                    await self.save_progress(progress)
+                                async with tx.suspended() if suspends else contextlib.nullcontext():
+                                    lock_wait += await self.execute_statements(
+                                        migration,
+                                        group,
+                                        transactional=transactional and not suspends,
+                                        hooks=hooks,
+                                        progress=progress,
+                                    )
+
+                        if self.profiler:
+                            self.profiler.add(migration, "lock_wait", lock_wait)
+                            self.profiler.add(migration, "execute", time.time() - execute_start_time - lock_wait)
+
+                        time_taken = time.time() - start_time
+                        hooks.after_migrate(migration, time_taken)
+                        lock_wait += retried_lock_wait.get(migration.revision, 0.0)
+                        stats.append(self.get_stats(migration, statements, time_taken, lock_wait, fake=fake))
+
+                if not dry_run:
+                    with self.profile(migrations[-1], "history"):
+                        if upgrade:
+                            await self.db.add_applied_migrations(
+                                self.table, [(m.revision, m.name) for m in migrations], stats
+                            )
+                            for m, op in backfills:
+                                await self.db.clear_backfill_position(self.backfill_table, m.revision, op.name)
+                        else:
+                            await self.db.remove_applied_migrations(self.table, [m.revision for m in migrations])
+                        for progress in progresses:
+                            await self.db.clear_backfill_position(self.backfill_table, progress.revision, progress.name)
+                commit_start_time = time.time()
+
+            if self.profiler:
+                self.profiler.add(migrations[-1], "commit", time.time() - commit_start_time)
+        except Exception as ex:
+            retry = self.get_lock_retry(migration, ex, attempt)
+            if retry:
+                raise retry from ex
+            time_taken = time.time() - start_time
+            hooks.on_error(migration, ex, time_taken)
+            raise MigrationError(str(ex), migration, ex.stmt if isinstance(ex, StatementError) else "") from ex
+
+    async def execute_statements(
+        self,
+        migration: Migration,
+        statements: list[tuple[Operation, str]],
+        *,
+        transactional: bool,
+        hooks: MigrateHooks,
+        progress: MigrationProgress | None = None,
+    ) -> float:
+        uses_lock_timeout = False
+        lock_wait = 0.0
+        try:
+            for batch in self.plan_batches(migration, statements, transactional=transactional):
+                uses_lock_timeout = uses_lock_timeout or batch.lock_timeout is not None
+                lock_wait += await self.execute_batch(migration, batch, hooks=hooks)
+                if progress:
+                    progress.committed += len(batch.statements)
+                    if not transactional:
+                        await self.save_progress(progress)
+        except Exception:
+            if uses_lock_timeout and not transactional:
+                await self.db.execute(self.dialect.reset_lock_timeout_template)
+            raise
+
+        if uses_lock_timeout:
+            await self.db.execute(self.dialect.reset_lock_timeout_template)
+        return lock_wait
+
+    async def execute_batch(self, migration: Migration, batch: StatementBatch, *, hooks: MigrateHooks) -> float:
+        await self.drop_invalid_indexes([op for op, _ in batch.statements])
+        for stmt in batch.setup:
+            await self.db.execute(stmt)
+        for op, stmt in batch.statements:
+            hooks.before_statement(migration, op, stmt)
+
+        total_lock_wait = 0.0
+        attempt = 0
+        batch_start_time = time.time()
+        with self.tracer.span("headlight.statement", {"db.statement": BATCH_SEPARATOR.join(batch.stmts)}) as span:
+            while True:
+                start_time = time.time()
+                attempt_span = self.tracer.start_span("headlight.execute", {"headlight.attempt": attempt + 1})
+                try:
+                    if batch.backfill:
+                        rowcount = await self.run_backfill(migration, batch.backfill, hooks=hooks)
+                    else:
+                        await self.db.execute_many(batch.get_sql())
+                        rowcount = batch.get_rowcount(self.db.rowcount)
+                    self.tracer.end_span(attempt_span)
+                    span.attributes["headlight.rowcount"] = rowcount
+
+                    elapsed = time.time() - batch_start_time
+                    for op, stmt in batch.statements:
+                        hooks.after_statement(migration, op, stmt, elapsed, rowcount)
+                    return total_lock_wait
+                except StatementError as ex:
+                    await self.drop_invalid_indexes([op for op, _ in batch.statements])
+                    lock_timeout = self.db.is_lock_timeout(ex)
+                    delay = self.get_retry_delay(attempt + 1, lock_timeout)
+                    if lock_timeout:
+                        attempt_span.name = "headlight.lock_wait"
+                    self.tracer.end_span(attempt_span, ex)
+                    lock_wait = time.time() - start_time
+                    if batch.transactional and lock_timeout:
+                        raise TransactionLockTimeout(str(ex), ex.stmt, total_lock_wait + lock_wait) from ex
+                    if delay is None:
+                        raise
+
+                    total_lock_wait += lock_wait
+                    attempt += 1
+                    hooks.on_lock_retry(migration, ex.stmt, attempt, lock_wait)
+                    await asyncio.sleep(delay)
+
+    async def load_progress(self, progress: MigrationProgress) -> None:
+        await self.db.create_backfill_table(self.backfill_table)
+        position = await self.db.get_backfill_position(self.backfill_table, progress.revision, progress.name)
+        progress.committed = int(position or 0)
+
+    async def save_progress(self, progress: MigrationProgress) -> None:
+        await self.db.save_backfill_position(
+            self.backfill_table, progress.revision, progress.name, str(progress.committed)
+        )
+
+    async def run_backfill(self, migration: Migration, op: BackfillOp, *, hooks: MigrateHooks) -> int:
+        progress_table = self.backfill_table
+        await self.db.create_backfill_table(progress_table)
+        position = await self.db.get_backfill_position(progress_table, migration.revision, op.name)
+
+        rows = 0
+        start_time = time.time()
+        while True:
+            position, count = await self.db.run_backfill_batch(op, progress_table, migration.revision, position)
+            if position is None:
+                break
+
+            rows += count
+            hooks.on_backfill_progress(migration, op, rows, rows / max(time.time() - start_time, 1e-6))
+            if op.sleep:
+                await asyncio.sleep(op.sleep)
+        return rows
+
+    async def drop_invalid_indexes(self, ops: list[Operation]) -> None:
+        for op in ops:
+            if isinstance(op, CreateIndexOp) and op.concurrently:
+                await self.db.drop_invalid_index(op.index.name)
+
+    async def get_history(self, slowest: bool = False, limit: int | None = None) -> list[HistoryEntry]:
+        return await self.db.get_history(self.table, slowest=slowest, limit=limit)
+
+    async def status(self) -> list[MigrationStatus]:
+        applied = await self.get_applied_migrations()
+        return [
+            MigrationStatus(
+                name=migration.name,
+                filename=migration.file,
+                revision=migration.revision,
+                applied=migration.revision in applied,
+            )
+            for migration in self.get_migrations()
+        ]
+
+    async def close(self) -> None:
+        await self.db.close()
+
+    async def __aenter__(self) -> AsyncMigrator:
+        return self
+
+    async def __aexit__(self, exc_type: typing.Type[Exception], exc: BaseException, tb: TracebackType) -> None:
+        await self.close()
+
+    @classmethod
+    async def new(
+        cls,
+        database_url: str,
+        directory: str = "migrations",
+        table_name: str = "migrations",
+        batch_size: int = 1,
+        single_transaction: bool = False,
+        wait_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        lock_retry: RetryPolicy | None = None,
+        coalesce: bool = False,
+        migrations: list[Migration] | None = None,
+        profiler: Profiler | None = None,
+        tracer: Tracer | None = None,
+        rewrite_threshold: int | None = None,
+        refuse_rewrites: bool = False,
+        statement_timings: bool = False,
+    ) -> AsyncMigrator:
+        migrator = AsyncMigrator(
+            db=await create_async_database(database_url),
+            directory=directory,
+            table_name=table_name,
+            batch_size=batch_size,
+            single_transaction=single_transaction,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=lock_retry,
+            coalesce=coalesce,
+            migrations=migrations,
+            profiler=profiler,
+            tracer=tracer,
+            rewrite_threshold=rewrite_threshold,
+            refuse_rewrites=refuse_rewrites,
+            statement_timings=statement_timings,
+        )
+        await migrator.ensure_migrations_table()
+        return migrator
@@ -6,7 +6,27 @@ import tomlkit
 import traceback
 import typing
 
-from headlight.migrator import MigrateHooks, Migration, MigrationError, Migrator, create_migration_template
+from headlight.drivers.base import BlockingSession, LockTimeoutError, LockWait, Progress, TableStats
+from headlight.metrics import PrometheusHooks
+from headlight.migrator import (
+    CompositeHooks,
+    DatabaseResult,
+    MigrateHooks,
+    Migration,
+    MigrationError,
+    MigrationStatus,
+    Migrator,
+    MultiMigrator,
+    RetryPolicy,
+    SchemaResult,
+    TenantMigrator,
+    create_migration_template,
+)
+from headlight.monitor import LockWatchdogPolicy
+from headlight.planner import Planner, PlanStep
+from headlight.profiler import Profiler
+from headlight.schema.ops import BackfillOp, Operation
+from headlight.tracing import JsonLinesExporter, Tracer
 from headlight.utils import colorize_sql
 
 database_help = "Database connection URL."
@@ -18,11 +38,159 @@ fake_help = "Write history table records without running any SQL command."
 print_help = "Print generated SQL to stderr."
 migration_name_help = "The name of the migration."
 yes_help = "Automatically confirm action."
+single_transaction_help = "Run all pending transactional migrations in one transaction."
+wait_timeout_help = "Seconds to wait for concurrent migration runs to finish (waits forever by default)."
+lock_timeout_help = "Seconds a statement may wait for a lock before it fails."
+lock_retries_help = (
+    "How many times to retry statements that failed to acquire a lock, "
+    "inside a transaction the whole transaction is rolled back and retried."
+)
+coalesce_help = "Merge consecutive ALTER TABLE operations on the same table into one statement."
+batch_size_help = "The number of statements sent to the database in one round trip (0 - the whole migration)."
+databases_help = "Database connection URL, repeat to run on several databases in parallel."
+concurrency_help = "The number of databases migrated at the same time."
+continue_on_error_help = "Continue with other databases (or schemas) when one of them fails."
+schema_help = "Migrate this schema of the database, repeat to migrate several tenant schemas."
+schema_pattern_help = "Migrate all schemas which names match this LIKE pattern."
+shared_schema_help = "Also resolve names in this schema after the tenant one (for extensions), repeat for several."
+slowest_help = "Order history by migration duration, the slowest first."
+limit_help = "Show at most this number of history entries."
+timings_help = "Print the slowest statements at the end of the run (statements are sent one by one then)."
+profile_help = "Record the time spent in every phase of each migration and write the report to this JSON file."
+trace_help = "Append OpenTelemetry compatible spans of the run to this JSON lines file."
+progress_help = "Show the progress of long running statements (index builds, table rewrites), uses one more connection."
+report_blockers_help = "Report sessions that block migration statements, and sessions queued behind them."
+abort_blocked_after_help = "Abort the migration when a statement waits for a lock longer than this number of seconds."
+terminate_idle_blockers_after_help = (
+    "Terminate blocking sessions that are idle in transaction, "
+    "once a statement waits for a lock longer than this number of seconds."
+)
+metrics_help = "Write Prometheus metrics of the run to this file (for the node_exporter textfile collector)."
+rewrite_threshold_help = "Warn about statements that rewrite tables larger than this number of megabytes."
+refuse_rewrites_help = "Refuse to run migrations that rewrite tables larger than --rewrite-threshold."
+fail_on_help = "Exit with an error when a statement has this blocking risk or a higher one."
+profile_python_help = "Also capture cProfile stats and the memory peak of the Python phases (requires --profile)."
 
 DATABASE_ENVVAR = "HL_DATABASE_URL"
+PROGRESS_INTERVAL = 2.0
+RISKS = ["none", "low", "medium", "high"]
+RISK_COLORS = {"none": "green", "low": "green", "medium": "yellow", "high": "red", "unknown": "magenta"}
+
+
+def create_profiler(profile: str | None, profile_python: bool) -> Profiler | None:
+    if profile_python and not profile:
+        raise click.UsageError("--profile-python requires --profile.")
+    return Profiler(profile, python=profile_python) if profile else None
+
+
+def with_metrics(hooks: MigrateHooks, metrics: str | None, database_url: str, direction: str) -> MigrateHooks:
+    if not metrics:
+        return hooks
+    _, db_name = parse_db_info(database_url)
+    return CompositeHooks(hooks, PrometheusHooks(metrics, db_name.partition("?")[0], direction))
+
+
+def create_lock_watchdog(
+    report_blockers: bool, abort_blocked_after: float | None, terminate_idle_blockers_after: float | None
+) -> LockWatchdogPolicy | None:
+    if not report_blockers and abort_blocked_after is None and terminate_idle_blockers_after is None:
+        return None
+    return LockWatchdogPolicy(
+        abort_after=abort_blocked_after,
+        terminate_idle_blockers_after=terminate_idle_blockers_after,
+    )
+
+
+def format_session(session: BlockingSession) -> str:
+    details = [f"pid {session.pid}", session.state or "unknown state"]
+    if session.user:
+        details.append(f"user {session.user}")
+    if session.application:
+        details.append(session.application)
+    if session.transaction_age is not None:
+        details.append(f"in transaction for {format_duration(session.transaction_age)}")
+    return ", ".join(details) + (f": {shorten_sql(session.query)}" if session.query else "")
+
+
+def create_tracer(trace: str | None) -> Tracer | None:
+    return Tracer(JsonLinesExporter(trace)) if trace else None
+
+
+@contextlib.contextmanager
+def write_profile(profiler: Profiler | None) -> typing.Iterator[None]:
+    try:
+        yield
+    finally:
+        if profiler and profiler.write_report():
+            totals = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in profiler.get_totals().items())
+            click.secho(f"Profile written to {profiler.report_path} ({totals}).", fg="cyan", err=True)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def format_progress(progress: Progress) -> str:
+    parts = [progress.phase or "running"]
+    if progress.fraction is not None:
+        parts.append(f"{progress.fraction:.0%}")
+    if progress.blocks_total:
+        parts.append(f"{progress.blocks_done}/{progress.blocks_total} blocks")
+    if progress.tuples_done:
+        parts.append(f"{progress.tuples_done} tuples")
+    if progress.wait_event:
+        parts.append(f"waiting for {progress.wait_event}")
+    parts.append(f"elapsed {format_duration(progress.elapsed)}")
+    if progress.eta is not None:
+        parts.append(f"ETA {format_duration(progress.eta)}")
+    return ", ".join(parts)
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "kB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_plan_step(step: PlanStep) -> str:
+    impact = step.impact
+    details: list[str] = [impact.table_effect] if impact.table_effect != "none" else []
+    if step.stats is not None:
+        rows = "? rows" if step.stats.rows is None else f"{step.stats.rows:.0f} rows"
+        details.append(f"{rows}, {format_size(step.stats.size)}")
+    if step.estimate:
+        details.append(f"~{format_duration(step.estimate)}")
+    if impact.blocks_reads and step.lock_timeout is None:
+        details.append(click.style("no lock timeout", fg="yellow"))
+    return "{risk} {lock}{table}{details} {stmt}".format(
+        risk=click.style(step.risk.rjust(8, " "), fg=RISK_COLORS[step.risk]),
+        lock=impact.lock_level or "unknown lock",
+        table=f" on {impact.table_name}" if impact.table_name else "",
+        details=f" ({'; '.join(details)})" if details else "",
+        stmt=shorten_sql(step.stmt),
+    )
+
+
+def shorten_sql(stmt: str, width: int = 80) -> str:
+    stmt = " ".join(stmt.split())
+    return stmt if len(stmt) <= width else stmt[: width - 3] + "..."
 
 
 class LoggingHooks(MigrateHooks):
+    def __init__(self, timings: bool = False, slowest_count: int = 10) -> None:
+        self.timings = timings
+        self.slowest_count = slowest_count
+        self.statement_timings: list[tuple[float, Migration, str, int]] = []
+        self.reported_blockers: list[int] = []
+
     def before_migrate(self, migration: Migration) -> None:
         click.secho(
             "{status} {filename}".format(
@@ -50,6 +218,103 @@ class LoggingHooks(MigrateHooks):
             )
         )
 
+    def on_backfill_progress(self, migration: Migration, op: BackfillOp, rows: int, rows_per_second: float) -> None:
+        click.secho(
+            "\r{status} {filename} {progress}".format(
+                status=click.style("Backfill".ljust(10, " "), fg="yellow"),
+                progress=click.style(f"({op.table_name}: {rows} rows, {rows_per_second:.0f} rows/s)", fg="cyan"),
+                filename=os.path.basename(migration.file),
+            ),
+            nl=False,
+        )
+
+    def on_lock_retry(self, migration: Migration, stmt: str, attempt: int, lock_wait: float) -> None:
+        click.secho(
+            "\r{status} {filename} {time}".format(
+                status=click.style("Retry".ljust(10, " "), fg="magenta"),
+                time=click.style(f"(attempt {attempt}, waited for lock {lock_wait:.3f}s)", fg="cyan"),
+                filename=os.path.basename(migration.file),
+            )
+        )
+
+    def on_progress(self, migration: Migration, progress: Progress) -> None:
+        click.secho(
+            "\r{status} {filename} {progress}".format(
+                status=click.style("Progress".ljust(10, " "), fg="yellow"),
+                progress=click.style(f"({format_progress(progress)})", fg="cyan"),
+                filename=os.path.basename(migration.file),
+            ),
+            nl=False,
+        )
+
+    def on_table_rewrite(self, migration: Migration, op: Operation, stmt: str, stats: TableStats) -> None:
+        click.secho(
+            "{status} {filename} {details} {stmt}".format(
+                status=click.style("Rewrite".ljust(10, " "), fg="yellow"),
+                details=click.style(f"({format_size(stats.size)} table)", fg="cyan"),
+                filename=os.path.basename(migration.file),
+                stmt=shorten_sql(stmt),
+            )
+        )
+
+    def on_lock_wait(self, migration: Migration, lock_wait: LockWait) -> None:
+        click.secho(
+            "\r{status} {filename} {details}".format(
+                status=click.style("Blocked".ljust(10, " "), fg="magenta"),
+                details=click.style(
+                    "(waiting {waited} for {lock}, {count} session(s) queued behind)".format(
+                        waited=format_duration(lock_wait.waited),
+                        lock=lock_wait.lock or "a lock",
+                        count=len(lock_wait.waiters),
+                    ),
+                    fg="cyan",
+                ),
+                filename=os.path.basename(migration.file),
+            ),
+            nl=False,
+        )
+        # the status line is updated in place, blockers are listed again only when they change
+        blocker_pids = [blocker.pid for blocker in lock_wait.blockers]
+        if blocker_pids == self.reported_blockers and not lock_wait.action:
+            return
+
+        self.reported_blockers = blocker_pids
+        click.echo()
+        for blocker in lock_wait.blockers:
+            click.secho(f"{'':10} blocked by {format_session(blocker)}")
+        if lock_wait.action:
+            click.secho(f"{'':10} {lock_wait.action}", fg="red")
+
+    def on_monitor_error(self, migration: Migration, exc: Exception) -> None:
+        click.secho(
+            "\n{status} {filename} {details}".format(
+                status=click.style("Warning".ljust(10, " "), fg="red"),
+                details=click.style(f"(monitoring failed: {exc})", fg="cyan"),
+                filename=os.path.basename(migration.file),
+            ),
+            err=True,
+        )
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        if self.timings:
+            self.statement_timings.append((elapsed, migration, stmt, rowcount))
+
+    def print_timings(self) -> None:
+        if not self.statement_timings:
+            return
+
+        click.secho("Slowest statements:", bold=True)
+        slowest = sorted(self.statement_timings, key=lambda timing: timing[0], reverse=True)
+        for elapsed, migration, stmt, rowcount in slowest[: self.slowest_count]:
+            click.secho(
+                "{time} {filename} {stmt}{rows}".format(
+                    time=click.style(f"{elapsed:.3f}s".rjust(10, " "), fg="cyan"),
+                    filename=os.path.basename(migration.file),
+                    stmt=shorten_sql(stmt),
+                    rows=click.style(f" ({rowcount} rows)", fg="cyan") if rowcount >= 0 else "",
+                )
+            )
+
 
 @contextlib.contextmanager
 def catch_errors(verbose: bool) -> typing.Iterator[None]:
@@ -63,6 +328,68 @@ def catch_errors(verbose: bool) -> typing.Iterator[None]:
         click.secho(f"Error: {ex}", fg="red")
         click.echo("Statement, that caused error:")
         click.echo(colorize_sql(ex.stmt))
+    except LockTimeoutError as ex:
+        if verbose:
+            traceback.print_exception(ex)
+        click.secho(f"Error: {ex}", fg="red")
+
+
+def format_seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def format_fleet_status(history: list[MigrationStatus] | None) -> str:
+    if history is None:
+        return ""
+    applied = [migration for migration in history if migration.applied]
+    pending_count = len(history) - len(applied)
+    return "{applied} applied, {pending} pending, at {revision}".format(
+        applied=len(applied),
+        pending=click.style(str(pending_count), fg="yellow" if pending_count else "green"),
+        revision=applied[-1].revision if applied else "-",
+    )
+
+
+def print_summary(rows: list[tuple[DatabaseResult[typing.Any], str]], verbose: bool) -> None:
+    width = max(len(parse_db_info(result.database_url)[1]) for result, _ in rows)
+    for result, details in rows:
+        _, db_name = parse_db_info(result.database_url)
+        if result.error is not None:
+            status, details = click.style("Fail".ljust(10, " "), fg="red"), click.style(str(result.error), fg="red")
+        elif result.skipped:
+            status = click.style("Skipped".ljust(10, " "), fg="yellow")
+        else:
+            status = click.style("Done".ljust(10, " "), fg="green")
+
+        click.secho(
+            "{status} {db} {time} {details}".format(
+                status=status,
+                db=db_name.ljust(width, " "),
+                time=click.style(f"({result.time_taken:.3f}s)", fg="cyan"),
+                details=details,
+            ).rstrip()
+        )
+        if verbose and result.error is not None:
+            traceback.print_exception(result.error)
+
+
+def print_schema_progress(result: SchemaResult[typing.Any], completed: int, total: int, details: str = "") -> None:
+    if result.error is not None:
+        status, details = click.style("Fail".ljust(10, " "), fg="red"), click.style(str(result.error), fg="red")
+    elif isinstance(result.result, list) and not details:
+        status, details = click.style("Done".ljust(10, " "), fg="green"), f"{len(result.result)} migration(s) applied"
+    else:
+        status = click.style("Done".ljust(10, " "), fg="green")
+
+    click.secho(
+        "{progress}{status} {schema} {time} {details}".format(
+            progress=click.style(f"[{completed}/{total}] ", fg="cyan") if total else "",
+            status=status,
+            schema=result.schema,
+            time=click.style(f"({result.time_taken:.3f}s)", fg="cyan"),
+            details=details,
+        ).rstrip()
+    )
 
 
 def parse_db_info(database_url: str) -> tuple[str, str]:
@@ -94,7 +421,15 @@ def app() -> None:
 
 
 @app.command()
-@click.option("-d", "--database", help=database_help, envvar=DATABASE_ENVVAR, required=True, default=default_db)
+@click.option(
+    "-d",
+    "--database",
+    help=databases_help,
+    envvar=DATABASE_ENVVAR,
+    required=True,
+    multiple=True,
+    default=[default_db] if default_db else None,
+)
 @click.option(
     "-m",
     "--migrations",
@@ -109,19 +444,144 @@ def app() -> None:
 @click.option("--fake", is_flag=True, default=False, help=fake_help)
 @click.option("--print-sql", is_flag=True, default=False, help=print_help)
 @click.option("--yes", "-y", is_flag=True, default=False, help=yes_help)
+@click.option("--batch-size", type=int, default=1, show_default=True, help=batch_size_help)
+@click.option("--wait-timeout", type=float, default=None, help=wait_timeout_help)
+@click.option("--lock-timeout", type=float, default=None, help=lock_timeout_help)
+@click.option("--lock-retries", type=int, default=0, show_default=True, help=lock_retries_help)
+@click.option("--coalesce", is_flag=True, default=False, help=coalesce_help)
+@click.option("--single-transaction", is_flag=True, default=False, help=single_transaction_help)
+@click.option("--concurrency", type=int, default=4, show_default=True, help=concurrency_help)
+@click.option("--continue-on-error", is_flag=True, default=False, help=continue_on_error_help)
+@click.option("--schema", multiple=True, help=schema_help)
+@click.option("--schema-pattern", default=None, help=schema_pattern_help)
+@click.option("--shared-schema", multiple=True, help=shared_schema_help)
+@click.option("--timings", is_flag=True, default=False, help=timings_help)
+@click.option("--profile", type=click.Path(dir_okay=False, writable=True), default=None, help=profile_help)
+@click.option("--profile-python", is_flag=True, default=False, help=profile_python_help)
+@click.option("--trace", type=click.Path(dir_okay=False, writable=True), default=None, help=trace_help)
+@click.option("--metrics", type=click.Path(dir_okay=False, writable=True), default=None, help=metrics_help)
+@click.option("--progress", is_flag=True, default=False, help=progress_help)
+@click.option("--report-blockers", is_flag=True, default=False, help=report_blockers_help)
+@click.option("--abort-blocked-after", type=float, default=None, help=abort_blocked_after_help)
+@click.option("--terminate-idle-blockers-after", type=float, default=None, help=terminate_idle_blockers_after_help)
+@click.option("--rewrite-threshold", type=float, default=None, help=rewrite_threshold_help)
+@click.option("--refuse-rewrites", is_flag=True, default=False, help=refuse_rewrites_help)
 @click.option("--verbose", is_flag=True, default=False)
 def upgrade(
     *,
-    database: str,
+    database: tuple[str, ...],
     migrations: str,
     table: str,
     fake: bool,
     dry_run: bool,
     print_sql: bool,
     yes: bool,
+    batch_size: int,
+    wait_timeout: float | None,
+    lock_timeout: float | None,
+    lock_retries: int,
+    coalesce: bool,
+    single_transaction: bool,
+    concurrency: int,
+    continue_on_error: bool,
+    schema: tuple[str, ...],
+    schema_pattern: str | None,
+    shared_schema: tuple[str, ...],
+    timings: bool,
+    profile: str | None,
+    profile_python: bool,
+    trace: str | None,
+    metrics: str | None,
+    progress: bool,
+    report_blockers: bool,
+    abort_blocked_after: float | None,
+    terminate_idle_blockers_after: float | None,
+    rewrite_threshold: float | None,
+    refuse_rewrites: bool,
     verbose: bool,
 ) -> None:
-    db_type, db_name = parse_db_info(database)
+    if refuse_rewrites and rewrite_threshold is None:
+        raise click.UsageError("--refuse-rewrites requires --rewrite-threshold.")
+    options: dict[str, typing.Any] = dict(
+        batch_size=batch_size,
+        single_transaction=single_transaction,
+        wait_timeout=wait_timeout,
+        lock_timeout=lock_timeout,
+        lock_retry=RetryPolicy(attempts=lock_retries) if lock_retries else None,
+        coalesce=coalesce,
+        tracer=create_tracer(trace),
+        rewrite_threshold=int(rewrite_threshold * 1024 * 1024) if rewrite_threshold is not None else None,
+        refuse_rewrites=refuse_rewrites,
+        statement_timings=timings or bool(metrics),
+    )
+    profiler = create_profiler(profile, profile_python)
+    if (profiler or metrics) and (schema or schema_pattern or len(database) > 1):
+        raise click.UsageError("--profile and --metrics can be used with a single database only.")
+
+    if schema or schema_pattern:
+        if len(database) > 1:
+            raise click.UsageError("Tenant schemas can be migrated in one database only.")
+
+        db_type, db_name = parse_db_info(database[0])
+        click.secho(
+            "Upgrade tenant schemas of {type} database {db}.".format(
+                db=click.style(db_name, fg="cyan"),
+                type=click.style(db_type, fg="green"),
+            )
+        )
+        if not yes:
+            click.confirm(
+                "Tenant schemas will be {action}. Continue?".format(action=click.style("upgraded", fg="yellow")),
+                show_default=True,
+                abort=True,
+            )
+
+        tenant_migrator = TenantMigrator(
+            database[0],
+            migrations,
+            schemas=list(schema),
+            schema_pattern=schema_pattern,
+            table_name=table,
+            concurrency=concurrency,
+            fail_fast=not continue_on_error,
+            shared_schemas=list(shared_schema),
+            options=options,
+        )
+        schema_results = tenant_migrator.upgrade(fake=fake, dry_run=dry_run, on_progress=print_schema_progress)
+        if any(result.error or result.skipped for result in schema_results):
+            raise SystemExit(1)
+        return
+
+    if len(database) > 1:
+        click.secho("Upgrade {count} databases.".format(count=click.style(str(len(database)), fg="cyan")))
+        if not yes:
+            click.confirm(
+                "Database schemas will be {action}. Continue?".format(action=click.style("upgraded", fg="yellow")),
+                show_default=True,
+                abort=True,
+            )
+
+        multi_migrator = MultiMigrator(
+            list(database),
+            migrations,
+            table,
+            concurrency=concurrency,
+            fail_fast=not continue_on_error,
+            options=options,
+        )
+        results = multi_migrator.upgrade(fake=fake, dry_run=dry_run, print_sql=print_sql)
+        print_summary(
+            [
+                (result, f"{len(result.result)} migration(s) applied" if result.result is not None else "")
+                for result in results
+            ],
+            verbose=verbose,
+        )
+        if any(result.error or result.skipped for result in results):
+            raise SystemExit(1)
+        return
+
+    db_type, db_name = parse_db_info(database[0])
     click.secho(
         "Upgrade {type} database {db}.".format(
             db=click.style(db_name, fg="cyan"),
@@ -129,7 +589,16 @@ def upgrade(
         )
     )
 
-    migrator = Migrator.new(database, migrations, table)
+    # progress is printed by the logging hooks of single database runs only
+    migrator = Migrator.new(
+        database[0],
+        migrations,
+        table,
+        profiler=profiler,
+        progress_interval=PROGRESS_INTERVAL if progress else None,
+        lock_watchdog=create_lock_watchdog(report_blockers, abort_blocked_after, terminate_idle_blockers_after),
+        **options,
+    )
     pending_count = len(migrator.get_pending_migrations())
     if not pending_count:
         return click.echo("No pending migration(s).")
@@ -143,8 +612,14 @@ def upgrade(
             abort=True,
         )
 
-    with catch_errors(verbose):
-        migrator.upgrade(fake=fake, dry_run=dry_run, print_sql=print_sql, hooks=LoggingHooks())
+    hooks = LoggingHooks(timings=timings)
+    with catch_errors(verbose), write_profile(profiler):
+        try:
+            run_hooks = with_metrics(hooks, metrics, database[0], "upgrade")
+            if not migrator.upgrade(fake=fake, dry_run=dry_run, print_sql=print_sql, hooks=run_hooks):
+                click.echo("Database is already up to date.")
+        finally:
+            hooks.print_timings()
 
 
 @app.command()
@@ -164,6 +639,20 @@ def upgrade(
 @click.option("--steps", type=int, default=1, help=revert_steps_help, show_default=True)
 @click.option("--print-sql", is_flag=True, default=False, help=print_help)
 @click.option("--yes", "-y", is_flag=True, default=False, help=yes_help)
+@click.option("--batch-size", type=int, default=1, show_default=True, help=batch_size_help)
+@click.option("--wait-timeout", type=float, default=None, help=wait_timeout_help)
+@click.option("--lock-timeout", type=float, default=None, help=lock_timeout_help)
+@click.option("--lock-retries", type=int, default=0, show_default=True, help=lock_retries_help)
+@click.option("--coalesce", is_flag=True, default=False, help=coalesce_help)
+@click.option("--timings", is_flag=True, default=False, help=timings_help)
+@click.option("--profile", type=click.Path(dir_okay=False, writable=True), default=None, help=profile_help)
+@click.option("--profile-python", is_flag=True, default=False, help=profile_python_help)
+@click.option("--trace", type=click.Path(dir_okay=False, writable=True), default=None, help=trace_help)
+@click.option("--metrics", type=click.Path(dir_okay=False, writable=True), default=None, help=metrics_help)
+@click.option("--progress", is_flag=True, default=False, help=progress_help)
+@click.option("--report-blockers", is_flag=True, default=False, help=report_blockers_help)
+@click.option("--abort-blocked-after", type=float, default=None, help=abort_blocked_after_help)
+@click.option("--terminate-idle-blockers-after", type=float, default=None, help=terminate_idle_blockers_after_help)
 @click.option("--verbose", is_flag=True, default=False)
 def downgrade(
     *,
@@ -175,6 +664,20 @@ def downgrade(
     print_sql: bool,
     yes: bool,
     steps: int,
+    batch_size: int,
+    wait_timeout: float | None,
+    lock_timeout: float | None,
+    lock_retries: int,
+    coalesce: bool,
+    timings: bool,
+    profile: str | None,
+    profile_python: bool,
+    trace: str | None,
+    metrics: str | None,
+    progress: bool,
+    report_blockers: bool,
+    abort_blocked_after: float | None,
+    terminate_idle_blockers_after: float | None,
     verbose: bool,
 ) -> None:
     db_type, db_name = parse_db_info(database)
@@ -195,9 +698,29 @@ def downgrade(
             abort=True,
         )
 
-    with catch_errors(verbose):
-        migrator = Migrator.new(database, migrations, table)
-        migrator.downgrade(dry_run=dry_run, fake=fake, steps=steps, print_sql=print_sql, hooks=LoggingHooks())
+    profiler = create_profiler(profile, profile_python)
+    with catch_errors(verbose), write_profile(profiler):
+        migrator = Migrator.new(
+            database,
+            migrations,
+            table,
+            batch_size=batch_size,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=RetryPolicy(attempts=lock_retries) if lock_retries else None,
+            coalesce=coalesce,
+            profiler=profiler,
+            tracer=create_tracer(trace),
+            progress_interval=PROGRESS_INTERVAL if progress else None,
+            lock_watchdog=create_lock_watchdog(report_blockers, abort_blocked_after, terminate_idle_blockers_after),
+            statement_timings=timings or bool(metrics),
+        )
+        hooks = LoggingHooks(timings=timings)
+        try:
+            run_hooks = with_metrics(hooks, metrics, database, "downgrade")
+            migrator.downgrade(dry_run=dry_run, fake=fake, steps=steps, print_sql=print_sql, hooks=run_hooks)
+        finally:
+            hooks.print_timings()
 
 
 @app.command()
@@ -213,6 +736,21 @@ def downgrade(
 )
 @click.option("--table", default=default_table, show_default=True, help=table_help, required=True)
 @click.option("--yes", "-y", is_flag=True, default=False, help=yes_help)
+@click.option("--batch-size", type=int, default=1, show_default=True, help=batch_size_help)
+@click.option("--wait-timeout", type=float, default=None, help=wait_timeout_help)
+@click.option("--lock-timeout", type=float, default=None, help=lock_timeout_help)
+@click.option("--lock-retries", type=int, default=0, show_default=True, help=lock_retries_help)
+@click.option("--coalesce", is_flag=True, default=False, help=coalesce_help)
+@click.option("--single-transaction", is_flag=True, default=False, help=single_transaction_help)
+@click.option("--timings", is_flag=True, default=False, help=timings_help)
+@click.option("--profile", type=click.Path(dir_okay=False, writable=True), default=None, help=profile_help)
+@click.option("--profile-python", is_flag=True, default=False, help=profile_python_help)
+@click.option("--trace", type=click.Path(dir_okay=False, writable=True), default=None, help=trace_help)
+@click.option("--metrics", type=click.Path(dir_okay=False, writable=True), default=None, help=metrics_help)
+@click.option("--progress", is_flag=True, default=False, help=progress_help)
+@click.option("--report-blockers", is_flag=True, default=False, help=report_blockers_help)
+@click.option("--abort-blocked-after", type=float, default=None, help=abort_blocked_after_help)
+@click.option("--terminate-idle-blockers-after", type=float, default=None, help=terminate_idle_blockers_after_help)
 @click.option("--verbose", is_flag=True, default=False)
 def reset(
     *,
@@ -220,6 +758,21 @@ def reset(
     migrations: str,
     table: str,
     yes: bool,
+    batch_size: int,
+    wait_timeout: float | None,
+    lock_timeout: float | None,
+    lock_retries: int,
+    coalesce: bool,
+    single_transaction: bool,
+    timings: bool,
+    profile: str | None,
+    profile_python: bool,
+    trace: str | None,
+    metrics: str | None,
+    progress: bool,
+    report_blockers: bool,
+    abort_blocked_after: float | None,
+    terminate_idle_blockers_after: float | None,
     verbose: bool,
 ) -> None:
     db_type, db_name = parse_db_info(database)
@@ -237,9 +790,29 @@ def reset(
             abort=True,
         )
 
-    with catch_errors(verbose):
-        migrator = Migrator.new(database, migrations, table)
-        migrator.reset(hooks=LoggingHooks())
+    profiler = create_profiler(profile, profile_python)
+    with catch_errors(verbose), write_profile(profiler):
+        migrator = Migrator.new(
+            database,
+            migrations,
+            table,
+            batch_size=batch_size,
+            single_transaction=single_transaction,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=RetryPolicy(attempts=lock_retries) if lock_retries else None,
+            coalesce=coalesce,
+            profiler=profiler,
+            tracer=create_tracer(trace),
+            progress_interval=PROGRESS_INTERVAL if progress else None,
+            lock_watchdog=create_lock_watchdog(report_blockers, abort_blocked_after, terminate_idle_blockers_after),
+            statement_timings=timings or bool(metrics),
+        )
+        hooks = LoggingHooks(timings=timings)
+        try:
+            migrator.reset(hooks=with_metrics(hooks, metrics, database, "downgrade"))
+        finally:
+            hooks.print_timings()
 
 
 @app.command
@@ -274,15 +847,54 @@ def new(
     help=migrations_help,
 )
 @click.option("--table", default=default_table, show_default=True, help=table_help, required=True)
-@click.option("-d", "--database", help=database_help, envvar=DATABASE_ENVVAR, required=True, default=default_db)
+@click.option(
+    "-d",
+    "--database",
+    help=databases_help,
+    envvar=DATABASE_ENVVAR,
+    required=True,
+    multiple=True,
+    default=[default_db] if default_db else None,
+)
+@click.option("--concurrency", type=int, default=4, show_default=True, help=concurrency_help)
+@click.option("--schema", multiple=True, help=schema_help)
+@click.option("--schema-pattern", default=None, help=schema_pattern_help)
+@click.option("--verbose", is_flag=True, default=False)
 def status(
     *,
-    database: str,
+    database: tuple[str, ...],
     migrations: str,
     table: str,
+    concurrency: int,
+    schema: tuple[str, ...],
+    schema_pattern: str | None,
+    verbose: bool,
 ) -> None:
     assert database
-    migrator = Migrator.new(database, migrations, table)
+    if schema or schema_pattern:
+        if len(database) > 1:
+            raise click.UsageError("Tenant schemas can be inspected in one database only.")
+
+        tenant_migrator = TenantMigrator(
+            database[0],
+            migrations,
+            schemas=list(schema),
+            schema_pattern=schema_pattern,
+            table_name=table,
+            concurrency=concurrency,
+        )
+        for result in tenant_migrator.status():
+            print_schema_progress(result, 0, 0, format_fleet_status(result.result))
+        return
+    if len(database) > 1:
+        multi_migrator = MultiMigrator(list(database), migrations, table, concurrency=concurrency, fail_fast=False)
+        results = multi_migrator.status()
+        print_summary([(result, format_fleet_status(result.result)) for result in results], verbose=verbose)
+        if any(result.error for result in results):
+            raise SystemExit(1)
+        return
+
+    migrator = Migrator.new(database[0], migrations, table)
     history = migrator.status()
     has_entries = False
 
@@ -301,6 +913,122 @@ def status(
         click.secho("No migration entries in history.")
 
 
+@app.command
+@click.option(
+    "-m",
+    "--migrations",
+    default=default_dir,
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+    show_default=True,
+    required=True,
+    help=migrations_help,
+)
+@click.option("--table", default=default_table, show_default=True, help=table_help, required=True)
+@click.option("-d", "--database", help=database_help, envvar=DATABASE_ENVVAR, required=True, default=default_db)
+@click.option("--slowest", is_flag=True, default=False, help=slowest_help)
+@click.option("--limit", type=int, default=None, help=limit_help)
+def history(
+    *,
+    database: str,
+    migrations: str,
+    table: str,
+    slowest: bool,
+    limit: int | None,
+) -> None:
+    with Migrator.new(database, migrations, table) as migrator:
+        entries = migrator.get_history(slowest=slowest, limit=limit)
+        checksums = {migration.revision: migrator.get_checksum(migration) for migration in migrator.get_migrations()}
+
+    if not entries:
+        click.secho("No migration entries in history.")
+        return
+
+    for entry in entries:
+        checksum = checksums.get(entry["revision"])
+        changed = entry["checksum"] is not None and checksum is not None and entry["checksum"] != checksum
+        click.secho(
+            "{revision} {name} {applied} {duration} {lock_wait} {statements} {applied_by}{changed}".format(
+                revision=click.style(entry["revision"], bold=True),
+                name=entry["name"],
+                applied=entry["applied"].strftime("%Y-%m-%d %H:%M:%S"),
+                duration=click.style(format_seconds(entry["duration"]), fg="cyan"),
+                lock_wait=click.style(f"(lock wait {format_seconds(entry['lock_wait'])})", fg="cyan"),
+                statements="-" if entry["statement_count"] is None else f"{entry['statement_count']} statement(s)",
+                applied_by=entry["applied_by"] or "-",
+                changed=click.style(" changed", fg="yellow") if changed else "",
+            )
+        )
+
+
+@app.command
+@click.option(
+    "-m",
+    "--migrations",
+    default=default_dir,
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+    show_default=True,
+    required=True,
+    help=migrations_help,
+)
+@click.option("--table", default=default_table, show_default=True, help=table_help, required=True)
+@click.option("-d", "--database", help=database_help, envvar=DATABASE_ENVVAR, required=True, default=default_db)
+@click.option("--lock-timeout", type=float, default=None, help=lock_timeout_help)
+@click.option("--coalesce", is_flag=True, default=False, help=coalesce_help)
+@click.option("--fail-on", type=click.Choice(["medium", "high"]), default=None, help=fail_on_help)
+def plan(
+    *,
+    database: str,
+    migrations: str,
+    table: str,
+    lock_timeout: float | None,
+    coalesce: bool,
+    fail_on: str | None,
+) -> None:
+    with Migrator.new(database, migrations, table, lock_timeout=lock_timeout, coalesce=coalesce) as migrator:
+        steps = Planner(migrator).plan()
+
+    if not steps:
+        click.secho("No pending migrations.", fg="green")
+        return
+
+    migration = None
+    for step in steps:
+        if step.migration is not migration:
+            migration = step.migration
+            click.secho(os.path.basename(migration.file), bold=True)
+        click.secho(format_plan_step(step))
+
+    # statements on tables without statistics are not counted, their risk is unknown
+    if fail_on and any(step.risk in RISKS and RISKS.index(step.risk) >= RISKS.index(fail_on) for step in steps):
+        raise SystemExit(1)
+
+
+@app.command
+@click.option(
+    "-m",
+    "--migrations",
+    default=default_dir,
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+    show_default=True,
+    required=True,
+    help=migrations_help,
+)
+@click.option("--table", default=default_table, show_default=True, help=table_help, required=True)
+@click.option("-d", "--database", help=database_help, envvar=DATABASE_ENVVAR, required=True, default=default_db)
+def check(
+    *,
+    database: str,
+    migrations: str,
+    table: str,
+) -> None:
+    migrator = Migrator(database, migrations, table)
+    if migrator.is_up_to_date():
+        click.secho("Database is up to date.", fg="green")
+    else:
+        click.secho("Database has pending migration(s).", fg="yellow")
+        raise SystemExit(1)
+
+
 def main() -> None:
     app()
 
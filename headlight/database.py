@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import contextlib
+import threading
 import typing
 from urllib.parse import urlparse
 
-from headlight.drivers.base import DbDriver
+from headlight.drivers.base import AsyncDbDriver, DbDriver
 from headlight.drivers.postgresql import PgDriver
 from headlight.exceptions import HeadlightError
 
@@ -12,6 +14,13 @@ drivers: dict[str, typing.Type[DbDriver]] = {
     "postgres": PgDriver,
 }
 
+try:
+    from headlight.drivers.postgresql_psycopg import PsycopgDriver
+
+    drivers["postgresql+psycopg"] = PsycopgDriver
+except ImportError:  # pragma: no cover
+    pass
+
 
 def create_database(url: str) -> DbDriver:
     parts = urlparse(url)
@@ -19,3 +28,87 @@ def create_database(url: str) -> DbDriver:
     if driver_class is None:
         raise HeadlightError("Unknown driver type: %s." % parts.scheme)
     return driver_class.from_url(url)
+
+
+class ConnectionPool:
+    def __init__(self, max_idle: int = 4) -> None:
+        self.max_idle = max_idle
+        self._idle: dict[str, list[DbDriver]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> DbDriver:
+        while True:
+            with self._lock:
+                idle = self._idle.get(url)
+                if not idle:
+                    break
+                db = idle.pop()
+            # the server may have dropped the connection while it was idle (restart, idle_session_timeout)
+            if self.is_alive(db):
+                return db
+            with contextlib.suppress(Exception):
+                db.close()
+        return create_database(url)
+
+    def is_alive(self, db: DbDriver) -> bool:
+        try:
+            db.execute("SELECT 1")
+        except Exception:
+            return False
+        return db.is_idle()
+
+    def release(self, url: str, db: DbDriver) -> None:
+        # session settings (search_path, timeouts) must not leak to the next user of the connection
+        try:
+            reusable = db.is_idle()
+            if reusable:
+                db.reset_session()
+        except Exception:
+            reusable = False
+
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(url, [])
+                if len(idle) < self.max_idle:
+                    idle.append(db)
+                    return
+        db.close()
+
+    @contextlib.contextmanager
+    def connection(self, url: str) -> typing.Iterator[DbDriver]:
+        db = self.acquire(url)
+        try:
+            yield db
+        finally:
+            self.release(url, db)
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [db for dbs in self._idle.values() for db in dbs]
+            self._idle.clear()
+        for db in idle:
+            db.close()
+
+
+default_pool = ConnectionPool()
+
+
+def _async_pg_driver() -> typing.Type[AsyncDbDriver]:
+    # psycopg 3 is an optional dependency, it is imported only when an async connection is requested
+    from headlight.drivers.async_postgresql import AsyncPgDriver
+
+    return AsyncPgDriver
+
+
+async_drivers: dict[str, typing.Callable[[], typing.Type[AsyncDbDriver]]] = {
+    "postgresql": _async_pg_driver,
+    "postgres": _async_pg_driver,
+}
+
+
+async def create_async_database(url: str) -> AsyncDbDriver:
+    parts = urlparse(url)
+    driver_loader = async_drivers.get(parts.scheme)
+    if driver_loader is None:
+        raise HeadlightError("Unknown driver type: %s." % parts.scheme)
+    return await driver_loader().from_url(url)
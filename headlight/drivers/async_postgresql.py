@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import contextlib
+import psycopg
+import typing
+from psycopg import errors, pq
+
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    AsyncDbDriver,
+    LockTimeoutError,
+    StatementError,
+    TableStats,
+    advisory_lock_id,
+    find_statement_at,
+)
+from headlight.drivers.postgresql import PgDriver
+
+
+class AsyncPgDriver(AsyncDbDriver):
+    dialect: PgDriver
+
+    def __init__(self, conn: psycopg.AsyncConnection) -> None:
+        self.conn = conn
+        self.dialect = PgDriver.dialect()
+
+    @classmethod
+    async def from_url(cls, url: str) -> AsyncPgDriver:
+        # client side binding keeps the psycopg2 semantics: several statements per query and "%%" escapes
+        conn = await psycopg.AsyncConnection.connect(url, autocommit=True, cursor_factory=psycopg.AsyncClientCursor)
+        return cls(conn)
+
+    async def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> list[typing.Any]:
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(stmt, params or [])
+            return await cursor.fetchall()
+
+    async def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(stmt, params or [])
+            self.rowcount = cursor.rowcount
+
+    async def close(self) -> None:
+        await self.conn.close()
+
+    def is_idle(self) -> bool:
+        return not self.conn.closed and self.conn.info.transaction_status == pq.TransactionStatus.IDLE
+
+    async def execute_many(self, stmts: list[str]) -> None:
+        if len(stmts) < 2:
+            return await super().execute_many(stmts)
+
+        # the same as PgDriver.execute_many: one round trip, a savepoint to find the failed statement in a transaction
+        savepoint = "headlight_batch" if not self.is_idle() else None
+        batch = stmts
+        if savepoint:
+            batch = [
+                self.dialect.savepoint_template.format(name=savepoint),
+                *stmts,
+                self.dialect.release_savepoint_template.format(name=savepoint),
+            ]
+        try:
+            await self.execute(BATCH_SEPARATOR.join(batch))
+        except psycopg.Error as ex:
+            position = self.dialect.get_error_position(ex)
+            if position:
+                raise StatementError(str(ex), find_statement_at(batch, position)) from ex
+            if savepoint is None:
+                raise StatementError(str(ex), BATCH_SEPARATOR.join(stmts)) from ex
+            await self.locate_failed_statement(stmts, savepoint, ex)
+
+    async def locate_failed_statement(self, stmts: list[str], savepoint: str, exc: Exception) -> None:
+        await self.execute(self.dialect.rollback_to_savepoint_template.format(name=savepoint))
+        for stmt in stmts:
+            try:
+                await self.execute(stmt)
+            except psycopg.Error:
+                raise StatementError(str(exc), stmt) from exc
+
+        raise StatementError(str(exc), BATCH_SEPARATOR.join(stmts)) from exc
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        cause = exc.__cause__ if isinstance(exc, StatementError) else exc
+        return isinstance(cause, errors.LockNotAvailable)
+
+    @contextlib.asynccontextmanager
+    async def advisory_lock(self, key: str, timeout: float | None = None) -> typing.AsyncIterator[None]:
+        lock_id = advisory_lock_id(key)
+        if timeout == 0:
+            [(acquired,)] = await self.fetch_all("SELECT pg_try_advisory_lock(%s)", [lock_id])
+            if not acquired:
+                raise LockTimeoutError(f'Lock "{key}" is held by another session.')
+        else:
+            if timeout is not None:
+                await self.execute(self.dialect.lock_timeout_template.format(timeout=int(timeout * 1000)))
+            try:
+                await self.execute("SELECT pg_advisory_lock(%s)", [lock_id])
+            except errors.LockNotAvailable as ex:
+                raise LockTimeoutError(f'Could not acquire lock "{key}" within {timeout}s.') from ex
+            finally:
+                if timeout is not None:
+                    await self.execute(self.dialect.reset_lock_timeout_template)
+
+        try:
+            yield
+        finally:
+            await self.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+    async def get_table_stats(self, table_name: str) -> TableStats | None:
+        return self.dialect.make_table_stats(await self.fetch_all(*self.dialect.table_stats_query(table_name)))
+
+    async def drop_invalid_index(self, name: str) -> bool:
+        rows = await self.fetch_all("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", [name])
+        if not rows or not rows[0][0]:
+            return False
+
+        await self.execute(
+            self.dialect.drop_index_template.format(
+                concurrently=" CONCURRENTLY", if_exists=" IF EXISTS", name=name, mode=""
+            )
+        )
+        return True
+
+    async def count_applied_migrations(self, table: str, revisions: list[str]) -> int:
+        try:
+            [(count,)] = await self.fetch_all(f"SELECT COUNT(*) FROM {table} WHERE revision = ANY(%s)", [revisions])
+        except errors.UndefinedTable:
+            return 0
+        return count
@@ -1,14 +1,50 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+
 import abc
 import contextlib
+import hashlib
 import typing
 from datetime import datetime
 from types import TracebackType
 
+from headlight.exceptions import HeadlightError
 from headlight.schema import types
 
+if typing.TYPE_CHECKING:
+    from headlight.schema.ops import BackfillOp
+    from headlight.schema.schema import Column
+
 T = typing.TypeVar("T", bound="DbDriver")
+AT = typing.TypeVar("AT", bound="AsyncDbDriver")
+
+BATCH_SEPARATOR = ";\n"
+
+Query = typing.Tuple[str, typing.List[typing.Any]]
+
+
+class StatementError(HeadlightError):
+    def __init__(self, message: str, stmt: str) -> None:
+        super().__init__(message)
+        self.stmt = stmt
+
+
+class LockTimeoutError(HeadlightError):
+    ...
+
+
+def advisory_lock_id(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def find_statement_at(stmts: list[str], position: int) -> str:
+    offset = 0
+    for stmt in stmts:
+        offset += len(stmt) + len(BATCH_SEPARATOR)
+        if position <= offset:
+            return stmt
+    return BATCH_SEPARATOR.join(stmts)
 
 
 class AppliedMigration(typing.TypedDict):
@@ -17,9 +53,105 @@ class AppliedMigration(typing.TypedDict):
     applied: datetime
 
 
+@dataclass
+class Progress:
+    # the state of the backend running a migration statement, as seen from another session
+    state: str | None
+    wait_event: str | None
+    elapsed: float
+    command: str | None = None
+    phase: str | None = None
+    blocks_done: int | None = None
+    blocks_total: int | None = None
+    tuples_done: int | None = None
+    tuples_total: int | None = None
+    eta: float | None = None
+
+    @property
+    def fraction(self) -> float | None:
+        if self.blocks_total and self.blocks_done is not None:
+            return min(self.blocks_done / self.blocks_total, 1.0)
+        if self.tuples_total and self.tuples_done is not None:
+            return min(self.tuples_done / self.tuples_total, 1.0)
+        return None
+
+
+@dataclass
+class BlockingSession:
+    pid: int
+    state: str | None
+    user: str | None
+    application: str | None
+    # seconds since the transaction (and the current state) of the session started
+    transaction_age: float | None
+    state_age: float | None
+    query: str | None
+
+    @property
+    def idle_in_transaction(self) -> bool:
+        return (self.state or "").startswith("idle in transaction")
+
+
+@dataclass
+class LockWait:
+    # the lock a migration statement waits for, who holds it and who is queued behind the migration
+    lock: str | None
+    waited: float
+    blockers: list[BlockingSession]
+    waiters: list[BlockingSession]
+    action: str | None = None
+
+
+@dataclass
+class TableStats:
+    # planner estimates, refreshed by VACUUM and ANALYZE
+    rows: float | None  # None when the table has never been analyzed
+    pages: int
+    block_size: int = 8192
+
+    @property
+    def size(self) -> int:
+        return self.pages * self.block_size
+
+
+class MigrationStats(typing.TypedDict, total=False):
+    duration: float
+    lock_wait: float
+    statement_count: int
+    checksum: str
+    applied_by: str
+
+
+class HistoryEntry(AppliedMigration):
+    duration: float | None
+    lock_wait: float | None
+    statement_count: int | None
+    checksum: str | None
+    applied_by: str | None
+
+
+# optional history columns, tables created by older versions get them on the next run
+HISTORY_STATS_COLUMNS = ["duration", "lock_wait", "statement_count", "checksum", "applied_by"]
+
+
+def make_history_entry(row: typing.Any) -> HistoryEntry:
+    return {
+        "revision": row[0],
+        "name": row[1],
+        "applied": row[2],
+        "duration": row[3],
+        "lock_wait": row[4],
+        "statement_count": row[5],
+        "checksum": row[6],
+        "applied_by": row[7],
+    }
+
+
 class DbDriver(abc.ABC):
     table_template = ""
     placeholder_mark = "?"
+    # the number of rows affected by the last executed statement, -1 when unknown
+    rowcount = -1
 
     create_table_template = "CREATE TABLE{if_not_exists}{name} ({column_sql})"
     drop_table_template = "DROP TABLE {name}{mode}"
@@ -28,40 +160,159 @@ class DbDriver(abc.ABC):
         "CREATE{unique} INDEX{concurrently}{if_not_exists}{name} ON{only} {table}{using} ({columns})"
         "{include}{with_}{tablespace}{where}"
     )
-    drop_index_template = "DROP INDEX {name}{mode}"
+    drop_index_template = "DROP INDEX{concurrently}{if_exists} {name}{mode}"
     index_column_template = "{expr}{collation}{opclass}{opclass_params}{sorting}{nulls}"
     unique_constraint_template = "{constraint}UNIQUE{columns}{include}"
     primary_key_constraint_template = "{constraint}PRIMARY KEY ({columns}){include}"
     check_constraint_template = "{constraint}CHECK ({expr})"
     foreign_key_template = "{constraint}{self_columns}{references}{columns}{match}{on_delete}{on_update}"
-    add_column_template = "ALTER TABLE{if_table_exists}{only} {table} ADD{if_column_not_exists} {column_spec}"
-    drop_column_template = "ALTER TABLE{if_table_exists}{only} {table} DROP{if_column_exists} {name}{mode}"
-    add_column_default_template = "ALTER TABLE{if_table_exists}{only} {table} ALTER {name} SET DEFAULT {expr}"
-    drop_column_default_template = "ALTER TABLE{if_table_exists}{only} {table} ALTER {name} DROP DEFAULT"
-
-    add_column_null_template = "ALTER TABLE{if_table_exists}{only} {table} ALTER {name} SET NOT NULL"
-    drop_column_null_template = "ALTER TABLE{if_table_exists}{only} {table} ALTER {name} DROP NOT NULL"
-    change_column_type = "ALTER TABLE{if_table_exists}{only} {table} ALTER {name} TYPE {type}{collate}{using}"
-    add_table_check_template = "ALTER TABLE{if_table_exists}{only} {table} ADD {constraint}"
-    drop_table_constraint_template = (
-        "ALTER TABLE{if_table_exists}{only} {table} DROP CONSTRAINT{if_exists} {name}{mode}"
-    )
+    alter_table_template = "ALTER TABLE{if_table_exists}{only} {table} {actions}"
+    add_column_template = "ADD{if_column_not_exists} {column_spec}"
+    drop_column_template = "DROP{if_column_exists} {name}{mode}"
+    add_column_default_template = "ALTER {name} SET DEFAULT {expr}"
+    drop_column_default_template = "ALTER {name} DROP DEFAULT"
+
+    add_column_null_template = "ALTER {name} SET NOT NULL"
+    drop_column_null_template = "ALTER {name} DROP NOT NULL"
+    change_column_type = "ALTER {name} TYPE {type}{collate}{using}"
+    add_table_check_template = "ADD {constraint}{not_valid}"
+    drop_table_constraint_template = "DROP CONSTRAINT{if_exists} {name}{mode}"
+    validate_constraint_template = "VALIDATE CONSTRAINT {name}"
     generated_as_template = "GENERATED ALWAYS AS ({expr}) {stored}"
+    lock_timeout_template = "SET lock_timeout = {timeout}"
+    reset_lock_timeout_template = "RESET lock_timeout"
+    set_search_path_template = "SET search_path TO {schemas}"
+    reset_session_template = "RESET ALL"
+    savepoint_template = "SAVEPOINT {name}"
+    release_savepoint_template = "RELEASE SAVEPOINT {name}"
+    rollback_to_savepoint_template = "ROLLBACK TO SAVEPOINT {name}"
+    backfill_update_template = "UPDATE {table} SET {set_sql} WHERE {key} {range}{where}"
+    backfill_comment_template = "-- backfill {table} in batches of {batch_size} ordered by {key}: SET {set_sql}{where}"
+    backfill_batch_template = (
+        "WITH batch AS (SELECT {key} FROM {table}{lower_bound} ORDER BY {key} LIMIT {limit}), "
+        "updated AS ({update} RETURNING 1), "
+        "progress AS ("
+        "INSERT INTO {progress_table} (revision, name, position) "
+        "SELECT {mark}, {mark}, MAX({key})::text FROM batch HAVING MAX({key}) IS NOT NULL "
+        "ON CONFLICT (revision, name) DO UPDATE SET position = EXCLUDED.position RETURNING 1"
+        ") "
+        "SELECT (SELECT MAX({key})::text FROM batch), (SELECT COUNT(*) FROM updated)"
+    )
 
     @classmethod
     @abc.abstractmethod
     def from_url(cls: typing.Type[T], url: str) -> T:
         raise NotImplementedError()
 
+    @classmethod
+    def dialect(cls: typing.Type[T]) -> T:
+        # a driver without a connection, enough to compile operations to SQL
+        return cls.__new__(cls)
+
     @abc.abstractmethod
-    def fetch_all(self, stmt: str) -> typing.Iterable[dict]:
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[dict]:
         ...
 
     @abc.abstractmethod
-    def execute(self, stmt: str, params: list[str] | None = None) -> None:
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
         ...
 
-    def create_migrations_table(self, table: str) -> None:
+    def close(self) -> None:
+        ...
+
+    def is_idle(self) -> bool:
+        # the connection has no open transaction and can be handed to another user
+        return True
+
+    def get_backend_pid(self) -> int | None:
+        # the server process of this connection, drivers that cannot report progress return None
+        return None
+
+    def get_progress(self, pid: int) -> Progress | None:
+        return None
+
+    def get_blocking_sessions(self, pid: int) -> list[BlockingSession]:
+        return []
+
+    def get_waiting_sessions(self, pid: int) -> list[BlockingSession]:
+        return []
+
+    def get_awaited_lock(self, pid: int) -> str | None:
+        return None
+
+    def cancel_backend(self, pid: int) -> bool:
+        return False
+
+    def terminate_backend(self, pid: int) -> bool:
+        return False
+
+    def get_table_stats(self, table_name: str) -> TableStats | None:
+        return None
+
+    def reset_session(self) -> None:
+        self.execute(self.reset_session_template)
+
+    def execute_many(self, stmts: list[str]) -> None:
+        for stmt in stmts:
+            try:
+                self.execute(stmt)
+            except StatementError:
+                # the driver has found the failed statement itself, in pipeline mode it is not the current one
+                raise
+            except Exception as ex:
+                raise StatementError(str(ex), stmt) from ex
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        return False
+
+    @contextlib.contextmanager
+    def pipeline(self) -> typing.Iterator[None]:
+        # drivers that support pipelining send the statements executed in this block together
+        yield
+
+    def in_pipeline(self) -> bool:
+        # statements are queued, their row counts and errors are known only after a sync
+        return False
+
+    def sync_pipeline(self) -> None:
+        # sends the queued statements and reads their results, errors of the statements are raised here
+        ...
+
+    def drop_invalid_index(self, name: str) -> bool:
+        return False
+
+    def quote_identifier(self, name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def get_schemas(self, pattern: str) -> list[str]:
+        stmt = (
+            "SELECT schema_name FROM information_schema.schemata "
+            f"WHERE schema_name LIKE {self.placeholder_mark} ORDER BY schema_name"
+        )
+        return [row[0] for row in self.fetch_all(stmt, [pattern])]
+
+    def schema_exists_query(self, schema: str) -> Query:
+        return f"SELECT 1 FROM information_schema.schemata WHERE schema_name = {self.placeholder_mark}", [schema]
+
+    def schema_exists(self, schema: str) -> bool:
+        return bool(list(self.fetch_all(*self.schema_exists_query(schema))))
+
+    def set_search_path(self, schemas: list[str]) -> None:
+        self.execute(self.set_search_path_template.format(schemas=", ".join(map(self.quote_identifier, schemas))))
+
+    def get_history_stats_columns(self) -> list[Column]:
+        from headlight.schema import types
+        from headlight.schema.schema import Column
+
+        return [
+            Column(name="duration", type=types.DoubleType(), null=True),
+            Column(name="lock_wait", type=types.DoubleType(), null=True),
+            Column(name="statement_count", type=types.IntegerType(), null=True),
+            Column(name="checksum", type=types.TextType(), null=True),
+            Column(name="applied_by", type=types.TextType(), null=True),
+        ]
+
+    def get_migrations_table_sql(self, table: str) -> str:
         from headlight.schema import ops, types
         from headlight.schema.schema import Column, Table
 
@@ -72,15 +323,132 @@ class DbDriver(abc.ABC):
                     Column(name="revision", type=types.TextType(), primary_key=True),
                     Column(name="name", type=types.TextType()),
                     Column(name="applied", type=types.DateTimeType()),
+                    *self.get_history_stats_columns(),
                 ],
             ),
             if_not_exists=True,
         )
+        return table_op.to_up_sql(self)
+
+    def get_column_names_query(self, table: str) -> Query:
+        schema, _, name = table.rpartition(".")
+        stmt = f"SELECT column_name FROM information_schema.columns WHERE table_name = {self.placeholder_mark}"
+        if schema:
+            stmt += f" AND table_schema = {self.placeholder_mark}"
+        return stmt, [name, schema] if schema else [name]
+
+    def get_migrations_table_upgrade_sql(self, table: str, existing_columns: set[str]) -> str | None:
+        from headlight.schema import ops
+
+        add_ops: list[ops.Operation] = [
+            ops.AddColumnOp(table_name=table, column=column, if_column_not_exists=True)
+            for column in self.get_history_stats_columns()
+            if column.name not in existing_columns
+        ]
+        if not add_ops:
+            return None
+        [alter_op] = ops.coalesce_ops(add_ops)
+        return alter_op.to_up_sql(self)
+
+    def get_migrations_table_index_sql(self, table: str) -> str:
+        from headlight.schema import ops
+        from headlight.schema.schema import Index, IndexExpr
+
+        # downgrade reads the latest history rows, ordered by (applied, revision)
+        columns = IndexExpr.from_specs(["applied", "revision"])
+        index = Index(
+            name=Index.generate_name(table.rpartition(".")[2], columns),
+            table_name=table,
+            columns=columns,
+        )
+        return ops.CreateIndexOp(index=index, if_not_exists=True).to_up_sql(self)
+
+    def get_migrations_table_columns(self, table: str) -> set[str]:
+        return {row[0] for row in self.fetch_all(*self.get_column_names_query(table))}
+
+    def is_migrations_table_current(self, table: str) -> bool:
+        # an empty set means the table does not exist yet
+        existing_columns = self.get_migrations_table_columns(table)
+        return bool(existing_columns) and self.get_migrations_table_upgrade_sql(table, existing_columns) is None
 
+    def create_migrations_table(self, table: str) -> None:
         self.execute("BEGIN")
-        self.execute(table_op.to_up_sql(self))
+        self.execute(self.get_migrations_table_sql(table))
+        self.execute(self.get_migrations_table_index_sql(table))
+        # the table is altered only when columns are missing, ALTER TABLE takes an exclusive lock even if it is a noop
+        existing_columns = self.get_migrations_table_columns(table)
+        upgrade_sql = self.get_migrations_table_upgrade_sql(table, existing_columns)
+        if upgrade_sql:
+            self.execute(upgrade_sql)
         self.execute("COMMIT")
 
+    def get_backfill_table_sql(self, table: str) -> str:
+        from headlight.schema import ops, types
+        from headlight.schema.schema import Column, Table
+
+        table_op = ops.CreateTableOp(
+            table=Table(
+                name=table,
+                columns=[
+                    Column(name="revision", type=types.TextType(), primary_key=True),
+                    Column(name="name", type=types.TextType(), primary_key=True),
+                    Column(name="position", type=types.TextType()),
+                ],
+            ),
+            if_not_exists=True,
+        )
+        return table_op.to_up_sql(self)
+
+    def create_backfill_table(self, table: str) -> None:
+        self.execute(self.get_backfill_table_sql(table))
+
+    def get_backfill_position_query(self, table: str, revision: str, name: str) -> Query:
+        mark = self.placeholder_mark
+        return f"SELECT position FROM {table} WHERE revision = {mark} AND name = {mark}", [revision, name]
+
+    def get_backfill_position(self, table: str, revision: str, name: str) -> str | None:
+        rows = list(self.fetch_all(*self.get_backfill_position_query(table, revision, name)))
+        return rows[0][0] if rows else None
+
+    def save_backfill_position_query(self, table: str, revision: str, name: str, position: str) -> Query:
+        mark = self.placeholder_mark
+        return (
+            f"INSERT INTO {table} (revision, name, position) VALUES ({mark}, {mark}, {mark}) "
+            "ON CONFLICT (revision, name) DO UPDATE SET position = EXCLUDED.position",
+            [revision, name, position],
+        )
+
+    def save_backfill_position(self, table: str, revision: str, name: str, position: str) -> None:
+        self.execute(*self.save_backfill_position_query(table, revision, name, position))
+
+    def clear_backfill_position_query(self, table: str, revision: str, name: str) -> Query:
+        mark = self.placeholder_mark
+        return f"DELETE FROM {table} WHERE revision = {mark} AND name = {mark}", [revision, name]
+
+    def clear_backfill_position(self, table: str, revision: str, name: str) -> None:
+        self.execute(*self.clear_backfill_position_query(table, revision, name))
+
+    def backfill_batch_query(self, op: BackfillOp, progress_table: str, revision: str, position: str | None) -> Query:
+        # selects the next key range, updates it and stores the new position as one atomic statement
+        lower_bound = f" WHERE {op.key} > {self.placeholder_mark}" if position is not None else ""
+        stmt = self.backfill_batch_template.format(
+            key=op.key,
+            table=op.table_name,
+            lower_bound=lower_bound,
+            limit=int(op.batch_size),
+            update=op.to_batch_sql(self),
+            progress_table=progress_table,
+            mark=self.placeholder_mark,
+        )
+        params = ([position] if position is not None else []) + [revision, op.name]
+        return stmt, params
+
+    def run_backfill_batch(
+        self, op: BackfillOp, progress_table: str, revision: str, position: str | None
+    ) -> tuple[str | None, int]:
+        [(new_position, count)] = self.fetch_all(*self.backfill_batch_query(op, progress_table, revision, position))
+        return new_position, count
+
     def transaction(self) -> Transaction:
         return Transaction(self)
 
@@ -89,27 +457,89 @@ class DbDriver(abc.ABC):
         self.execute(f"LOCK {table} IN EXCLUSIVE MODE")
         yield
 
+    @contextlib.contextmanager
+    def advisory_lock(self, key: str, timeout: float | None = None) -> typing.Iterator[None]:
+        # session level lock that coordinates concurrent migrator runs,
+        # drivers that have no such locks run without coordination
+        yield
+
     def add_applied_migration(self, table: str, revision: str, name: str) -> None:
-        self.execute(
-            f"INSERT INTO {table} (revision, name, applied) "
-            f"VALUES ({self.placeholder_mark}, {self.placeholder_mark}, {self.placeholder_mark})",
-            [revision, name, datetime.now().isoformat()],
-        )
+        self.add_applied_migrations(table, [(revision, name)])
 
     def remove_applied_migration(self, table: str, revision: str) -> None:
-        self.execute(f"DELETE FROM {table} WHERE revision = {self.placeholder_mark}", [revision])
+        self.remove_applied_migrations(table, [revision])
+
+    def add_applied_migrations_query(
+        self, table: str, migrations: list[tuple[str, str]], stats: list[MigrationStats] | None = None
+    ) -> Query:
+        applied = datetime.now().isoformat()
+        columns = ["revision", "name", "applied", *HISTORY_STATS_COLUMNS]
+        values = ", ".join(["(" + ", ".join([self.placeholder_mark] * len(columns)) + ")"] * len(migrations))
+        params: list[typing.Any] = []
+        for index, (revision, name) in enumerate(migrations):
+            migration_stats = stats[index] if stats else MigrationStats()
+            params.extend([revision, name, applied])
+            params.extend(migration_stats.get(column) for column in HISTORY_STATS_COLUMNS)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values}", params
+
+    def add_applied_migrations(
+        self, table: str, migrations: list[tuple[str, str]], stats: list[MigrationStats] | None = None
+    ) -> None:
+        self.execute(*self.add_applied_migrations_query(table, migrations, stats))
+
+    def remove_applied_migrations_query(self, table: str, revisions: list[str]) -> Query:
+        marks = ", ".join([self.placeholder_mark] * len(revisions))
+        return f"DELETE FROM {table} WHERE revision IN ({marks})", list(revisions)
+
+    def remove_applied_migrations(self, table: str, revisions: list[str]) -> None:
+        self.execute(*self.remove_applied_migrations_query(table, revisions))
+
+    def missing_revisions_query(self, table: str, revisions: list[str]) -> Query:
+        values = ", ".join([f"({self.placeholder_mark})"] * len(revisions))
+        return (
+            f"SELECT pending.revision FROM (VALUES {values}) AS pending (revision) "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.revision = pending.revision)",
+            list(revisions),
+        )
 
-    def get_applied_migrations(self, table: str, limit: int | None = None) -> typing.Iterable[AppliedMigration]:
-        stmt = f"SELECT revision, name, applied FROM {table} ORDER BY applied DESC"
+    def get_missing_revisions(self, table: str, revisions: list[str]) -> set[str]:
+        # the server compares the revisions with the history, only the missing ones are sent back
+        if not revisions:
+            return set()
+        return {row[0] for row in self.fetch_all(*self.missing_revisions_query(table, revisions))}
+
+    def count_applied_migrations_query(self, table: str, revisions: list[str]) -> Query:
+        marks = ", ".join([self.placeholder_mark] * len(revisions))
+        return f"SELECT COUNT(*) FROM {table} WHERE revision IN ({marks})", list(revisions)
+
+    def count_applied_migrations(self, table: str, revisions: list[str]) -> int:
+        rows = list(self.fetch_all(*self.count_applied_migrations_query(table, revisions)))
+        return rows[0][0]
+
+    def applied_migrations_query(self, table: str, limit: int | None = None) -> Query:
+        stmt = f"SELECT revision, name, applied FROM {table} ORDER BY applied DESC, revision DESC"
         if limit:
             stmt += f" LIMIT {limit}"
-        for row in self.fetch_all(stmt):
+        return stmt, []
+
+    def get_applied_migrations(self, table: str, limit: int | None = None) -> typing.Iterable[AppliedMigration]:
+        for row in self.fetch_all(*self.applied_migrations_query(table, limit)):
             yield {
                 "revision": row[0],
                 "name": row[1],
                 "applied": row[2],
             }
 
+    def history_query(self, table: str, slowest: bool = False, limit: int | None = None) -> Query:
+        order_by = "duration DESC NULLS LAST, revision DESC" if slowest else "applied DESC, revision DESC"
+        stmt = f"SELECT revision, name, applied, {', '.join(HISTORY_STATS_COLUMNS)} FROM {table} ORDER BY {order_by}"
+        if limit:
+            stmt += f" LIMIT {limit}"
+        return stmt, []
+
+    def get_history(self, table: str, slowest: bool = False, limit: int | None = None) -> list[HistoryEntry]:
+        return [make_history_entry(row) for row in self.fetch_all(*self.history_query(table, slowest, limit))]
+
     @abc.abstractmethod
     def get_sql_for_type(self, type: types.Type) -> str:
         raise NotImplementedError
@@ -129,6 +559,14 @@ class Transaction:
     def rollback(self) -> None:
         self._db.execute("ROLLBACK")
 
+    @contextlib.contextmanager
+    def suspended(self) -> typing.Iterator[None]:
+        self.commit()
+        try:
+            yield
+        finally:
+            self.begin()
+
     def __enter__(self) -> Transaction:
         return self.begin()
 
@@ -148,3 +586,159 @@ class DummyTransaction(Transaction):
 
     def rollback(self) -> None:
         pass
+
+
+class AsyncDbDriver(abc.ABC):
+    # operations are compiled to SQL by the synchronous driver of the same database
+    dialect: DbDriver
+    rowcount = -1
+
+    @classmethod
+    @abc.abstractmethod
+    async def from_url(cls: typing.Type[AT], url: str) -> AT:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> list[typing.Any]:
+        ...
+
+    @abc.abstractmethod
+    async def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        ...
+
+    async def execute_many(self, stmts: list[str]) -> None:
+        for stmt in stmts:
+            try:
+                await self.execute(stmt)
+            except Exception as ex:
+                raise StatementError(str(ex), stmt) from ex
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        return False
+
+    async def get_table_stats(self, table_name: str) -> TableStats | None:
+        return None
+
+    async def drop_invalid_index(self, name: str) -> bool:
+        return False
+
+    async def get_migrations_table_columns(self, table: str) -> set[str]:
+        return {row[0] for row in await self.fetch_all(*self.dialect.get_column_names_query(table))}
+
+    async def is_migrations_table_current(self, table: str) -> bool:
+        existing_columns = await self.get_migrations_table_columns(table)
+        return bool(existing_columns) and self.dialect.get_migrations_table_upgrade_sql(table, existing_columns) is None
+
+    async def create_migrations_table(self, table: str) -> None:
+        await self.execute("BEGIN")
+        await self.execute(self.dialect.get_migrations_table_sql(table))
+        await self.execute(self.dialect.get_migrations_table_index_sql(table))
+        existing_columns = await self.get_migrations_table_columns(table)
+        upgrade_sql = self.dialect.get_migrations_table_upgrade_sql(table, existing_columns)
+        if upgrade_sql:
+            await self.execute(upgrade_sql)
+        await self.execute("COMMIT")
+
+    async def create_backfill_table(self, table: str) -> None:
+        await self.execute(self.dialect.get_backfill_table_sql(table))
+
+    async def get_backfill_position(self, table: str, revision: str, name: str) -> str | None:
+        rows = await self.fetch_all(*self.dialect.get_backfill_position_query(table, revision, name))
+        return rows[0][0] if rows else None
+
+    async def save_backfill_position(self, table: str, revision: str, name: str, position: str) -> None:
+        await self.execute(*self.dialect.save_backfill_position_query(table, revision, name, position))
+
+    async def clear_backfill_position(self, table: str, revision: str, name: str) -> None:
+        await self.execute(*self.dialect.clear_backfill_position_query(table, revision, name))
+
+    async def run_backfill_batch(
+        self, op: BackfillOp, progress_table: str, revision: str, position: str | None
+    ) -> tuple[str | None, int]:
+        query = self.dialect.backfill_batch_query(op, progress_table, revision, position)
+        [(new_position, count)] = await self.fetch_all(*query)
+        return new_position, count
+
+    def transaction(self) -> AsyncTransaction:
+        return AsyncTransaction(self)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, table: str) -> typing.AsyncIterator[None]:
+        await self.execute(f"LOCK {table} IN EXCLUSIVE MODE")
+        yield
+
+    @contextlib.asynccontextmanager
+    async def advisory_lock(self, key: str, timeout: float | None = None) -> typing.AsyncIterator[None]:
+        yield
+
+    async def add_applied_migrations(
+        self, table: str, migrations: list[tuple[str, str]], stats: list[MigrationStats] | None = None
+    ) -> None:
+        await self.execute(*self.dialect.add_applied_migrations_query(table, migrations, stats))
+
+    async def remove_applied_migrations(self, table: str, revisions: list[str]) -> None:
+        await self.execute(*self.dialect.remove_applied_migrations_query(table, revisions))
+
+    async def get_missing_revisions(self, table: str, revisions: list[str]) -> set[str]:
+        if not revisions:
+            return set()
+        return {row[0] for row in await self.fetch_all(*self.dialect.missing_revisions_query(table, revisions))}
+
+    async def count_applied_migrations(self, table: str, revisions: list[str]) -> int:
+        rows = await self.fetch_all(*self.dialect.count_applied_migrations_query(table, revisions))
+        return rows[0][0]
+
+    async def get_applied_migrations(self, table: str, limit: int | None = None) -> list[AppliedMigration]:
+        rows = await self.fetch_all(*self.dialect.applied_migrations_query(table, limit))
+        return [{"revision": row[0], "name": row[1], "applied": row[2]} for row in rows]
+
+    async def get_history(self, table: str, slowest: bool = False, limit: int | None = None) -> list[HistoryEntry]:
+        rows = await self.fetch_all(*self.dialect.history_query(table, slowest, limit))
+        return [make_history_entry(row) for row in rows]
+
+
+class AsyncTransaction:
+    def __init__(self, db: AsyncDbDriver) -> None:
+        self._db = db
+
+    async def begin(self) -> AsyncTransaction:
+        await self._db.execute("BEGIN")
+        return self
+
+    async def commit(self) -> None:
+        await self._db.execute("COMMIT")
+
+    async def rollback(self) -> None:
+        await self._db.execute("ROLLBACK")
+
+    @contextlib.asynccontextmanager
+    async def suspended(self) -> typing.AsyncIterator[None]:
+        await self.commit()
+        try:
+            yield
+        finally:
+            await self.begin()
+
+    async def __aenter__(self) -> AsyncTransaction:
+        return await self.begin()
+
+    async def __aexit__(self, exc_type: typing.Type[Exception], exc: BaseException, tb: TracebackType) -> None:
+        if exc:
+            await self.rollback()
+        else:
+            await self.commit()
+
+
+class AsyncDummyTransaction(AsyncTransaction):
+    async def begin(self) -> AsyncTransaction:
+        return self
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
@@ -1,31 +1,239 @@
 from __future__ import annotations
 
+import contextlib
 import psycopg2
 import typing
+from psycopg2 import errors, extensions
 
-from headlight.drivers.base import DbDriver
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    BlockingSession,
+    DbDriver,
+    LockTimeoutError,
+    Progress,
+    Query,
+    StatementError,
+    TableStats,
+    advisory_lock_id,
+    find_statement_at,
+)
 from headlight.schema import types
 
 
 class PgDriver(DbDriver):
     placeholder_mark = "%s"
+    # the base class of errors raised by the database library
+    driver_error: typing.Type[Exception] = psycopg2.Error
 
     def __init__(self, url: str) -> None:
         self.conn = psycopg2.connect(url)
+        self.conn.autocommit = True
 
     @classmethod
     def from_url(cls, url: str) -> PgDriver:
         return cls(url)
 
-    def fetch_all(self, stmt: str) -> typing.Iterable[dict]:
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[dict]:
         cursor = self.conn.cursor()
-        cursor.execute(stmt)
+        cursor.execute(stmt, params)
         for row in cursor.fetchall():
             yield row
 
-    def execute(self, stmt: str, params: list[str] | None = None) -> None:
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
         cursor = self.conn.cursor()
         cursor.execute(stmt, params or [])
+        self.rowcount = cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def is_idle(self) -> bool:
+        return not self.conn.closed and self.conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+
+    def get_backend_pid(self) -> int | None:
+        return self.conn.get_backend_pid()
+
+    def progress_query(self, pid: int) -> Query:
+        # index builds report to pg_stat_progress_create_index, VACUUM FULL and CLUSTER to pg_stat_progress_cluster,
+        # other statements (table rewrites by ALTER TABLE included) only show up in pg_stat_activity
+        return (
+            "SELECT a.state, a.wait_event_type || ':' || a.wait_event, "
+            "EXTRACT(EPOCH FROM clock_timestamp() - a.query_start)::float8, "
+            "COALESCE(ci.command, cl.command), COALESCE(ci.phase, cl.phase), "
+            "COALESCE(ci.blocks_done, cl.heap_blks_scanned), COALESCE(ci.blocks_total, cl.heap_blks_total), "
+            "COALESCE(ci.tuples_done, cl.heap_tuples_written), ci.tuples_total "
+            "FROM pg_stat_activity a "
+            "LEFT JOIN pg_stat_progress_create_index ci ON ci.pid = a.pid "
+            "LEFT JOIN pg_stat_progress_cluster cl ON cl.pid = a.pid "
+            "WHERE a.pid = %s",
+            [pid],
+        )
+
+    def get_progress(self, pid: int) -> Progress | None:
+        rows = list(self.fetch_all(*self.progress_query(pid)))
+        if not rows:
+            return None
+        return Progress(*rows[0])
+
+    def sessions_query(self, condition: str, pid: int) -> Query:
+        return (
+            "SELECT a.pid, a.state, a.usename, a.application_name, "
+            "EXTRACT(EPOCH FROM clock_timestamp() - a.xact_start)::float8, "
+            "EXTRACT(EPOCH FROM clock_timestamp() - a.state_change)::float8, a.query "
+            f"FROM pg_stat_activity a WHERE {condition} ORDER BY a.xact_start",
+            [pid],
+        )
+
+    def blocking_sessions_query(self, pid: int) -> Query:
+        return self.sessions_query("a.pid = ANY(pg_blocking_pids(%s))", pid)
+
+    def waiting_sessions_query(self, pid: int) -> Query:
+        # pg_blocking_pids() is called for every session here, so it is queried only while the migration is blocked
+        return self.sessions_query("%s = ANY(pg_blocking_pids(a.pid))", pid)
+
+    def get_blocking_sessions(self, pid: int) -> list[BlockingSession]:
+        return [BlockingSession(*row) for row in self.fetch_all(*self.blocking_sessions_query(pid))]
+
+    def get_waiting_sessions(self, pid: int) -> list[BlockingSession]:
+        return [BlockingSession(*row) for row in self.fetch_all(*self.waiting_sessions_query(pid))]
+
+    def get_awaited_lock(self, pid: int) -> str | None:
+        rows = list(
+            self.fetch_all(
+                "SELECT l.mode || ' on ' || COALESCE(l.relation::regclass::text, l.locktype) "
+                "FROM pg_locks l WHERE l.pid = %s AND NOT l.granted",
+                [pid],
+            )
+        )
+        return rows[0][0] if rows else None
+
+    def cancel_backend(self, pid: int) -> bool:
+        [(cancelled,)] = self.fetch_all("SELECT pg_cancel_backend(%s)", [pid])
+        return cancelled
+
+    def terminate_backend(self, pid: int) -> bool:
+        [(terminated,)] = self.fetch_all("SELECT pg_terminate_backend(%s)", [pid])
+        return terminated
+
+    def table_stats_query(self, table_name: str) -> Query:
+        # a rewrite copies the TOAST table as well, so its pages count too
+        return (
+            "SELECT c.reltuples::float8, c.relpages + COALESCE(t.relpages, 0), current_setting('block_size')::int "
+            "FROM pg_class c LEFT JOIN pg_class t ON t.oid = c.reltoastrelid "
+            "WHERE c.oid = to_regclass(%s)",
+            [table_name],
+        )
+
+    def get_table_stats(self, table_name: str) -> TableStats | None:
+        return self.make_table_stats(list(self.fetch_all(*self.table_stats_query(table_name))))
+
+    def make_table_stats(self, rows: list[typing.Any]) -> TableStats | None:
+        if not rows:
+            return None
+        reltuples, pages, block_size = rows[0]
+        # reltuples is -1 until the first VACUUM or ANALYZE since PostgreSQL 14
+        return TableStats(rows=reltuples if reltuples >= 0 else None, pages=pages, block_size=block_size)
+
+    def execute_many(self, stmts: list[str]) -> None:
+        if len(stmts) < 2:
+            return super().execute_many(stmts)
+
+        # send all statements as a single multi-statement query, this costs one round trip,
+        # inside a transaction the batch runs under a savepoint, so that the failed statement can be found
+        savepoint = "headlight_batch" if not self.is_idle() else None
+        batch = stmts
+        if savepoint:
+            batch = [
+                self.savepoint_template.format(name=savepoint),
+                *stmts,
+                self.release_savepoint_template.format(name=savepoint),
+            ]
+        try:
+            self.execute(BATCH_SEPARATOR.join(batch))
+        except self.driver_error as ex:
+            position = self.get_error_position(ex)
+            if position:
+                raise StatementError(str(ex), find_statement_at(batch, position)) from ex
+            if savepoint is None:
+                raise StatementError(str(ex), BATCH_SEPARATOR.join(stmts)) from ex
+            self.locate_failed_statement(stmts, savepoint, ex)
+
+    def get_error_position(self, exc: Exception) -> int | None:
+        # syntax errors point to a character of the query
+        diag = getattr(exc, "diag", None)
+        position = diag.statement_position if diag else None
+        return int(position) if position else None
+
+    def locate_failed_statement(self, stmts: list[str], savepoint: str, exc: Exception) -> None:
+        # only syntax errors have a position, for errors raised while running the batch is undone
+        # and its statements run again one by one, until one of them fails
+        self.execute(self.rollback_to_savepoint_template.format(name=savepoint))
+        for stmt in stmts:
+            try:
+                self.execute(stmt)
+            except self.driver_error:
+                raise StatementError(str(exc), stmt) from exc
+
+        # the error did not repeat (a lock timeout, a deadlock), it is still reported for the whole batch
+        raise StatementError(str(exc), BATCH_SEPARATOR.join(stmts)) from exc
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        cause = exc.__cause__ if isinstance(exc, StatementError) else exc
+        return isinstance(cause, errors.LockNotAvailable)
+
+    @contextlib.contextmanager
+    def advisory_lock(self, key: str, timeout: float | None = None) -> typing.Iterator[None]:
+        lock_id = advisory_lock_id(key)
+        if timeout == 0:
+            [(acquired,)] = self.fetch_all("SELECT pg_try_advisory_lock(%s)", [lock_id])
+            if not acquired:
+                raise LockTimeoutError(f'Lock "{key}" is held by another session.')
+        else:
+            if timeout is not None:
+                self.execute(self.lock_timeout_template.format(timeout=int(timeout * 1000)))
+            try:
+                self.execute("SELECT pg_advisory_lock(%s)", [lock_id])
+            except errors.LockNotAvailable as ex:
+                raise LockTimeoutError(f'Could not acquire lock "{key}" within {timeout}s.') from ex
+            finally:
+                if timeout is not None:
+                    self.execute(self.reset_lock_timeout_template)
+
+        try:
+            yield
+        finally:
+            self.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+    def drop_invalid_index(self, name: str) -> bool:
+        rows = list(self.fetch_all("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", [name]))
+        if not rows or not rows[0][0]:
+            return False
+
+        self.execute(
+            self.drop_index_template.format(concurrently=" CONCURRENTLY", if_exists=" IF EXISTS", name=name, mode="")
+        )
+        return True
+
+    def get_column_names_query(self, table: str) -> Query:
+        # resolves the table name with search_path, the same way the migrator does
+        return (
+            "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped",
+            [table],
+        )
+
+    def missing_revisions_query(self, table: str, revisions: list[str]) -> Query:
+        return (
+            f"SELECT pending.revision FROM unnest(%s::text[]) AS pending (revision) "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.revision = pending.revision)",
+            [list(revisions)],
+        )
+
+    def count_applied_migrations(self, table: str, revisions: list[str]) -> int:
+        try:
+            [(count,)] = self.fetch_all(f"SELECT COUNT(*) FROM {table} WHERE revision = ANY(%s)", [revisions])
+        except errors.UndefinedTable:
+            return 0
+        return count
 
     def get_sql_for_type(self, type: types.Type) -> str:
         match type:
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import contextlib
+import psycopg
+import typing
+from psycopg import errors, pq
+
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    AppliedMigration,
+    HistoryEntry,
+    LockTimeoutError,
+    MigrationStats,
+    StatementError,
+    advisory_lock_id,
+    make_history_entry,
+)
+from headlight.drivers.postgresql import PgDriver
+
+
+class PsycopgDriver(PgDriver):
+    driver_error = psycopg.Error
+
+    def __init__(self, url: str) -> None:
+        self.conn = psycopg.connect(url, autocommit=True)
+        self.cursor = self.create_cursor()
+        self.bound_cursor = self.create_cursor(bound=True)
+        # statements queued in pipeline mode, each with its own cursor that receives the result
+        self.pipelined: list[tuple[str, psycopg.Cursor[typing.Any]]] | None = None
+        self.active_pipeline: psycopg.Pipeline | None = None
+
+    @classmethod
+    def from_url(cls, url: str) -> PsycopgDriver:
+        return cls(url)
+
+    def create_cursor(self, bound: bool = False) -> psycopg.Cursor[typing.Any]:
+        # server side binding for the history table queries, client side binding for migration SQL:
+        # several statements per query and "%%" escapes, like psycopg2
+        return self.conn.cursor() if bound else psycopg.ClientCursor(self.conn)
+
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[dict]:
+        self.cursor.execute(stmt, params or [])
+        return self.cursor.fetchall()
+
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        if self.pipelined is not None:
+            return self.execute_pipelined(self.create_cursor(), stmt, params or [])
+        self.cursor.execute(stmt, params or [])
+        self.rowcount = self.cursor.rowcount
+
+    def is_idle(self) -> bool:
+        return not self.conn.closed and self.conn.info.transaction_status == pq.TransactionStatus.IDLE
+
+    def get_backend_pid(self) -> int | None:
+        return self.conn.info.backend_pid
+
+    def fetch_bound(self, stmt: str, params: list[typing.Any]) -> list[typing.Any]:
+        self.bound_cursor.execute(stmt, params)
+        return self.bound_cursor.fetchall()
+
+    def execute_bound(self, stmt: str, params: list[typing.Any]) -> None:
+        if self.pipelined is not None:
+            return self.execute_pipelined(self.create_cursor(bound=True), stmt, params)
+        self.bound_cursor.execute(stmt, params)
+        self.rowcount = self.bound_cursor.rowcount
+
+    def execute_pipelined(self, cursor: psycopg.Cursor[typing.Any], stmt: str, params: list[typing.Any]) -> None:
+        assert self.pipelined is not None
+        self.pipelined.append((stmt, cursor))
+        # the row count is not known until the results are read
+        self.rowcount = -1
+        with self.pipeline_errors():
+            cursor.execute(stmt, params)
+
+    def get_failed_statement(self) -> str:
+        # results are read in order and the failed one is not stored, so it is the first cursor without a result
+        pipelined = self.pipelined or []
+        for stmt, cursor in pipelined:
+            if cursor.pgresult is None:
+                return stmt
+        return BATCH_SEPARATOR.join(stmt for stmt, _ in pipelined)
+
+    @contextlib.contextmanager
+    def pipeline_errors(self) -> typing.Iterator[None]:
+        # errors surface when the results are read, which may be long after the failed statement was queued
+        try:
+            yield
+        except psycopg.Error as ex:
+            raise StatementError(str(ex), self.get_failed_statement()) from ex
+
+    def in_pipeline(self) -> bool:
+        return self.pipelined is not None
+
+    def sync_pipeline(self) -> None:
+        if self.active_pipeline is not None:
+            with self.pipeline_errors():
+                self.active_pipeline.sync()
+
+    @contextlib.contextmanager
+    def pipeline(self) -> typing.Iterator[None]:
+        # statements are queued and sent together, the results are read on sync and when the block exits
+        if self.pipelined is not None or not psycopg.Pipeline.is_supported():
+            yield
+            return
+
+        # statements sent outside a transaction run in an implicit one, it is aborted by the pipeline only
+        owns_transaction = self.is_idle()
+        self.pipelined = []
+        try:
+            with self.pipeline_errors(), self.conn.pipeline() as pipeline:
+                self.active_pipeline = pipeline
+                yield
+        except StatementError:
+            if owns_transaction and self.conn.info.transaction_status == pq.TransactionStatus.INERROR:
+                self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.pipelined = None
+            self.active_pipeline = None
+
+    def execute_many(self, stmts: list[str]) -> None:
+        if len(stmts) < 2 or self.pipelined is not None:
+            return super(PgDriver, self).execute_many(stmts)
+
+        # in pipeline mode every statement is sent separately, so it has to be a single command
+        if psycopg.Pipeline.is_supported() and not any(";" in stmt for stmt in stmts):
+            with self.pipeline():
+                for stmt in stmts:
+                    self.execute(stmt)
+            return
+        super().execute_many(stmts)
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        cause = exc.__cause__ if isinstance(exc, StatementError) else exc
+        return isinstance(cause, errors.LockNotAvailable)
+
+    @contextlib.contextmanager
+    def advisory_lock(self, key: str, timeout: float | None = None) -> typing.Iterator[None]:
+        lock_id = advisory_lock_id(key)
+        if timeout == 0:
+            [(acquired,)] = self.fetch_bound("SELECT pg_try_advisory_lock(%s)", [lock_id])
+            if not acquired:
+                raise LockTimeoutError(f'Lock "{key}" is held by another session.')
+        else:
+            if timeout is not None:
+                self.execute(self.lock_timeout_template.format(timeout=int(timeout * 1000)))
+            try:
+                self.execute_bound("SELECT pg_advisory_lock(%s)", [lock_id])
+            except errors.LockNotAvailable as ex:
+                raise LockTimeoutError(f'Could not acquire lock "{key}" within {timeout}s.') from ex
+            finally:
+                if timeout is not None:
+                    self.execute(self.reset_lock_timeout_template)
+
+        try:
+            yield
+        finally:
+            self.execute_bound("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+    def add_applied_migrations(
+        self, table: str, migrations: list[tuple[str, str]], stats: list[MigrationStats] | None = None
+    ) -> None:
+        self.execute_bound(*self.add_applied_migrations_query(table, migrations, stats))
+
+    def remove_applied_migrations(self, table: str, revisions: list[str]) -> None:
+        self.execute_bound(*self.remove_applied_migrations_query(table, revisions))
+
+    def count_applied_migrations(self, table: str, revisions: list[str]) -> int:
+        try:
+            [(count,)] = self.fetch_bound(f"SELECT COUNT(*) FROM {table} WHERE revision = ANY(%s)", [revisions])
+        except errors.UndefinedTable:
+            return 0
+        return count
+
+    def get_applied_migrations(self, table: str, limit: int | None = None) -> typing.Iterable[AppliedMigration]:
+        for row in self.fetch_bound(*self.applied_migrations_query(table, limit)):
+            yield {
+                "revision": row[0],
+                "name": row[1],
+                "applied": row[2],
+            }
+
+    def get_history(self, table: str, slowest: bool = False, limit: int | None = None) -> list[HistoryEntry]:
+        return [make_history_entry(row) for row in self.fetch_bound(*self.history_query(table, slowest, limit))]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import abc
+import math
+import os
+import tempfile
+import threading
+import time
+import typing
+
+from headlight.migrator import MigrateHooks, Migration
+from headlight.schema.ops import Operation
+
+Labels = typing.Tuple[typing.Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    return "+Inf" if math.isinf(value) else repr(float(value))
+
+
+class Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self.render_samples()]
+
+    @abc.abstractmethod
+    def render_samples(self) -> list[str]:
+        ...
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render_samples(self) -> list[str]:
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}" for labels, value in self.values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, labels: Labels, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help)
+        self.buckets = [*buckets, math.inf]
+        self.counts: dict[Labels, list[int]] = {}
+        self.sums: dict[Labels, float] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        counts = self.counts.setdefault(labels, [0] * len(self.buckets))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self.sums[labels] = self.sums.get(labels, 0.0) + value
+
+    def render_samples(self) -> list[str]:
+        lines = []
+        for labels, counts in self.counts.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(labels, le=format_value(bound))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(self.sums[labels])}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+class PrometheusHooks(MigrateHooks):
+    # writes metrics in the Prometheus text format for the textfile collector of node_exporter
+    def __init__(self, path: str, database: str, direction: str = "upgrade") -> None:
+        self.path = path
+        self.database = database
+        self.direction = direction
+        self._lock = threading.Lock()
+        self.migrations = Counter("headlight_migrations_total", "Migrations applied (or reverted).")
+        self.failures = Counter("headlight_migration_failures_total", "Migrations that failed.")
+        self.lock_wait = Counter(
+            "headlight_lock_wait_seconds_total", "Seconds spent in statements that timed out waiting for a lock."
+        )
+        self.lock_retries = Counter("headlight_lock_retries_total", "Statements retried after a lock timeout.")
+        self.migration_duration = Histogram("headlight_migration_duration_seconds", "Migration duration.")
+        self.statement_duration = Histogram("headlight_statement_duration_seconds", "Statement duration.")
+        self.last_run = Gauge("headlight_last_run_timestamp_seconds", "Unix time of the last migration run.")
+
+    def get_labels(self, migration: Migration) -> Labels:
+        return (("database", self.database), ("revision", migration.revision))
+
+    def after_migrate(self, migration: Migration, time_taken: float) -> None:
+        with self._lock:
+            self.migrations.inc((*self.get_labels(migration), ("direction", self.direction)))
+            self.migration_duration.observe(self.get_labels(migration), time_taken)
+
+    def on_error(self, migration: Migration, exc: Exception, time_taken: float) -> None:
+        with self._lock:
+            self.failures.inc(self.get_labels(migration))
+            self.migration_duration.observe(self.get_labels(migration), time_taken)
+
+    def on_lock_retry(self, migration: Migration, stmt: str, attempt: int, lock_wait: float) -> None:
+        with self._lock:
+            self.lock_retries.inc(self.get_labels(migration))
+            self.lock_wait.inc(self.get_labels(migration), lock_wait)
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        with self._lock:
+            self.statement_duration.observe(self.get_labels(migration), elapsed)
+
+    def after_run(self) -> None:
+        with self._lock:
+            self.last_run.set((("database", self.database),), time.time())
+            self.write()
+
+    def render(self) -> str:
+        metrics: list[Metric] = [
+            self.migrations,
+            self.failures,
+            self.lock_wait,
+            self.lock_retries,
+            self.migration_duration,
+            self.statement_duration,
+            self.last_run,
+        ]
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def write(self) -> None:
+        # the collector may read the file at any moment, so it is replaced at once and never seen half written
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".headlight-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
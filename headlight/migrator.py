@@ -1,21 +1,48 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+import abc
+import contextlib
 import datetime
+import functools
 import getpass
 import glob
+import hashlib
 import importlib
+import itertools
 import os
+import queue
+import random
+import socket
 import sys
+import threading
 import time
 import typing
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import TracebackType
 
-from headlight.database import create_database
-from headlight.drivers.base import AppliedMigration, DummyTransaction
+from headlight.database import ConnectionPool, default_pool
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    AppliedMigration,
+    DbDriver,
+    DummyTransaction,
+    HistoryEntry,
+    LockWait,
+    MigrationStats,
+    Progress,
+    StatementError,
+    TableStats,
+)
+from headlight.exceptions import HeadlightError
+from headlight.monitor import LockWatchdog, LockWatchdogPolicy, ProgressMonitor
+from headlight.profiler import Profiler
 from headlight.schema.builder import Blueprint
-from headlight.schema.ops import Operation
-from headlight.utils import colorize_sql
+from headlight.schema.ops import NOOP_SQL, BackfillOp, CreateIndexOp, Operation, coalesce_ops
+from headlight.tracing import AttributeValue, Tracer
+from headlight.utils import chunked, colorize_sql
 
 MIGRATION_TEMPLATE = """
 from headlight import Blueprint, types
@@ -31,6 +58,10 @@ def migrate(schema: Blueprint) -> None:
 """
 
 
+class SchemaNotFoundError(HeadlightError):
+    ...
+
+
 class MigrationError(Exception):
     def __init__(self, message: str, migration: Migration, stmt: str) -> None:
         super().__init__(message)
@@ -38,31 +69,121 @@ class MigrationError(Exception):
         self.stmt = stmt
 
 
+@dataclass
+class LoadedMigration:
+    transactional: bool
+    ops: list[Operation]
+    lock_timeout: float | None = None
+
+
+_loaded_migrations: dict[str, LoadedMigration] = {}
+_load_lock = threading.Lock()
+
+
+def load_migration(py_module: str) -> LoadedMigration:
+    # importing the module and building the blueprint is expensive, do it only once per process
+    with _load_lock:
+        if py_module not in _loaded_migrations:
+            mod = importlib.import_module(py_module)
+            schema = Blueprint()
+            mod.migrate(schema)
+            _loaded_migrations[py_module] = LoadedMigration(
+                ops=schema.get_ops(),
+                transactional=getattr(mod, "transactional", True),
+                lock_timeout=getattr(mod, "lock_timeout", None),
+            )
+        return _loaded_migrations[py_module]
+
+
 @dataclass
 class Migration:
     name: str
     file: str
     revision: str
-    transactional: bool
-    ops: list[Operation]
+    module: str
+
+    @property
+    def ops(self) -> list[Operation]:
+        return self.load().ops
+
+    @property
+    def transactional(self) -> bool:
+        return self.load().transactional
+
+    @property
+    def lock_timeout(self) -> float | None:
+        return self.load().lock_timeout
+
+    def load(self) -> LoadedMigration:
+        return load_migration(self.module)
 
     @classmethod
-    def from_py_module(cls, py_module: str) -> Migration:
-        mod = importlib.import_module(py_module)
-        filename = os.path.basename(typing.cast(str, mod.__file__))
+    def from_filename(cls, path: str) -> Migration:
+        filename = os.path.basename(path)
         revision = filename[:15]
         name, _, _ = filename[16:].rpartition(".")
+        return Migration(name=name, file=filename, revision=revision, module=filename.rpartition(".")[0])
+
+    @classmethod
+    def from_py_module(cls, py_module: str) -> Migration:
+        mod = importlib.import_module(py_module)
+        return cls.from_filename(typing.cast(str, mod.__file__))
 
-        schema = Blueprint()
-        mod.migrate(schema)
 
-        return Migration(
-            name=name,
-            file=filename,
-            revision=revision,
-            ops=schema.get_ops(),
-            transactional=getattr(mod, "transactional", True),
-        )
+@dataclass
+class RetryPolicy:
+    attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def get_delay(self, attempt: int) -> float:
+        # exponential backoff with jitter, so concurrent sessions do not retry in lockstep
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def find_migrations(directory: str) -> list[Migration]:
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    migration_files = glob.glob(f"{directory}/*.py")
+    return [Migration.from_filename(path) for path in sorted(migration_files) if "__init__" not in path]
+
+
+def load_migrations(directory: str) -> list[Migration]:
+    migrations = find_migrations(directory)
+    for migration in migrations:
+        migration.load()
+    return migrations
+
+
+def group_migrations(migrations: list[Migration], single_transaction: bool) -> list[list[Migration]]:
+    if not single_transaction:
+        return [[migration] for migration in migrations]
+
+    # consecutive transactional migrations share one transaction and one history update,
+    # a migration that commits in the middle (it is not transactional or has operations that run outside
+    # a transaction) always runs alone, so nothing is committed without its history
+    def runs_alone(migration: Migration) -> bool:
+        return not migration.transactional or any(not op.transactional for op in migration.ops)
+
+    groups: list[list[Migration]] = []
+    for migration in migrations:
+        if groups and not runs_alone(migration) and not runs_alone(groups[-1][-1]):
+            groups[-1].append(migration)
+        else:
+            groups.append([migration])
+    return groups
+
+
+def get_applied_by() -> str:
+    return f"{getpass.getuser()}@{socket.gethostname()}"
+
+
+def get_effective_lock_timeout(op: Operation, migration: Migration, default: float | None) -> float | None:
+    for timeout in [op.lock_timeout, migration.lock_timeout, default]:
+        if timeout is not None:
+            return timeout
+    return None
 
 
 @dataclass
@@ -83,31 +204,439 @@ class MigrateHooks:
     def on_error(self, migration: Migration, exc: Exception, time_taken: float) -> None:
         ...
 
+    def on_lock_retry(self, migration: Migration, stmt: str, attempt: int, lock_wait: float) -> None:
+        ...
+
+    def on_backfill_progress(self, migration: Migration, op: BackfillOp, rows: int, rows_per_second: float) -> None:
+        ...
+
+    def before_statement(self, migration: Migration, op: Operation, stmt: str) -> None:
+        ...
+
+    # not called for statements queued in pipeline mode, they have no timing of their own
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        ...
+
+    def on_progress(self, migration: Migration, progress: Progress) -> None:
+        ...
+
+    def on_lock_wait(self, migration: Migration, lock_wait: LockWait) -> None:
+        ...
+
+    def on_table_rewrite(self, migration: Migration, op: Operation, stmt: str, stats: TableStats) -> None:
+        ...
+
+    def on_monitor_error(self, migration: Migration, exc: Exception) -> None:
+        ...
+
+    def after_run(self) -> None:
+        ...
+
+
+class CompositeHooks(MigrateHooks):
+    def __init__(self, *hooks: MigrateHooks) -> None:
+        self.hooks = hooks
+
+    def before_migrate(self, migration: Migration) -> None:
+        for hook in self.hooks:
+            hook.before_migrate(migration)
+
+    def after_migrate(self, migration: Migration, time_taken: float) -> None:
+        for hook in self.hooks:
+            hook.after_migrate(migration, time_taken)
+
+    def on_error(self, migration: Migration, exc: Exception, time_taken: float) -> None:
+        for hook in self.hooks:
+            hook.on_error(migration, exc, time_taken)
+
+    def on_lock_retry(self, migration: Migration, stmt: str, attempt: int, lock_wait: float) -> None:
+        for hook in self.hooks:
+            hook.on_lock_retry(migration, stmt, attempt, lock_wait)
+
+    def on_backfill_progress(self, migration: Migration, op: BackfillOp, rows: int, rows_per_second: float) -> None:
+        for hook in self.hooks:
+            hook.on_backfill_progress(migration, op, rows, rows_per_second)
 
-class Migrator:
-    def __init__(self, url: str, directory: str, table_name: str = "migrations") -> None:
-        self.db = create_database(url)
+    def before_statement(self, migration: Migration, op: Operation, stmt: str) -> None:
+        for hook in self.hooks:
+            hook.before_statement(migration, op, stmt)
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        for hook in self.hooks:
+            hook.after_statement(migration, op, stmt, elapsed, rowcount)
+
+    def on_progress(self, migration: Migration, progress: Progress) -> None:
+        for hook in self.hooks:
+            hook.on_progress(migration, progress)
+
+    def on_lock_wait(self, migration: Migration, lock_wait: LockWait) -> None:
+        for hook in self.hooks:
+            hook.on_lock_wait(migration, lock_wait)
+
+    def on_table_rewrite(self, migration: Migration, op: Operation, stmt: str, stats: TableStats) -> None:
+        for hook in self.hooks:
+            hook.on_table_rewrite(migration, op, stmt, stats)
+
+    def on_monitor_error(self, migration: Migration, exc: Exception) -> None:
+        for hook in self.hooks:
+            hook.on_monitor_error(migration, exc)
+
+    def after_run(self) -> None:
+        for hook in self.hooks:
+            hook.after_run()
+
+
+@dataclass
+class StatementBatch:
+    statements: list[tuple[Operation, str]]
+    lock_timeout: float | None = None
+    transactional: bool = True
+    # executed before the batch, the lock timeout is set for the session outside a transaction
+    setup: list[str] = field(default_factory=list)
+    # sent in the same round trip as the statements
+    prefix: list[str] = field(default_factory=list)
+
+    @property
+    def stmts(self) -> list[str]:
+        return [stmt for _, stmt in self.statements]
+
+    @property
+    def backfill(self) -> BackfillOp | None:
+        # a backfill runs alone, it is never batched with other statements
+        op = self.statements[0][0]
+        return op if isinstance(op, BackfillOp) else None
+
+    def get_sql(self) -> list[str]:
+        return self.prefix + self.stmts
+
+    def get_rowcount(self, rowcount: int) -> int:
+        # the driver reports the row count of the last statement sent
+        return rowcount if len(self.statements) == 1 else -1
+
+
+class TransactionLockTimeout(StatementError):
+    # waiting inside the transaction would hold the locks taken by the statements before, the whole
+    # transaction is rolled back and retried instead
+    def __init__(self, message: str, stmt: str, lock_wait: float) -> None:
+        super().__init__(message, stmt)
+        self.lock_wait = lock_wait
+
+
+class LockRetry(Exception):
+    def __init__(self, migration: Migration, stmt: str, lock_wait: float, delay: float) -> None:
+        super().__init__(f"Retrying {migration.name} in {delay:.1f}s.")
+        self.migration = migration
+        self.stmt = stmt
+        self.lock_wait = lock_wait
+        self.delay = delay
+
+
+@dataclass
+class MigrationProgress:
+    # the number of statements a migration that commits midway has committed, a failed run resumes after them
+    revision: str
+    name: str
+    committed: int = 0
+
+
+class BaseMigrator(abc.ABC):
+    # everything but the I/O, shared by the synchronous and the asyncio migrators
+    def __init__(
+        self,
+        directory: str,
+        table_name: str = "migrations",
+        batch_size: int = 1,
+        single_transaction: bool = False,
+        wait_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        lock_retry: RetryPolicy | None = None,
+        coalesce: bool = False,
+        migrations: list[Migration] | None = None,
+        profiler: Profiler | None = None,
+        tracer: Tracer | None = None,
+        rewrite_threshold: int | None = None,
+        refuse_rewrites: bool = False,
+        statement_timings: bool = False,
+    ) -> None:
         self.directory = directory
         self.table = table_name
+        self.batch_size = batch_size
+        self.single_transaction = single_transaction
+        self.wait_timeout = wait_timeout
+        self.lock_timeout = lock_timeout
+        self.lock_retry = lock_retry
+        self.coalesce = coalesce
+        self.migrations = migrations
+        self.profiler = profiler
+        self.tracer = tracer or Tracer()
+        # rewrites of tables larger than this number of bytes are reported, or refused
+        self.rewrite_threshold = rewrite_threshold
+        self.refuse_rewrites = refuse_rewrites
+        # statements are sent one by one and not pipelined, so that each of them has its own timing and row count
+        self.statement_timings = statement_timings
 
-    def initialize_db(self) -> None:
-        self.db.create_migrations_table(self.table)
+    @property
+    @abc.abstractmethod
+    def dialect(self) -> DbDriver:
+        ...
+
+    @property
+    def backfill_table(self) -> str:
+        return f"{self.table}_backfill"
 
     def get_migrations(self) -> list[Migration]:
-        sys.path.insert(0, self.directory)
-        migration_files = glob.glob(f"{self.directory}/*.py")
+        if self.migrations is not None:
+            return self.migrations
+        return find_migrations(self.directory)
+
+    def group_migrations(self, migrations: list[Migration]) -> list[list[Migration]]:
+        return group_migrations(migrations, self.single_transaction)
+
+    def profile(self, migration: Migration, phase: str) -> typing.ContextManager[None]:
+        return self.profiler.phase(migration, phase) if self.profiler else contextlib.nullcontext()
+
+    def preload_migrations(self, migrations: list[Migration]) -> None:
+        # migrations are loaded lazily on first access,
+        # when profiling they are loaded up front so importing and building the blueprint are measured apart
+        if self.profiler is None:
+            return
+
+        for migration in migrations:
+            if migration.module in _loaded_migrations:
+                continue
+            with self.profile(migration, "import"):
+                importlib.import_module(migration.module)
+            with self.profile(migration, "build"):
+                migration.load()
+
+    def get_migration_attributes(self, migration: Migration) -> dict[str, AttributeValue]:
+        return {
+            "headlight.revision": migration.revision,
+            "headlight.migration": migration.name,
+            "headlight.file": migration.file,
+        }
+
+    def compile_migration(self, migration: Migration, *, upgrade: bool = True) -> list[tuple[Operation, str]]:
+        dialect = self.dialect
+        ops = coalesce_ops(migration.ops) if self.coalesce else migration.ops
+        statements = [(op, op.to_up_sql(dialect) if upgrade else op.to_down_sql(dialect)) for op in ops]
+        return statements if upgrade else list(reversed(statements))
+
+    def write_sql(self, writer: typing.TextIO, migration: Migration, statements: list[tuple[Operation, str]]) -> None:
+        sql = ";\n".join(stmt for _, stmt in statements) + ";"
+        writer.write("\n")
+        writer.write(colorize_sql(f"-- rev. {migration.revision} from {migration.file}"))
+        writer.write(colorize_sql(sql))
+        writer.write(colorize_sql(f"-- end rev. {migration.revision}"))
+        writer.write("\n")
+
+    def get_checksum(self, migration: Migration) -> str:
+        # computed from the operations as written, so it does not depend on options like coalesce
+        sql = BATCH_SEPARATOR.join(op.to_up_sql(self.dialect) for op in migration.ops)
+        return hashlib.sha256(sql.encode()).hexdigest()
+
+    def get_stats(
+        self,
+        migration: Migration,
+        statements: list[tuple[Operation, str]],
+        time_taken: float,
+        lock_wait: float,
+        *,
+        fake: bool,
+    ) -> MigrationStats:
+        stats = MigrationStats(checksum=self.get_checksum(migration), applied_by=get_applied_by())
+        if not fake:
+            stats["duration"] = time_taken
+            stats["lock_wait"] = lock_wait
+            stats["statement_count"] = len([stmt for _, stmt in statements if not stmt.startswith(NOOP_SQL)])
+        return stats
+
+    def get_transaction_groups(
+        self, statements: list[tuple[Operation, str]], *, transactional: bool
+    ) -> list[tuple[list[tuple[Operation, str]], bool]]:
+        # comment-only statements are not sent to the server,
+        # operations that cannot (or should not) run in a transaction suspend it: they commit the work done so far
+        # and the migration continues in a new transaction afterwards
+        executable = [(op, stmt) for op, stmt in statements if not stmt.startswith(NOOP_SQL)]
         return [
-            Migration.from_py_module(os.path.basename(py_module.replace(".py", "")))
-            for py_module in sorted(migration_files)
-            if "__init__" not in py_module
+            (list(group), transactional and not in_transaction)
+            for in_transaction, group in itertools.groupby(executable, key=lambda s: s[0].transactional)
         ]
 
+    def get_progress(
+        self,
+        migration: Migration,
+        groups: list[tuple[list[tuple[Operation, str]], bool]],
+        *,
+        transactional: bool,
+        upgrade: bool,
+    ) -> MigrationProgress | None:
+        # work committed before a later statement fails is not rolled back, running it again would fail
+        # (the column already exists, for example), so such migrations store their progress as they go
+        if transactional and not any(suspends for _, suspends in groups):
+            return None
+        return MigrationProgress(migration.revision, "headlight:upgrade" if upgrade else "headlight:downgrade")
+
+    def skip_committed(
+        self, groups: list[tuple[list[tuple[Operation, str]], bool]], committed: int
+    ) -> list[tuple[list[tuple[Operation, str]], bool]]:
+        remaining: list[tuple[list[tuple[Operation, str]], bool]] = []
+        for group, suspends in groups:
+            if committed >= len(group):
+                committed -= len(group)
+                continue
+            remaining.append((group[committed:], suspends))
+            committed = 0
+        return remaining
+
+    def plan_batches(
+        self, migration: Migration, statements: list[tuple[Operation, str]], *, transactional: bool
+    ) -> list[StatementBatch]:
+        def get_lock_timeout(statement: tuple[Operation, str]) -> float | None:
+            return get_effective_lock_timeout(statement[0], migration, self.lock_timeout)
+
+        # several statements sent at once run as one implicit transaction,
+        # so statements that must run outside a transaction are sent one by one
+        batch_size = self.batch_size if transactional and not self.statement_timings else 1
+
+        batches: list[StatementBatch] = []
+        for lock_timeout, group in itertools.groupby(statements, key=get_lock_timeout):
+            for chunk in chunked(list(group), batch_size):
+                batch = StatementBatch(chunk, lock_timeout, transactional)
+                if lock_timeout is not None:
+                    lock_timeout_stmt = self.dialect.lock_timeout_template.format(timeout=int(lock_timeout * 1000))
+                    if transactional:
+                        batch.prefix.append(lock_timeout_stmt)
+                    else:
+                        batch.setup.append(lock_timeout_stmt)
+                batches.append(batch)
+        return batches
+
+    def get_retry_delay(self, attempt: int, is_lock_timeout: bool) -> float | None:
+        # only statements that failed to acquire a lock are retried, None means the error is final
+        if self.lock_retry is None or attempt > self.lock_retry.attempts or not is_lock_timeout:
+            return None
+        return self.lock_retry.get_delay(attempt)
+
+    def get_lock_retry(self, migration: Migration, exc: Exception, attempt: int) -> LockRetry | None:
+        if not isinstance(exc, TransactionLockTimeout):
+            return None
+        delay = self.get_retry_delay(attempt + 1, True)
+        return LockRetry(migration, exc.stmt, exc.lock_wait, delay) if delay is not None else None
+
+    def get_rewrites(self, migration: Migration) -> list[tuple[Operation, str, str]]:
+        rewrites: list[tuple[Operation, str, str]] = []
+        for op, stmt in self.compile_migration(migration):
+            impact = op.get_impact()
+            if impact.table_effect == "rewrite" and impact.table_name is not None:
+                rewrites.append((op, stmt, impact.table_name))
+        return rewrites
+
+    def report_rewrite(
+        self,
+        migration: Migration,
+        op: Operation,
+        stmt: str,
+        table_name: str,
+        stats: TableStats | None,
+        hooks: MigrateHooks,
+    ) -> None:
+        assert self.rewrite_threshold is not None
+        if stats is None or stats.size <= self.rewrite_threshold:
+            return
+
+        hooks.on_table_rewrite(migration, op, stmt, stats)
+        if self.refuse_rewrites:
+            raise MigrationError(
+                f'The statement rewrites table "{table_name}" of {stats.size} bytes, '
+                f"larger than the limit of {self.rewrite_threshold} bytes.",
+                migration,
+                stmt,
+            )
+
+
+M = typing.TypeVar("M", bound="Migrator")
+
+
+class Migrator(BaseMigrator):
+    def __init__(
+        self,
+        url: str,
+        directory: str,
+        table_name: str = "migrations",
+        batch_size: int = 1,
+        single_transaction: bool = False,
+        wait_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        lock_retry: RetryPolicy | None = None,
+        coalesce: bool = False,
+        migrations: list[Migration] | None = None,
+        pool: ConnectionPool | None = None,
+        profiler: Profiler | None = None,
+        tracer: Tracer | None = None,
+        progress_interval: float | None = None,
+        lock_watchdog: LockWatchdogPolicy | None = None,
+        rewrite_threshold: int | None = None,
+        refuse_rewrites: bool = False,
+        statement_timings: bool = False,
+    ) -> None:
+        super().__init__(
+            directory,
+            table_name,
+            batch_size=batch_size,
+            single_transaction=single_transaction,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=lock_retry,
+            coalesce=coalesce,
+            migrations=migrations,
+            profiler=profiler,
+            tracer=tracer,
+            rewrite_threshold=rewrite_threshold,
+            refuse_rewrites=refuse_rewrites,
+            statement_timings=statement_timings,
+        )
+        self.url = url
+        self.pool = pool or default_pool
+        self.db = self.pool.acquire(url)
+        # the connection goes back to the pool on close() or when the migrator is garbage collected
+        self._release = weakref.finalize(self, self.pool.release, url, self.db)
+        self._release.atexit = False
+        self.progress_interval = progress_interval
+        self.lock_watchdog = lock_watchdog
+
+    @property
+    def dialect(self) -> DbDriver:
+        return self.db
+
+    def initialize_db(self) -> None:
+        # IF NOT EXISTS still locks the table, a table that is up to date is only read
+        if not self.db.is_migrations_table_current(self.table):
+            self.db.create_migrations_table(self.table)
+
+    def ensure_migrations_table(self) -> None:
+        # concurrent starts create the table one at a time under the run lock instead of racing on the catalog
+        if not self.db.is_migrations_table_current(self.table):
+            with self.run_lock():
+                self.initialize_db()
+
     def get_applied_migrations(self, limit: int | None = None) -> dict[str, AppliedMigration]:
         return {am["revision"]: am for am in self.db.get_applied_migrations(self.table, limit)}
 
     def get_pending_migrations(self) -> list[Migration]:
-        applied = self.get_applied_migrations()
-        return [migration for migration in self.get_migrations() if migration.revision not in applied]
+        migrations = self.get_migrations()
+        missing = self.db.get_missing_revisions(self.table, [migration.revision for migration in migrations])
+        return [migration for migration in migrations if migration.revision in missing]
+
+    def is_up_to_date(self) -> bool:
+        # file names and one indexed lookup are enough, no module imports and no DDL
+        revisions = [migration.revision for migration in self.get_migrations()]
+        if not revisions:
+            return True
+        return self.db.count_applied_migrations(self.table, revisions) == len(revisions)
+
+    def run_lock(self) -> typing.ContextManager[None]:
+        return self.db.advisory_lock(f"headlight:{self.table}", self.wait_timeout)
 
     def upgrade(
         self,
@@ -116,11 +645,23 @@ class Migrator:
         fake: bool = False,
         print_sql: bool = False,
         hooks: MigrateHooks | None = None,
-    ) -> None:
-        pending = self.get_pending_migrations()
+    ) -> list[Migration]:
+        hooks = hooks or MigrateHooks()
+        try:
+            with self.tracer.span("headlight.upgrade", {"headlight.table": self.table}) as span, self.run_lock():
+                self.initialize_db()
+                # the pending set is computed under the lock, so concurrent runs that waited for it see no work
+                pending = self.get_pending_migrations()
+                self.preload_migrations(pending)
+                span.attributes["headlight.migrations"] = len(pending)
+                if not fake:
+                    self.check_rewrites(pending, hooks)
 
-        for migration in pending:
-            self.apply_migration(migration, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks)
+                for group in self.group_migrations(pending):
+                    self.apply_migrations(group, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks)
+        finally:
+            hooks.after_run()
+        return pending
 
     def downgrade(
         self,
@@ -130,15 +671,36 @@ class Migrator:
         dry_run: bool = False,
         print_sql: bool = False,
         hooks: MigrateHooks | None = None,
-    ) -> None:
-        applied = self.get_applied_migrations(steps)
-        pending = [migration for migration in self.get_migrations() if migration.revision in applied]
+    ) -> list[Migration]:
+        hooks = hooks or MigrateHooks()
+        try:
+            with self.tracer.span("headlight.downgrade", {"headlight.table": self.table}) as span, self.run_lock():
+                self.initialize_db()
+                applied = self.get_applied_migrations(steps)
+                pending = [migration for migration in self.get_migrations() if migration.revision in applied]
+                pending = list(reversed(sorted(pending, key=lambda x: x.revision)))
+                self.preload_migrations(pending)
+                span.attributes["headlight.migrations"] = len(pending)
+
+                for group in self.group_migrations(pending):
+                    self.apply_migrations(
+                        group, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks, upgrade=False
+                    )
+        finally:
+            hooks.after_run()
+        return pending
 
-        for migration in reversed(sorted(pending, key=lambda x: x.revision)):
-            self.apply_migration(migration, dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks, upgrade=False)
+    def check_rewrites(self, migrations: list[Migration], hooks: MigrateHooks) -> None:
+        # a rewrite holds ACCESS EXCLUSIVE lock while the table is copied, large ones are caught before anything runs
+        if self.rewrite_threshold is None:
+            return
 
-    def reset(self, hooks: MigrateHooks | None = None) -> None:
-        self.downgrade(steps=999_999, hooks=hooks)
+        for migration in migrations:
+            for op, stmt, table_name in self.get_rewrites(migration):
+                self.report_rewrite(migration, op, stmt, table_name, self.db.get_table_stats(table_name), hooks)
+
+    def reset(self, hooks: MigrateHooks | None = None) -> list[Migration]:
+        return self.downgrade(steps=999_999, hooks=hooks)
 
     def apply_migration(
         self,
@@ -151,42 +713,294 @@ class Migrator:
         hooks: MigrateHooks | None = None,
         writer: typing.TextIO = sys.stderr,
     ) -> None:
-        tx = self.db.transaction() if migration.transactional else DummyTransaction(self.db)
-        start_time = time.time()
+        self.apply_migrations(
+            [migration],
+            fake=fake,
+            dry_run=dry_run,
+            upgrade=upgrade,
+            print_sql=print_sql,
+            hooks=hooks,
+            writer=writer,
+        )
+
+    def apply_migrations(
+        self,
+        migrations: list[Migration],
+        *,
+        fake: bool,
+        dry_run: bool,
+        upgrade: bool = True,
+        print_sql: bool = False,
+        hooks: MigrateHooks | None = None,
+        writer: typing.TextIO = sys.stderr,
+    ) -> None:
         hooks = hooks or MigrateHooks()
-        current_stmt = ""
+        attempt = 0
+        retried_lock_wait: dict[str, float] = {}
+        while True:
+            try:
+                return self.run_migrations(
+                    migrations,
+                    fake=fake,
+                    dry_run=dry_run,
+                    upgrade=upgrade,
+                    print_sql=print_sql and attempt == 0,
+                    hooks=hooks,
+                    writer=writer,
+                    attempt=attempt,
+                    retried_lock_wait=retried_lock_wait,
+                )
+            except LockRetry as retry:
+                # the transaction is rolled back, no locks are held while waiting
+                attempt += 1
+                revision = retry.migration.revision
+                retried_lock_wait[revision] = retried_lock_wait.get(revision, 0.0) + retry.lock_wait
+                if self.profiler:
+                    self.profiler.add(retry.migration, "lock_wait", retry.lock_wait)
+                hooks.on_lock_retry(retry.migration, retry.stmt, attempt, retry.lock_wait)
+                time.sleep(retry.delay)
+
+    def run_migrations(
+        self,
+        migrations: list[Migration],
+        *,
+        fake: bool,
+        dry_run: bool,
+        upgrade: bool,
+        print_sql: bool,
+        hooks: MigrateHooks,
+        writer: typing.TextIO,
+        attempt: int,
+        retried_lock_wait: dict[str, float],
+    ) -> None:
+        transactional = all(migration.transactional for migration in migrations)
+        tx = self.db.transaction() if transactional else DummyTransaction(self.db)
+        start_time = time.time()
+        migration = migrations[0]
+        # errors surface only when the pipeline is synced (after every migration), so statements that have to be
+        # retried or must not share the round trip with others are not pipelined
+        use_pipeline = (
+            transactional
+            and self.lock_retry is None
+            and not self.statement_timings
+            and all(op.transactional for m in migrations for op in m.ops)
+        )
+        stats: list[MigrationStats] = []
+        backfills: list[tuple[Migration, BackfillOp]] = []
+        progresses: list[MigrationProgress] = []
         try:
-            with tx, self.db.lock(self.table):
-                hooks.before_migrate(migration)
-                stmts = [(op.to_up_sql(self.db) if upgrade else op.to_down_sql(self.db)) for op in migration.ops]
-                if not upgrade:
-                    stmts = list(reversed(stmts))
-
-                sql = ";\n".join(stmts) + ";"
-                if print_sql:
-                    writer.write("\n")
-                    writer.write(colorize_sql(f"-- rev. {migration.revision} from {migration.file}"))
-                    writer.write(colorize_sql(sql))
-                    writer.write(colorize_sql(f"-- end rev. {migration.revision}"))
-                    writer.write("\n")
+            with self.db.pipeline() if use_pipeline else contextlib.nullcontext(), tx:
+                for migration in migrations:
+                    with (
+                        self.tracer.span("headlight.migration", self.get_migration_attributes(migration)),
+                        self.monitor(migration, hooks),
+                    ):
+                        start_time = time.time()
+                        lock_wait = 0.0
+                        hooks.before_migrate(migration)
+                        with self.profile(migration, "compile"):
+                            statements = self.compile_migration(migration, upgrade=upgrade)
+                        if print_sql:
+                            self.write_sql(writer, migration, statements)
 
-                if not dry_run:
-                    if not fake:
-                        for stmt in stmts:
-                            current_stmt = stmt
-                            self.db.execute(stmt)
+                        execute_start_time = time.time()
+                        if not dry_run and not fake:
+                            groups = self.get_transaction_groups(statements, transactional=transactional)
+                            backfills.extend(
+                                (migration, op) for group, _ in groups for op, _ in group if isinstance(op, BackfillOp)
+                            )
+                            progress = self.get_progress(
+                                migration, groups, transactional=transactional, upgrade=upgrade
+                            )
+                            if progress:
+                                progresses.append(progress)
+                                self.load_progress(progress)
+                                groups = self.skip_committed(groups, progress.committed)
+                            for group, suspends in groups:
+                                if progress and suspends:
+                                    # saved in the transaction, so that it is committed together with the work
+                                    self.save_progress(progress)
+                                with tx.suspended() if suspends else contextlib.nullcontext():
+                                    lock_wait += self.execute_statements(
+                                        migration,
+                                        group,
+                                        transactional=transactional and not suspends,
+                                        hooks=hooks,
+                                        progress=progress,
+                                    )
 
-                    if upgrade:
-                        self.db.add_applied_migration(self.table, migration.revision, migration.name)
-                    else:
-                        self.db.remove_applied_migration(self.table, migration.revision)
+                        # the errors of queued statements are raised here, while the migration is still current
+                        self.db.sync_pipeline()
+                        if self.profiler:
+                            self.profiler.add(migration, "lock_wait", lock_wait)
+                            self.profiler.add(migration, "execute", time.time() - execute_start_time - lock_wait)
+
+                        time_taken = time.time() - start_time
+                        hooks.after_migrate(migration, time_taken)
+                        lock_wait += retried_lock_wait.get(migration.revision, 0.0)
+                        stats.append(self.get_stats(migration, statements, time_taken, lock_wait, fake=fake))
+
+                # the history update and the commit are shared by the group, they are recorded on its last migration
+                if not dry_run:
+                    with self.profile(migrations[-1], "history"):
+                        if upgrade:
+                            self.db.add_applied_migrations(
+                                self.table, [(m.revision, m.name) for m in migrations], stats
+                            )
+                            # backfill positions are kept until the migration is recorded,
+                            # so a run that fails after a backfill resumes it instead of starting over
+                            for m, op in backfills:
+                                self.db.clear_backfill_position(self.backfill_table, m.revision, op.name)
+                        else:
+                            self.db.remove_applied_migrations(self.table, [m.revision for m in migrations])
+                        for progress in progresses:
+                            self.db.clear_backfill_position(self.backfill_table, progress.revision, progress.name)
+                commit_start_time = time.time()
 
-                time_taken = time.time() - start_time
-                hooks.after_migrate(migration, time_taken)
+            if self.profiler:
+                # in pipeline mode this also includes the queued history update
+                self.profiler.add(migrations[-1], "commit", time.time() - commit_start_time)
         except Exception as ex:
+            retry = self.get_lock_retry(migration, ex, attempt)
+            if retry:
+                raise retry from ex
             time_taken = time.time() - start_time
             hooks.on_error(migration, ex, time_taken)
-            raise MigrationError(str(ex), migration, current_stmt) from ex
+            raise MigrationError(str(ex), migration, ex.stmt if isinstance(ex, StatementError) else "") from ex
+
+    @contextlib.contextmanager
+    def monitor(self, migration: Migration, hooks: MigrateHooks) -> typing.Iterator[None]:
+        pid = self.db.get_backend_pid() if self.progress_interval or self.lock_watchdog else None
+        on_error = functools.partial(hooks.on_monitor_error, migration)
+        with contextlib.ExitStack() as stack:
+            # the migrating connection is busy running the statement, monitors use their own connections
+            if pid is not None and self.progress_interval is not None:
+                db = stack.enter_context(self.pool.connection(self.url))
+                on_progress = functools.partial(hooks.on_progress, migration)
+                stack.enter_context(ProgressMonitor(db, pid, on_progress, self.progress_interval, on_error))
+            if pid is not None and self.lock_watchdog is not None:
+                db = stack.enter_context(self.pool.connection(self.url))
+                on_lock_wait = functools.partial(hooks.on_lock_wait, migration)
+                stack.enter_context(LockWatchdog(db, pid, on_lock_wait, self.lock_watchdog, on_error))
+            yield
+
+    def execute_statements(
+        self,
+        migration: Migration,
+        statements: list[tuple[Operation, str]],
+        *,
+        transactional: bool,
+        hooks: MigrateHooks,
+        progress: MigrationProgress | None = None,
+    ) -> float:
+        uses_lock_timeout = False
+        lock_wait = 0.0
+        try:
+            for batch in self.plan_batches(migration, statements, transactional=transactional):
+                uses_lock_timeout = uses_lock_timeout or batch.lock_timeout is not None
+                lock_wait += self.execute_batch(migration, batch, hooks=hooks)
+                if progress:
+                    progress.committed += len(batch.statements)
+                    # outside a transaction every statement commits on its own
+                    if not transactional:
+                        self.save_progress(progress)
+        except Exception:
+            # outside a transaction the timeout is set for the session and would outlive the failed statement,
+            # inside one it is discarded together with the aborted transaction
+            if uses_lock_timeout and not transactional:
+                self.db.execute(self.db.reset_lock_timeout_template)
+            raise
+
+        if uses_lock_timeout:
+            self.db.execute(self.db.reset_lock_timeout_template)
+        return lock_wait
+
+    def execute_batch(self, migration: Migration, batch: StatementBatch, *, hooks: MigrateHooks) -> float:
+        self.drop_invalid_indexes([op for op, _ in batch.statements])
+        for stmt in batch.setup:
+            self.db.execute(stmt)
+        for op, stmt in batch.statements:
+            hooks.before_statement(migration, op, stmt)
+
+        # the time spent in attempts that failed to acquire a lock
+        total_lock_wait = 0.0
+        attempt = 0
+        batch_start_time = time.time()
+        with self.tracer.span("headlight.statement", {"db.statement": BATCH_SEPARATOR.join(batch.stmts)}) as span:
+            while True:
+                start_time = time.time()
+                attempt_span = self.tracer.start_span("headlight.execute", {"headlight.attempt": attempt + 1})
+                try:
+                    if batch.backfill:
+                        rowcount = self.run_backfill(migration, batch.backfill, hooks=hooks)
+                    else:
+                        self.db.execute_many(batch.get_sql())
+                        rowcount = batch.get_rowcount(self.db.rowcount)
+                    self.tracer.end_span(attempt_span)
+                    span.attributes["headlight.rowcount"] = rowcount
+
+                    # statements sent in one round trip share its elapsed time,
+                    # queued statements have neither an elapsed time nor a row count yet
+                    elapsed = time.time() - batch_start_time
+                    if not self.db.in_pipeline():
+                        for op, stmt in batch.statements:
+                            hooks.after_statement(migration, op, stmt, elapsed, rowcount)
+                    return total_lock_wait
+                except StatementError as ex:
+                    self.drop_invalid_indexes([op for op, _ in batch.statements])
+                    lock_timeout = self.db.is_lock_timeout(ex)
+                    delay = self.get_retry_delay(attempt + 1, lock_timeout)
+                    if lock_timeout:
+                        # the failed attempt was spent waiting for a lock
+                        attempt_span.name = "headlight.lock_wait"
+                    self.tracer.end_span(attempt_span, ex)
+                    lock_wait = time.time() - start_time
+                    if batch.transactional and lock_timeout:
+                        raise TransactionLockTimeout(str(ex), ex.stmt, total_lock_wait + lock_wait) from ex
+                    if delay is None:
+                        raise
+
+                    total_lock_wait += lock_wait
+                    attempt += 1
+                    hooks.on_lock_retry(migration, ex.stmt, attempt, lock_wait)
+                    time.sleep(delay)
+
+    def load_progress(self, progress: MigrationProgress) -> None:
+        self.db.create_backfill_table(self.backfill_table)
+        position = self.db.get_backfill_position(self.backfill_table, progress.revision, progress.name)
+        progress.committed = int(position or 0)
+
+    def save_progress(self, progress: MigrationProgress) -> None:
+        self.db.save_backfill_position(self.backfill_table, progress.revision, progress.name, str(progress.committed))
+
+    def run_backfill(self, migration: Migration, op: BackfillOp, *, hooks: MigrateHooks) -> int:
+        # the position of the last processed batch is stored with each batch, an interrupted run resumes from it
+        progress_table = self.backfill_table
+        self.db.create_backfill_table(progress_table)
+        position = self.db.get_backfill_position(progress_table, migration.revision, op.name)
+
+        rows = 0
+        start_time = time.time()
+        while True:
+            position, count = self.db.run_backfill_batch(op, progress_table, migration.revision, position)
+            if position is None:
+                break
+
+            rows += count
+            hooks.on_backfill_progress(migration, op, rows, rows / max(time.time() - start_time, 1e-6))
+            if op.sleep:
+                time.sleep(op.sleep)
+        return rows
+
+    def drop_invalid_indexes(self, ops: list[Operation]) -> None:
+        # a failed or killed concurrent build leaves an INVALID index behind, it is dropped before every build:
+        # the next attempt would fail on it, or keep it for good with IF NOT EXISTS
+        for op in ops:
+            if isinstance(op, CreateIndexOp) and op.concurrently:
+                self.db.drop_invalid_index(op.index.name)
+
+    def get_history(self, slowest: bool = False, limit: int | None = None) -> list[HistoryEntry]:
+        return self.db.get_history(self.table, slowest=slowest, limit=limit)
 
     def status(self) -> typing.Iterable[MigrationStatus]:
         applied = self.get_applied_migrations()
@@ -198,13 +1012,289 @@ class Migrator:
                 applied=migration.revision in applied,
             )
 
+    def close(self) -> None:
+        self._release()
+
+    def __enter__(self: M) -> M:
+        return self
+
+    def __exit__(self, exc_type: typing.Type[Exception], exc: BaseException, tb: TracebackType) -> None:
+        self.close()
+
     @classmethod
-    def new(cls, database_url: str, directory: str = "migrations", table_name: str = "migrations") -> Migrator:
-        migrator = Migrator(url=database_url, directory=directory, table_name=table_name)
-        migrator.initialize_db()
+    def new(
+        cls,
+        database_url: str,
+        directory: str = "migrations",
+        table_name: str = "migrations",
+        batch_size: int = 1,
+        single_transaction: bool = False,
+        wait_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        lock_retry: RetryPolicy | None = None,
+        coalesce: bool = False,
+        migrations: list[Migration] | None = None,
+        pool: ConnectionPool | None = None,
+        profiler: Profiler | None = None,
+        tracer: Tracer | None = None,
+        progress_interval: float | None = None,
+        lock_watchdog: LockWatchdogPolicy | None = None,
+        rewrite_threshold: int | None = None,
+        refuse_rewrites: bool = False,
+        statement_timings: bool = False,
+    ) -> Migrator:
+        migrator = Migrator(
+            url=database_url,
+            directory=directory,
+            table_name=table_name,
+            batch_size=batch_size,
+            single_transaction=single_transaction,
+            wait_timeout=wait_timeout,
+            lock_timeout=lock_timeout,
+            lock_retry=lock_retry,
+            coalesce=coalesce,
+            migrations=migrations,
+            pool=pool,
+            profiler=profiler,
+            tracer=tracer,
+            progress_interval=progress_interval,
+            lock_watchdog=lock_watchdog,
+            rewrite_threshold=rewrite_threshold,
+            refuse_rewrites=refuse_rewrites,
+            statement_timings=statement_timings,
+        )
+        migrator.ensure_migrations_table()
         return migrator
 
 
+R = typing.TypeVar("R")
+
+
+@dataclass
+class DatabaseResult(typing.Generic[R]):
+    database_url: str
+    result: R | None = None
+    error: Exception | None = None
+    time_taken: float = 0.0
+    done: bool = False
+
+    @property
+    def skipped(self) -> bool:
+        return not self.done
+
+
+@dataclass
+class MultiMigrator:
+    database_urls: list[str]
+    directory: str
+    table_name: str = "migrations"
+    concurrency: int = 4
+    fail_fast: bool = True
+    options: dict[str, typing.Any] = field(default_factory=dict)
+
+    def get_migrations(self) -> list[Migration]:
+        # all databases share one migration set, every module is imported and compiled to ops only once
+        return load_migrations(self.directory)
+
+    def create_migrator(self, database_url: str, migrations: list[Migration]) -> Migrator:
+        return Migrator.new(database_url, self.directory, self.table_name, migrations=migrations, **self.options)
+
+    def run(self, callback: typing.Callable[[Migrator], R]) -> list[DatabaseResult[R]]:
+        migrations = self.get_migrations()
+        results = [DatabaseResult[R](database_url=url) for url in self.database_urls]
+
+        def work(result: DatabaseResult[R]) -> DatabaseResult[R]:
+            start_time = time.time()
+            try:
+                with self.create_migrator(result.database_url, migrations) as migrator:
+                    result.result = callback(migrator)
+            except Exception as ex:
+                result.error = ex
+            finally:
+                result.time_taken = time.time() - start_time
+                result.done = True
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as executor:
+            futures = [executor.submit(work, result) for result in results]
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                if future.result().error is not None and self.fail_fast:
+                    # databases that have not started yet are skipped, running ones finish their work
+                    for pending in futures:
+                        pending.cancel()
+
+        return results
+
+    def upgrade(
+        self,
+        *,
+        dry_run: bool = False,
+        fake: bool = False,
+        print_sql: bool = False,
+        hooks: MigrateHooks | None = None,
+    ) -> list[DatabaseResult[list[Migration]]]:
+        return self.run(lambda migrator: migrator.upgrade(dry_run=dry_run, fake=fake, print_sql=print_sql, hooks=hooks))
+
+    def status(self) -> list[DatabaseResult[list[MigrationStatus]]]:
+        return self.run(lambda migrator: list(migrator.status()))
+
+
+CompiledMigrations = typing.Dict[typing.Tuple[str, bool], typing.List[typing.Tuple[Operation, str]]]
+_compile_lock = threading.Lock()
+
+
+class SchemaMigrator(Migrator):
+    def __init__(
+        self,
+        url: str,
+        directory: str,
+        table_name: str = "migrations",
+        compiled: CompiledMigrations | None = None,
+        shared_schemas: list[str] | None = None,
+        **options: typing.Any,
+    ) -> None:
+        super().__init__(url, directory, table_name, **options)
+        self.schema = "public"
+        self.compiled: CompiledMigrations = compiled if compiled is not None else {}
+        # schemas with objects all tenants use (extensions, for example), searched after the tenant schema
+        self.shared_schemas = shared_schemas or []
+
+    def use_schema(self, schema: str) -> None:
+        # a missing schema would be skipped by search_path and the DDL would land in the next one
+        if not self.db.schema_exists(schema):
+            raise SchemaNotFoundError(f'Schema "{schema}" does not exist.')
+
+        # unqualified names, the history table included, resolve to the tenant schema only
+        self.schema = schema
+        self.db.set_search_path([schema, *(shared for shared in self.shared_schemas if shared != schema)])
+
+    def run_lock(self) -> typing.ContextManager[None]:
+        return self.db.advisory_lock(f"headlight:{self.schema}:{self.table}", self.wait_timeout)
+
+    def compile_migration(self, migration: Migration, *, upgrade: bool = True) -> list[tuple[Operation, str]]:
+        # the SQL does not depend on the schema, it is compiled once and replayed in every tenant
+        key = (migration.revision, upgrade)
+        with _compile_lock:
+            if key not in self.compiled:
+                self.compiled[key] = super().compile_migration(migration, upgrade=upgrade)
+            return self.compiled[key]
+
+
+@dataclass
+class SchemaResult(typing.Generic[R]):
+    schema: str
+    result: R | None = None
+    error: Exception | None = None
+    time_taken: float = 0.0
+    done: bool = False
+
+    @property
+    def skipped(self) -> bool:
+        return not self.done
+
+
+@dataclass
+class TenantMigrator:
+    database_url: str
+    directory: str
+    schemas: list[str] = field(default_factory=list)
+    schema_pattern: str | None = None
+    table_name: str = "migrations"
+    concurrency: int = 4
+    fail_fast: bool = False
+    shared_schemas: list[str] = field(default_factory=list)
+    options: dict[str, typing.Any] = field(default_factory=dict)
+
+    def get_schemas(self, db: DbDriver) -> list[str]:
+        schemas = list(self.schemas)
+        if self.schema_pattern is not None:
+            schemas.extend(schema for schema in db.get_schemas(self.schema_pattern) if schema not in schemas)
+        return schemas
+
+    def create_migrator(self, migrations: list[Migration], compiled: CompiledMigrations) -> SchemaMigrator:
+        return SchemaMigrator(
+            self.database_url,
+            self.directory,
+            self.table_name,
+            compiled=compiled,
+            shared_schemas=self.shared_schemas,
+            migrations=migrations,
+            **self.options,
+        )
+
+    def run(
+        self,
+        callback: typing.Callable[[SchemaMigrator], R],
+        on_progress: typing.Callable[[SchemaResult[R], int, int], None] | None = None,
+    ) -> list[SchemaResult[R]]:
+        migrations = load_migrations(self.directory)
+        compiled: CompiledMigrations = {}
+
+        # a small pool of connections is shared by all schemas, each connection serves one schema at a time
+        pool: queue.Queue[SchemaMigrator] = queue.Queue()
+        try:
+            first = self.create_migrator(migrations, compiled)
+            pool.put(first)
+            schemas = self.get_schemas(first.db)
+            for _ in range(min(self.concurrency, len(schemas)) - 1):
+                pool.put(self.create_migrator(migrations, compiled))
+
+            results = [SchemaResult[R](schema=schema) for schema in schemas]
+
+            def work(result: SchemaResult[R]) -> SchemaResult[R]:
+                migrator = pool.get()
+                start_time = time.time()
+                try:
+                    migrator.use_schema(result.schema)
+                    migrator.ensure_migrations_table()
+                    result.result = callback(migrator)
+                except Exception as ex:
+                    result.error = ex
+                finally:
+                    result.time_taken = time.time() - start_time
+                    result.done = True
+                    pool.put(migrator)
+                return result
+
+            # every schema keeps its own history, a failed or interrupted run continues where it stopped when repeated
+            with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as executor:
+                futures = [executor.submit(work, result) for result in results]
+                completed = 0
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    completed += 1
+                    result = future.result()
+                    if on_progress:
+                        on_progress(result, completed, len(results))
+                    if result.error is not None and self.fail_fast:
+                        for pending in futures:
+                            pending.cancel()
+        finally:
+            # connections opened before a failure, while the pool was built included, are not left behind
+            while not pool.empty():
+                pool.get().close()
+        return results
+
+    def upgrade(
+        self,
+        *,
+        dry_run: bool = False,
+        fake: bool = False,
+        hooks: MigrateHooks | None = None,
+        on_progress: typing.Callable[[SchemaResult[list[Migration]], int, int], None] | None = None,
+    ) -> list[SchemaResult[list[Migration]]]:
+        return self.run(
+            lambda migrator: migrator.upgrade(dry_run=dry_run, fake=fake, hooks=hooks),
+            on_progress=on_progress,
+        )
+
+    def status(self) -> list[SchemaResult[list[MigrationStatus]]]:
+        return self.run(lambda migrator: list(migrator.status()))
+
+
 def create_migration_template(directory: str, name: str) -> str:
     base_dir = os.path.abspath(directory)
     os.makedirs(base_dir, exist_ok=True)
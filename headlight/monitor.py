@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import abc
+import contextlib
+import threading
+import time
+import typing
+from types import TracebackType
+
+from headlight.drivers.base import DbDriver, LockWait, Progress
+
+
+class BackgroundMonitor(abc.ABC):
+    # watches the session running a migration (pid) through another connection, from a background thread
+    def __init__(
+        self,
+        db: DbDriver,
+        pid: int,
+        interval: float = 1.0,
+        on_error: typing.Callable[[Exception], None] | None = None,
+    ) -> None:
+        self.db = db
+        self.pid = pid
+        self.interval = interval
+        self.on_error = on_error
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.run, name=f"headlight-{type(self).__name__}-{pid}", daemon=True)
+
+    @abc.abstractmethod
+    def check(self) -> None:
+        ...
+
+    def run(self) -> None:
+        failing = False
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+                failing = False
+            except Exception as ex:
+                # monitoring must never break the migration, but the watchdog enforces a policy,
+                # so a failed poll is reported (once until a poll succeeds) and polling goes on
+                if self.on_error and not failing:
+                    with contextlib.suppress(Exception):
+                        self.on_error(ex)
+                failing = True
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self: M) -> M:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: typing.Type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+
+M = typing.TypeVar("M", bound=BackgroundMonitor)
+
+
+class ProgressMonitor(BackgroundMonitor):
+    # polls the progress of a statement running in another session
+    def __init__(
+        self,
+        db: DbDriver,
+        pid: int,
+        callback: typing.Callable[[Progress], None],
+        interval: float = 1.0,
+        on_error: typing.Callable[[Exception], None] | None = None,
+    ) -> None:
+        super().__init__(db, pid, interval, on_error)
+        self.callback = callback
+        self._phase: tuple[str | None, str | None] | None = None
+        self._phase_start: tuple[float, float] | None = None
+
+    def estimate_eta(self, progress: Progress, now: float) -> float | None:
+        # the rate is measured since the first observation of the current phase, phases progress at different speeds
+        fraction = progress.fraction
+        phase = (progress.command, progress.phase)
+        if fraction is None or phase != self._phase or self._phase_start is None:
+            self._phase = phase
+            self._phase_start = (now, fraction or 0.0)
+            return None
+
+        start_time, start_fraction = self._phase_start
+        if fraction <= start_fraction:
+            return None
+        return (now - start_time) * (1 - fraction) / (fraction - start_fraction)
+
+    def poll(self) -> Progress | None:
+        progress = self.db.get_progress(self.pid)
+        if progress is None or progress.state != "active":
+            # the backend is between statements
+            self._phase = self._phase_start = None
+            return None
+
+        progress.eta = self.estimate_eta(progress, time.monotonic())
+        return progress
+
+    def check(self) -> None:
+        progress = self.poll()
+        if progress:
+            self.callback(progress)
+
+
+@dataclass
+class LockWatchdogPolicy:
+    interval: float = 1.0
+    # report blockers once a statement waits for a lock longer than this
+    report_after: float = 1.0
+    # cancel the migration statement, which fails the migration
+    abort_after: float | None = None
+    # terminate blocking sessions that are idle in transaction, cancelling them would not release their locks
+    terminate_idle_blockers_after: float | None = None
+
+
+class LockWatchdog(BackgroundMonitor):
+    def __init__(
+        self,
+        db: DbDriver,
+        pid: int,
+        callback: typing.Callable[[LockWait], None],
+        policy: LockWatchdogPolicy,
+        on_error: typing.Callable[[Exception], None] | None = None,
+    ) -> None:
+        super().__init__(db, pid, policy.interval, on_error)
+        self.callback = callback
+        self.policy = policy
+        self.aborted = False
+        self._wait_start: float | None = None
+        self._terminated: set[int] = set()
+
+    def apply_policy(self, lock_wait: LockWait) -> str | None:
+        abort_after = self.policy.abort_after
+        if abort_after is not None and lock_wait.waited >= abort_after and not self.aborted:
+            self.aborted = self.db.cancel_backend(self.pid)
+            return "aborted the migration" if self.aborted else None
+
+        terminate_after = self.policy.terminate_idle_blockers_after
+        if terminate_after is not None and lock_wait.waited >= terminate_after:
+            idle_blockers = [
+                blocker
+                for blocker in lock_wait.blockers
+                if blocker.idle_in_transaction and blocker.pid not in self._terminated
+            ]
+            terminated = [blocker.pid for blocker in idle_blockers if self.db.terminate_backend(blocker.pid)]
+            self._terminated.update(terminated)
+            if terminated:
+                return "terminated idle in transaction session(s) " + ", ".join(str(pid) for pid in terminated)
+        return None
+
+    def poll(self, now: float) -> LockWait | None:
+        blockers = self.db.get_blocking_sessions(self.pid)
+        if not blockers:
+            self._wait_start = None
+            return None
+
+        # measured from the first poll that saw the statement blocked
+        if self._wait_start is None:
+            self._wait_start = now
+        return LockWait(
+            lock=self.db.get_awaited_lock(self.pid),
+            waited=now - self._wait_start,
+            blockers=blockers,
+            waiters=self.db.get_waiting_sessions(self.pid),
+        )
+
+    def check(self) -> None:
+        lock_wait = self.poll(time.monotonic())
+        if lock_wait is None:
+            return
+
+        lock_wait.action = self.apply_policy(lock_wait)
+        if lock_wait.waited >= self.policy.report_after or lock_wait.action:
+            self.callback(lock_wait)
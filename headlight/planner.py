@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import typing
+
+from headlight.drivers.base import TableStats
+from headlight.migrator import Migration, Migrator, get_effective_lock_timeout
+from headlight.schema.ops import NOOP_SQL, CreateTableOp, Impact, Operation
+
+Risk = typing.Literal["none", "low", "medium", "high", "unknown"]
+
+# rough throughput of a sequential scan and of a rewrite, which also writes WAL and rebuilds every index
+SCAN_BYTES_PER_SECOND = 200 * 1024 * 1024
+REWRITE_BYTES_PER_SECOND = 50 * 1024 * 1024
+
+
+@dataclass
+class PlanStep:
+    migration: Migration
+    op: Operation
+    stmt: str
+    impact: Impact
+    stats: TableStats | None
+    lock_timeout: float | None
+    estimate: float | None
+    risk: Risk
+
+
+class Planner:
+    # compiles pending migrations without running them and joins the lock taken by each statement
+    # with the size of its table
+    def __init__(
+        self,
+        migrator: Migrator,
+        scan_rate: float = SCAN_BYTES_PER_SECOND,
+        rewrite_rate: float = REWRITE_BYTES_PER_SECOND,
+        medium_after: float = 1.0,
+        high_after: float = 10.0,
+    ) -> None:
+        self.migrator = migrator
+        self.scan_rate = scan_rate
+        self.rewrite_rate = rewrite_rate
+        self.medium_after = medium_after
+        self.high_after = high_after
+        self._stats: dict[str, TableStats | None] = {}
+
+    def get_table_stats(self, table_name: str) -> TableStats | None:
+        if table_name not in self._stats:
+            self._stats[table_name] = self.migrator.db.get_table_stats(table_name)
+        return self._stats[table_name]
+
+    def estimate(self, impact: Impact, stats: TableStats | None) -> float | None:
+        if impact.table_effect == "none":
+            return 0.0
+        if stats is None:
+            return None
+        rate = self.rewrite_rate if impact.table_effect == "rewrite" else self.scan_rate
+        return stats.size / rate
+
+    def get_risk(self, impact: Impact, estimate: float | None) -> Risk:
+        if impact.lock_level is None:
+            return "unknown"
+        if impact.table_name is None:
+            return "none"
+        # the lock is short, or it does not stop the application from writing
+        if impact.table_effect == "none" or not impact.blocks_writes:
+            return "low"
+        if estimate is None:
+            return "unknown"
+        if estimate >= self.high_after:
+            return "high"
+        if estimate >= self.medium_after:
+            return "medium"
+        return "low"
+
+    def plan_migration(self, migration: Migration) -> list[PlanStep]:
+        steps = []
+        for op, stmt in self.migrator.compile_migration(migration):
+            if stmt.startswith(NOOP_SQL):
+                continue
+
+            impact = op.get_impact()
+            stats = self.get_table_stats(impact.table_name) if impact.table_name else None
+            created = isinstance(op, CreateTableOp)
+            if created and impact.table_name:
+                # later statements of the run find this table empty
+                self._stats[impact.table_name] = TableStats(rows=0, pages=0)
+
+            estimate = self.estimate(impact, stats)
+            steps.append(
+                PlanStep(
+                    migration=migration,
+                    op=op,
+                    stmt=stmt,
+                    impact=impact,
+                    stats=stats,
+                    lock_timeout=get_effective_lock_timeout(op, migration, self.migrator.lock_timeout),
+                    estimate=estimate,
+                    risk="none" if created else self.get_risk(impact, estimate),
+                )
+            )
+        return steps
+
+    def plan(self) -> list[PlanStep]:
+        return [step for migration in self.migrator.get_pending_migrations() for step in self.plan_migration(migration)]
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+
+import contextlib
+import cProfile
+import datetime
+import json
+import time
+import tracemalloc
+import typing
+
+if typing.TYPE_CHECKING:
+    from headlight.migrator import Migration
+
+# phases spent in Python, the rest is spent waiting for the database
+PYTHON_PHASES = {"import", "build", "compile"}
+PHASES = ["import", "build", "compile", "lock_wait", "execute", "history", "commit"]
+
+
+@dataclass
+class MigrationProfile:
+    revision: str
+    name: str
+    phases: dict[str, float] = field(default_factory=dict)
+    memory_peak: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+
+class Profiler:
+    def __init__(self, report_path: str | None = None, python: bool = False) -> None:
+        self.report_path = report_path
+        self.python = python
+        self.started = datetime.datetime.now()
+        self.profiles: dict[str, MigrationProfile] = {}
+        self.cprofile = cProfile.Profile() if python else None
+        # memory tracing slows down every allocation, it is stopped with the report unless someone else started it
+        self.tracing_memory = False
+
+    def get_profile(self, migration: Migration) -> MigrationProfile:
+        if migration.revision not in self.profiles:
+            self.profiles[migration.revision] = MigrationProfile(revision=migration.revision, name=migration.name)
+        return self.profiles[migration.revision]
+
+    def add(self, migration: Migration, phase: str, seconds: float) -> None:
+        phases = self.get_profile(migration).phases
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, migration: Migration, phase: str) -> typing.Iterator[None]:
+        python = self.python and phase in PYTHON_PHASES
+        if python:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing_memory = True
+            tracemalloc.reset_peak()
+            assert self.cprofile
+            self.cprofile.enable()
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(migration, phase, time.perf_counter() - start_time)
+            if python:
+                assert self.cprofile
+                self.cprofile.disable()
+                memory_peak = self.get_profile(migration).memory_peak
+                memory_peak[phase] = max(memory_peak.get(phase, 0), tracemalloc.get_traced_memory()[1])
+
+    def get_totals(self) -> dict[str, float]:
+        totals = {phase: 0.0 for phase in PHASES}
+        for profile in self.profiles.values():
+            for phase, seconds in profile.phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def get_report(self) -> dict[str, typing.Any]:
+        return {
+            "started": self.started.isoformat(),
+            "total": sum(profile.total for profile in self.profiles.values()),
+            "phases": self.get_totals(),
+            "migrations": [asdict(profile) for profile in self.profiles.values()],
+            "pstats": self.get_pstats_path(),
+        }
+
+    def get_pstats_path(self) -> str | None:
+        if self.cprofile is None or self.report_path is None:
+            return None
+        return self.report_path + ".pstats"
+
+    def stop(self) -> None:
+        if self.tracing_memory:
+            tracemalloc.stop()
+            self.tracing_memory = False
+
+    def write_report(self) -> str | None:
+        self.stop()
+        if self.report_path is None:
+            return None
+
+        pstats_path = self.get_pstats_path()
+        if pstats_path:
+            assert self.cprofile
+            self.cprofile.dump_stats(pstats_path)
+
+        with open(self.report_path, "w") as f:
+            json.dump(self.get_report(), f, indent=2)
+        return self.report_path
@@ -22,6 +22,7 @@ from headlight.schema.schema import (
     Table,
     UniqueConstraint,
     expr,
+    truncate_name,
 )
 
 
@@ -181,7 +182,10 @@ class ChangeColumn:
         )
         return self
 
-    def set_nullable(self, flag: bool) -> ChangeColumn:
+    def set_nullable(self, flag: bool, online: bool = False) -> ChangeColumn:
+        if not flag and online:
+            return self._set_not_null_online()
+
         if flag:
             self._ops.append(
                 ops.DropNotNullOp(
@@ -202,6 +206,47 @@ class ChangeColumn:
             )
         return self
 
+    def _set_not_null_online(self) -> ChangeColumn:
+        # a validated "IS NOT NULL" check lets SET NOT NULL skip the full table scan
+        name = truncate_name(f"{self._table_name.rpartition('.')[2]}_{self._column_name}_not_null")
+        constraint = CheckConstraint(f"{self._column_name} IS NOT NULL", name)
+        drop_check_op = ops.DropTableConstraintOp(
+            constraint_name=name,
+            table_name=self._table_name,
+            current_constraint=constraint,
+            only=self._only,
+            if_table_exists=self._if_table_exists,
+            current_not_valid=True,
+        )
+        # the check must still exist when SET NOT NULL runs, so it is never merged into the same statement
+        drop_check_op.standalone = True
+        self._ops.extend(
+            [
+                ops.AddTableConstraintOp(
+                    constraint=constraint,
+                    table_name=self._table_name,
+                    only=self._only,
+                    if_table_exists=self._if_table_exists,
+                    not_valid=True,
+                    drop_existing=True,
+                ),
+                ops.ValidateConstraintOp(
+                    constraint_name=name,
+                    table_name=self._table_name,
+                    only=self._only,
+                    if_table_exists=self._if_table_exists,
+                ),
+                ops.SetNotNullOp(
+                    table_name=self._table_name,
+                    column_name=self._column_name,
+                    only=self._only,
+                    if_table_exists=self._if_table_exists,
+                ),
+                drop_check_op,
+            ]
+        )
+        return self
+
     def change_type(
         self,
         new_type: types.Type | typing.Type[types.Type],
@@ -303,15 +348,19 @@ class AlterTableBuilder:
             if_table_exists=self._if_exists,
         )
 
-    def add_check_constraint(self, name: str, expr: str) -> None:
+    def add_check_constraint(self, name: str, expr: str, online: bool = False) -> None:
         self.ops.append(
             ops.AddTableConstraintOp(
                 constraint=CheckConstraint(expr, name),
                 table_name=self._table_name,
                 only=self._only,
                 if_table_exists=self._if_exists,
+                not_valid=online,
+                drop_existing=online,
             )
         )
+        if online:
+            self.validate_constraint(name)
 
     def add_unique_constraint(self, name: str, columns: list[str], include: list[str] | None = None) -> None:
         self.ops.append(
@@ -342,9 +391,12 @@ class AlterTableBuilder:
         on_delete: Action | None = None,
         on_update: Action | None = None,
         match: MatchType | None = None,
+        online: bool = False,
     ) -> None:
         self.ops.append(
             ops.AddTableConstraintOp(
+                not_valid=online,
+                drop_existing=online,
                 constraint=ForeignKey(
                     name=name,
                     target_table=target_table,
@@ -359,6 +411,18 @@ class AlterTableBuilder:
                 if_table_exists=self._if_exists,
             )
         )
+        if online:
+            self.validate_constraint(name)
+
+    def validate_constraint(self, name: str) -> None:
+        self.ops.append(
+            ops.ValidateConstraintOp(
+                constraint_name=name,
+                table_name=self._table_name,
+                only=self._only,
+                if_table_exists=self._if_exists,
+            )
+        )
 
     def drop_constraint(
         self,
@@ -402,20 +466,90 @@ class Blueprint:
         table_name: str,
         if_exists: bool = False,
         only: bool = False,
+        lock_timeout: float | None = None,
     ) -> typing.Generator[AlterTableBuilder, None, None]:
         builder = AlterTableBuilder(table_name=table_name, if_exists=if_exists, only=only)
         yield builder
+        for op in builder.ops:
+            if op.lock_timeout is None:
+                op.lock_timeout = lock_timeout
         self._ops.extend(builder.ops)
 
     def drop_table(self, table_name: str, current_table: Table, mode: DropMode | None = None) -> None:
         self.add_op(ops.DropTableOp(name=table_name, mode=mode, current_table=current_table))
 
-    def drop_index(self, index_name: str, current_index: Index, mode: DropMode | None = None) -> None:
+    def create_index(
+        self,
+        table_name: str,
+        columns: list[str | IndexExpr],
+        name: str | None = None,
+        unique: bool = False,
+        using: str | None = None,
+        include: list[str] | None = None,
+        with_: str | None = None,
+        where: str | None = None,
+        tablespace: str | None = None,
+        concurrently: bool = False,
+        if_not_exists: bool = False,
+        only: bool = False,
+    ) -> None:
+        index_expr = IndexExpr.from_specs(columns)
+        self._ops.append(
+            ops.CreateIndexOp(
+                only=only,
+                concurrently=concurrently,
+                if_not_exists=if_not_exists,
+                index=Index(
+                    name=name or Index.generate_name(table_name, index_expr),
+                    table_name=table_name,
+                    unique=unique,
+                    using=using,
+                    columns=index_expr,
+                    include=include,
+                    with_=with_,
+                    tablespace=tablespace,
+                    where=where,
+                ),
+            )
+        )
+
+    def drop_index(
+        self,
+        index_name: str,
+        current_index: Index,
+        mode: DropMode | None = None,
+        concurrently: bool = False,
+        if_exists: bool = False,
+    ) -> None:
         self._ops.append(
             ops.DropIndexOp(
                 mode=mode,
                 name=index_name,
                 current_index=current_index,
+                concurrently=concurrently,
+                if_exists=if_exists,
+            )
+        )
+
+    def backfill(
+        self,
+        table_name: str,
+        set_sql: str,
+        where: str | None = None,
+        batch_size: int = 1000,
+        sleep: float = 0,
+        key: str = "id",
+        name: str | None = None,
+    ) -> None:
+        self.add_op(
+            ops.BackfillOp(
+                table_name=table_name,
+                set_sql=set_sql,
+                where=where,
+                batch_size=batch_size,
+                sleep=sleep,
+                key=key,
+                name=name,
             )
         )
 
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import dataclasses
+
 import abc
 import typing
 
 from headlight.drivers.base import DbDriver
 from headlight.exceptions import HeadlightError
+from headlight.schema import types
 from headlight.schema.schema import (
     Action,
+    CheckConstraint,
     Column,
     Constraint,
     Default,
     DropMode,
+    ForeignKey,
     Index,
     MatchType,
     PrimaryKeyConstraint,
@@ -18,12 +23,70 @@ from headlight.schema.schema import (
 )
 from headlight.schema.types import Type
 
+NOOP_SQL = "-- noop"
+
+# table lock modes from the weakest to the strongest
+LockLevel = typing.Literal[
+    "ACCESS SHARE",
+    "ROW SHARE",
+    "ROW EXCLUSIVE",
+    "SHARE UPDATE EXCLUSIVE",
+    "SHARE",
+    "SHARE ROW EXCLUSIVE",
+    "EXCLUSIVE",
+    "ACCESS EXCLUSIVE",
+]
+LOCK_LEVELS: list[LockLevel] = list(typing.get_args(LockLevel))
+
+# what happens to the existing rows of the table: nothing, they are read (scan) or copied (rewrite)
+TableEffect = typing.Literal["none", "scan", "rewrite"]
+TABLE_EFFECTS: list[TableEffect] = list(typing.get_args(TableEffect))
+
 
 class OperationError(HeadlightError):
     pass
 
 
+@dataclasses.dataclass
+class Impact:
+    table_name: str | None
+    lock_level: LockLevel | None  # None when unknown, e.g. for raw SQL
+    table_effect: TableEffect = "none"
+
+    @property
+    def blocks_reads(self) -> bool:
+        return self.lock_level == "ACCESS EXCLUSIVE"
+
+    @property
+    def blocks_writes(self) -> bool:
+        # conflicts with ROW EXCLUSIVE taken by INSERT, UPDATE and DELETE
+        return self.lock_level is not None and LOCK_LEVELS.index(self.lock_level) >= LOCK_LEVELS.index("SHARE")
+
+
+def strongest_impact(impacts: list[Impact]) -> Impact:
+    lock_levels = {impact.lock_level for impact in impacts}
+    lock_level = next((level for level in reversed(LOCK_LEVELS) if level in lock_levels), None)
+    return Impact(
+        table_name=impacts[0].table_name,
+        lock_level=lock_level,
+        table_effect=max((impact.table_effect for impact in impacts), key=TABLE_EFFECTS.index),
+    )
+
+
 class Operation(abc.ABC):
+    lock_timeout: float | None = None
+    transactional: bool = True
+    # the lock taken on the table and the work done on its rows, see `headlight plan`
+    lock_level: LockLevel | None = None
+    table_effect: TableEffect = "none"
+
+    def get_impact(self) -> Impact:
+        return Impact(table_name=None, lock_level=self.lock_level, table_effect=self.table_effect)
+
+    def with_lock_timeout(self, seconds: float | None) -> Operation:
+        self.lock_timeout = seconds
+        return self
+
     @abc.abstractmethod
     def to_up_sql(self, driver: DbDriver) -> str:
         raise NotImplementedError()
@@ -45,7 +108,61 @@ class RunSQLOp(Operation):
         return self.down_sql
 
 
+class BackfillOp(Operation):
+    # batches are committed one by one, so the operation cannot be part of the migration transaction
+    transactional = False
+    # short row locks in every batch, the table stays writable
+    lock_level = "ROW EXCLUSIVE"
+    table_effect = "scan"
+
+    def __init__(
+        self,
+        table_name: str,
+        set_sql: str,
+        where: str | None = None,
+        batch_size: int = 1000,
+        sleep: float = 0,
+        key: str = "id",
+        name: str | None = None,
+    ) -> None:
+        self.table_name = table_name
+        self.set_sql = set_sql
+        self.where = where
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.key = key
+        self.name = name or f"{table_name}: {set_sql}"
+
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self.table_name, lock_level=self.lock_level, table_effect=self.table_effect)
+
+    def to_up_sql(self, driver: DbDriver) -> str:
+        # the batches are generated by the migrator, the statement only describes them
+        return driver.backfill_comment_template.format(
+            table=self.table_name,
+            batch_size=int(self.batch_size),
+            key=self.key,
+            set_sql=" ".join(self.set_sql.split()),
+            where=" WHERE {where}".format(where=" ".join(self.where.split())) if self.where else "",
+        )
+
+    def to_batch_sql(self, driver: DbDriver) -> str:
+        # updates the rows selected by the "batch" query of DbDriver.backfill_batch_query
+        return driver.backfill_update_template.format(
+            table=self.table_name,
+            set_sql=self.set_sql.replace("%", "%%"),
+            key=self.key,
+            range="IN (SELECT {key} FROM batch)".format(key=self.key),
+            where=" AND ({where})".format(where=self.where.replace("%", "%%")) if self.where else "",
+        )
+
+    def to_down_sql(self, driver: DbDriver) -> str:
+        return NOOP_SQL
+
+
 class CreateIndexOp(Operation):
+    table_effect = "scan"
+
     def __init__(
         self,
         index: Index,
@@ -57,6 +174,12 @@ class CreateIndexOp(Operation):
         self.index = index
         self.concurrently = concurrently
         self.if_not_exists = if_not_exists
+        self.transactional = not concurrently
+        # a concurrent build lets writes through
+        self.lock_level = "SHARE UPDATE EXCLUSIVE" if concurrently else "SHARE"
+
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self.index.table_name, lock_level=self.lock_level, table_effect=self.table_effect)
 
     def to_up_sql(self, driver: DbDriver) -> str:
         return driver.create_index_template.format(
@@ -87,38 +210,69 @@ class CreateIndexOp(Operation):
         )
 
     def to_down_sql(self, driver: DbDriver) -> str:
-        return DropIndexOp(name=self.index.name, current_index=self.index).to_up_sql(driver)
+        return DropIndexOp(
+            name=self.index.name,
+            current_index=self.index,
+            concurrently=self.concurrently,
+        ).to_up_sql(driver)
 
 
 class DropIndexOp(Operation):
-    def __init__(self, name: str, current_index: Index, mode: DropMode | None = None) -> None:
+    def __init__(
+        self,
+        name: str,
+        current_index: Index,
+        mode: DropMode | None = None,
+        concurrently: bool = False,
+        if_exists: bool = False,
+    ) -> None:
         self.name = name
         self.mode = mode
         self.old_index = current_index
+        self.concurrently = concurrently
+        self.if_exists = if_exists
+        self.transactional = not concurrently
+        self.lock_level = "SHARE UPDATE EXCLUSIVE" if concurrently else "ACCESS EXCLUSIVE"
+
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self.old_index.table_name, lock_level=self.lock_level)
 
     def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.drop_index_template.format(name=self.name, mode=f" {self.mode}" if self.mode else "")
+        return driver.drop_index_template.format(
+            name=self.name,
+            mode=f" {self.mode}" if self.mode else "",
+            concurrently=" CONCURRENTLY" if self.concurrently else "",
+            if_exists=" IF EXISTS" if self.if_exists else "",
+        )
 
     def to_down_sql(self, driver: DbDriver) -> str:
-        return CreateIndexOp(index=self.old_index).to_up_sql(driver)
+        return CreateIndexOp(index=self.old_index, concurrently=self.concurrently).to_up_sql(driver)
 
 
 class CreateTableOp(Operation):
+    # the lock is taken on a new table nobody else uses yet
+    lock_level = "ACCESS EXCLUSIVE"
+
     def __init__(self, table: Table, if_not_exists: bool = False) -> None:
         self._table = table
         self._if_not_exists = if_not_exists
 
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self._table.name, lock_level=self.lock_level)
+
     def to_up_sql(self, driver: DbDriver) -> str:
-        pk_cols = [col for col in self._table.columns if col.primary_key]
+        # the table is not modified here, the same loaded op may be compiled by several threads at once
+        columns = self._table.columns
+        constraints = list(self._table.constraints)
+        pk_cols = [col for col in columns if col.primary_key]
         pk_count = len(pk_cols)
         if pk_count > 1:
-            self._table.constraints.append(PrimaryKeyConstraint(columns=[col.name for col in pk_cols]))
-            for col in self._table.columns:
-                col.primary_key = False
+            constraints.append(PrimaryKeyConstraint(columns=[col.name for col in pk_cols]))
+            columns = [dataclasses.replace(col, primary_key=False) for col in columns]
 
-        column_stmts = ["    " + column.compile(driver) for column in self._table.columns]
+        column_stmts = ["    " + column.compile(driver) for column in columns]
 
-        for constraint in self._table.constraints:
+        for constraint in constraints:
             column_stmts.append("    " + constraint.compile(driver))
 
         return driver.create_table_template.format(
@@ -132,11 +286,16 @@ class CreateTableOp(Operation):
 
 
 class DropTableOp(Operation):
+    lock_level = "ACCESS EXCLUSIVE"
+
     def __init__(self, name: str, current_table: Table, mode: DropMode | None = None) -> None:
         self.name = name
         self.mode = mode
         self.old_table = current_table
 
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self.name, lock_level=self.lock_level)
+
     def to_up_sql(self, driver: DbDriver) -> str:
         return driver.drop_table_template.format(name=self.name, mode=f" {self.mode}" if self.mode else "")
 
@@ -144,7 +303,120 @@ class DropTableOp(Operation):
         return CreateTableOp(table=self.old_table).to_up_sql(driver)
 
 
-class AddColumnOp(Operation):
+@dataclasses.dataclass
+class AlterTableAction:
+    table_name: str
+    sql: str
+    column_name: str | None = None
+    only: bool = False
+    if_table_exists: bool = False
+    changes_type: bool = False
+
+    def can_merge(self, other: AlterTableAction) -> bool:
+        return (self.table_name, self.only, self.if_table_exists) == (
+            other.table_name,
+            other.only,
+            other.if_table_exists,
+        )
+
+
+def compile_alter_table(driver: DbDriver, actions: list[AlterTableAction]) -> str:
+    first = actions[0]
+    return driver.alter_table_template.format(
+        table=first.table_name,
+        only=" ONLY" if first.only else "",
+        if_table_exists=" IF EXISTS" if first.if_table_exists else "",
+        actions=", ".join(action.sql for action in actions),
+    )
+
+
+def merge_alter_table_actions(driver: DbDriver, actions: list[AlterTableAction]) -> list[str]:
+    # postgres cannot change the type of one column twice in a single statement, start a new one then
+    groups: list[list[AlterTableAction]] = []
+    retyped: set[str | None] = set()
+    for action in actions:
+        retyped_twice = action.changes_type and action.column_name in retyped
+        if not groups or not groups[-1][0].can_merge(action) or retyped_twice:
+            groups.append([])
+            retyped = set()
+        groups[-1].append(action)
+        if action.changes_type:
+            retyped.add(action.column_name)
+    return [compile_alter_table(driver, group) for group in groups]
+
+
+class AlterTableOp(Operation):
+    table_name: str
+    standalone: bool = False
+    lock_level: LockLevel | None = "ACCESS EXCLUSIVE"
+
+    def get_impact(self) -> Impact:
+        return Impact(table_name=self.table_name, lock_level=self.lock_level, table_effect=self.table_effect)
+
+    @abc.abstractmethod
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction | None:
+        raise NotImplementedError()
+
+    def to_up_sql(self, driver: DbDriver) -> str:
+        return compile_alter_table(driver, [self.to_up_action(driver)])
+
+    def to_down_sql(self, driver: DbDriver) -> str:
+        action = self.to_down_action(driver)
+        if action is None:
+            return NOOP_SQL
+        return compile_alter_table(driver, [action])
+
+
+class CoalescedAlterTableOp(Operation):
+    def __init__(self, ops: list[AlterTableOp]) -> None:
+        self.ops = ops
+        self.table_name = ops[0].table_name
+        self.lock_timeout = ops[0].lock_timeout
+
+    def get_impact(self) -> Impact:
+        return strongest_impact([op.get_impact() for op in self.ops])
+
+    def to_up_sql(self, driver: DbDriver) -> str:
+        return ";\n".join(merge_alter_table_actions(driver, [op.to_up_action(driver) for op in self.ops]))
+
+    def to_down_sql(self, driver: DbDriver) -> str:
+        actions = [action for op in reversed(self.ops) if (action := op.to_down_action(driver)) is not None]
+        # some reverse actions are lenient (a dropped column is dropped IF EXISTS) and others are not,
+        # the merged statement skips a missing table only if every action would
+        if_table_exists = all(action.if_table_exists for action in actions)
+        actions = [dataclasses.replace(action, if_table_exists=if_table_exists) for action in actions]
+        stmts = merge_alter_table_actions(driver, actions)
+        return ";\n".join(stmts) if stmts else NOOP_SQL
+
+
+def coalesce_ops(ops: list[Operation]) -> list[Operation]:
+    result: list[Operation] = []
+    group: list[AlterTableOp] = []
+
+    def flush() -> None:
+        if len(group) == 1:
+            result.append(group[0])
+        elif group:
+            result.append(CoalescedAlterTableOp(list(group)))
+        group.clear()
+
+    for op in ops:
+        if isinstance(op, AlterTableOp) and op.transactional and not op.standalone:
+            if group and (group[0].table_name, group[0].lock_timeout) != (op.table_name, op.lock_timeout):
+                flush()
+            group.append(op)
+        else:
+            flush()
+            result.append(op)
+    flush()
+    return result
+
+
+class AddColumnOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -189,16 +461,36 @@ class AddColumnOp(Operation):
         self.column.generated_as(expr, stored)
         return self
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.add_column_template.format(
-            column_spec=self.column.compile(driver),
-            table=self.table_name,
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
-            if_column_not_exists=" IF NOT EXISTS" if self.if_column_not_exists else "",
+    @property
+    def rewrites_table(self) -> bool:
+        # stored generated columns and volatile defaults are computed for every existing row
+        column = self.column
+        if column.generated_as_ and column.generated_as_.stored:
+            return True
+        return bool(column.default and column.default.volatile) or types.is_serial(column.type)
+
+    def get_impact(self) -> Impact:
+        # constraints are checked against existing rows, a unique one builds an index
+        table_effect: TableEffect = "none"
+        if self.column.check_constraints or self.column.foreign_key or self.column.unique_constraint:
+            table_effect = "scan"
+        if self.rewrites_table:
+            table_effect = "rewrite"
+        return Impact(table_name=self.table_name, lock_level=self.lock_level, table_effect=table_effect)
+
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column.name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.add_column_template.format(
+                column_spec=self.column.compile(driver),
+                if_column_not_exists=" IF NOT EXISTS" if self.if_column_not_exists else "",
+            ),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return DropColumnOp(
             only=self.only,
             if_table_exists=True,
@@ -206,10 +498,10 @@ class AddColumnOp(Operation):
             table_name=self.table_name,
             column_name=self.column.name,
             current_column=self.column,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class DropColumnOp(Operation):
+class DropColumnOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -228,25 +520,28 @@ class DropColumnOp(Operation):
         self.if_table_exists = if_table_exists
         self.if_column_exists = if_column_exists
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.drop_column_template.format(
-            table=self.table_name,
-            name=self.column_name,
-            mode=f" {self.mode}" if self.mode else "",
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
-            if_column_exists=" IF EXISTS" if self.if_column_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.drop_column_template.format(
+                name=self.column_name,
+                mode=f" {self.mode}" if self.mode else "",
+                if_column_exists=" IF EXISTS" if self.if_column_exists else "",
+            ),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return AddColumnOp(
             table_name=self.table_name,
             column=self.old_column,
             only=self.only,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class SetDefaultOp(Operation):
+class SetDefaultOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -263,16 +558,19 @@ class SetDefaultOp(Operation):
         self.old_default = Default.new(current_default)
         self.if_table_exists = if_table_exists
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.add_column_default_template.format(
-            table=self.table_name,
-            name=self.column_name,
-            only=" ONLY" if self.only else "",
-            expr=f"{self.new_default.compile(driver)}",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.add_column_default_template.format(
+                name=self.column_name,
+                expr=f"{self.new_default.compile(driver)}",
+            ),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         if self.old_default.value is None:
             return DropDefaultOp(
                 table_name=self.table_name,
@@ -280,7 +578,7 @@ class SetDefaultOp(Operation):
                 current_default=self.old_default,
                 only=self.only,
                 if_table_exists=self.if_table_exists,
-            ).to_up_sql(driver)
+            ).to_up_action(driver)
         return self.__class__(
             table_name=self.table_name,
             column_name=self.column_name,
@@ -288,10 +586,10 @@ class SetDefaultOp(Operation):
             current_default=self.new_default,
             only=self.only,
             if_table_exists=self.if_table_exists,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class DropDefaultOp(Operation):
+class DropDefaultOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -306,27 +604,36 @@ class DropDefaultOp(Operation):
         self.old_default = Default.new(current_default)
         self.if_table_exists = if_table_exists
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.drop_column_default_template.format(
-            table=self.table_name,
-            name=self.column_name,
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.drop_column_default_template.format(name=self.column_name),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction | None:
         if self.old_default.value is None:  # column had no default previously
-            return "-- noop, column had no default previously"
+            return None
         return SetDefaultOp(
             table_name=self.table_name,
             column_name=self.column_name,
             new_default=self.old_default,
             only=self.only,
             if_table_exists=self.if_table_exists,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
+
+    def to_down_sql(self, driver: DbDriver) -> str:
+        if self.old_default.value is None:
+            return "-- noop, column had no default previously"
+        return super().to_down_sql(driver)
 
 
-class SetNotNullOp(Operation):
+class SetNotNullOp(AlterTableOp):
+    # existing rows are checked for NULLs, unless a validated CHECK constraint proves there are none
+    table_effect = "scan"
+
     def __init__(
         self,
         table_name: str,
@@ -339,24 +646,25 @@ class SetNotNullOp(Operation):
         self.column_name = column_name
         self.if_table_exists = if_table_exists
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.add_column_null_template.format(
-            table=self.table_name,
-            name=self.column_name,
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.add_column_null_template.format(name=self.column_name),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return DropNotNullOp(
             table_name=self.table_name,
             column_name=self.column_name,
             only=self.only,
             if_table_exists=self.if_table_exists,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class DropNotNullOp(Operation):
+class DropNotNullOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -369,24 +677,25 @@ class DropNotNullOp(Operation):
         self.column_name = column_name
         self.if_table_exists = if_table_exists
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.drop_column_null_template.format(
-            table=self.table_name,
-            name=self.column_name,
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.drop_column_null_template.format(name=self.column_name),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return SetNotNullOp(
             table_name=self.table_name,
             column_name=self.column_name,
             only=self.only,
             if_table_exists=self.if_table_exists,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class ChangeTypeOp(Operation):
+class ChangeTypeOp(AlterTableOp):
     def __init__(
         self,
         table_name: str,
@@ -411,65 +720,106 @@ class ChangeTypeOp(Operation):
         self.old_collation = current_collation
         self.old_using = current_using
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.change_column_type.format(
-            table=self.table_name,
-            name=self.column_name,
-            type=driver.get_sql_for_type(self.new_type),
-            collate=f" COLLATE {self.collation}" if self.collation else "",
-            using=f" USING {self.using}" if self.using else "",
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    @property
+    def rewrites_table(self) -> bool:
+        # USING computes a new value for every row
+        return self.using is not None or not self.old_type.is_binary_coercible_to(self.new_type)
+
+    def get_impact(self) -> Impact:
+        table_effect: TableEffect = "rewrite" if self.rewrites_table else "none"
+        return Impact(table_name=self.table_name, lock_level=self.lock_level, table_effect=table_effect)
+
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            changes_type=True,
+            sql=driver.change_column_type.format(
+                name=self.column_name,
+                type=driver.get_sql_for_type(self.new_type),
+                collate=f" COLLATE {self.collation}" if self.collation else "",
+                using=f" USING {self.using}" if self.using else "",
+            ),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
-        return driver.change_column_type.format(
-            table=self.table_name,
-            name=self.column_name,
-            type=driver.get_sql_for_type(self.old_type),
-            collate=f" COLLATE {self.old_collation}" if self.old_collation else "",
-            using=f" USING {self.old_using}" if self.old_using else "",
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            column_name=self.column_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            changes_type=True,
+            sql=driver.change_column_type.format(
+                name=self.column_name,
+                type=driver.get_sql_for_type(self.old_type),
+                collate=f" COLLATE {self.old_collation}" if self.old_collation else "",
+                using=f" USING {self.old_using}" if self.old_using else "",
+            ),
         )
 
 
-class AddTableConstraintOp(Operation):
+class AddTableConstraintOp(AlterTableOp):
     def __init__(
         self,
         constraint: Constraint,
         table_name: str,
         only: bool = False,
         if_table_exists: bool = False,
+        not_valid: bool = False,
+        drop_existing: bool = False,
     ) -> None:
         self.only = only
         self.constraint = constraint
         self.table_name = table_name
         self.if_table_exists = if_table_exists
-
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.add_table_check_template.format(
-            table=self.table_name,
+        self.not_valid = not_valid
+        # drops a constraint of the same name first, one left behind by a run that failed to validate it
+        self.drop_existing = drop_existing
+
+    def get_impact(self) -> Impact:
+        # a foreign key does not block reads (unless one is dropped), NOT VALID skips the check of existing rows
+        weak_lock = isinstance(self.constraint, ForeignKey) and not self.drop_existing
+        lock_level: LockLevel = "SHARE ROW EXCLUSIVE" if weak_lock else "ACCESS EXCLUSIVE"
+        can_skip_check = isinstance(self.constraint, (CheckConstraint, ForeignKey))
+        table_effect: TableEffect = "none" if self.not_valid and can_skip_check else "scan"
+        return Impact(table_name=self.table_name, lock_level=lock_level, table_effect=table_effect)
+
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        sql = driver.add_table_check_template.format(
             constraint=self.constraint.compile(driver),
-            only=" ONLY" if self.only else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+            not_valid=" NOT VALID" if self.not_valid else "",
+        )
+        if self.drop_existing:
+            drop_sql = driver.drop_table_constraint_template.format(
+                name=self.get_constraint_name(), mode="", if_exists=" IF EXISTS"
+            )
+            sql = f"{drop_sql}, {sql}"
+        return AlterTableAction(
+            table_name=self.table_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=sql,
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def get_constraint_name(self) -> str:
         name = getattr(self.constraint, "name")
         if not name:
             raise OperationError(f'Constraint "{self.constraint} has no name and therefore cannot be dropped.')
+        return name
 
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return DropTableConstraintOp(
-            constraint_name=getattr(self.constraint, "name"),
+            constraint_name=self.get_constraint_name(),
             table_name=self.table_name,
             only=self.only,
             if_table_exists=self.if_table_exists,
             current_constraint=self.constraint,
-        ).to_up_sql(driver)
+        ).to_up_action(driver)
 
 
-class DropTableConstraintOp(Operation):
+class DropTableConstraintOp(AlterTableOp):
     def __init__(
         self,
         constraint_name: str,
@@ -479,6 +829,7 @@ class DropTableConstraintOp(Operation):
         mode: DropMode | None = None,
         if_exists: bool = False,
         if_table_exists: bool = False,
+        current_not_valid: bool = False,
     ) -> None:
         self.only = only
         self.mode = mode
@@ -487,21 +838,56 @@ class DropTableConstraintOp(Operation):
         self.constraint_name = constraint_name
         self.if_table_exists = if_table_exists
         self.current_constraint = current_constraint
+        self.current_not_valid = current_not_valid
 
-    def to_up_sql(self, driver: DbDriver) -> str:
-        return driver.drop_table_constraint_template.format(
-            table=self.table_name,
-            name=self.constraint_name,
-            only=" ONLY" if self.only else "",
-            mode=f" {self.mode}" if self.mode else "",
-            if_exists=" IF EXISTS" if self.if_exists else "",
-            if_table_exists=" IF EXISTS" if self.if_table_exists else "",
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.drop_table_constraint_template.format(
+                name=self.constraint_name,
+                mode=f" {self.mode}" if self.mode else "",
+                if_exists=" IF EXISTS" if self.if_exists else "",
+            ),
         )
 
-    def to_down_sql(self, driver: DbDriver) -> str:
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction:
         return AddTableConstraintOp(
             constraint=self.current_constraint,
             table_name=self.table_name,
             only=self.only,
             if_table_exists=self.if_table_exists,
-        ).to_up_sql(driver)
+            not_valid=self.current_not_valid,
+        ).to_up_action(driver)
+
+
+class ValidateConstraintOp(AlterTableOp):
+    # validation scans the table under SHARE UPDATE EXCLUSIVE lock only,
+    # it runs outside the migration transaction so that stronger locks taken before are already released
+    transactional = False
+    lock_level = "SHARE UPDATE EXCLUSIVE"
+    table_effect = "scan"
+
+    def __init__(
+        self,
+        constraint_name: str,
+        table_name: str,
+        only: bool = False,
+        if_table_exists: bool = False,
+    ) -> None:
+        self.only = only
+        self.table_name = table_name
+        self.constraint_name = constraint_name
+        self.if_table_exists = if_table_exists
+
+    def to_up_action(self, driver: DbDriver) -> AlterTableAction:
+        return AlterTableAction(
+            table_name=self.table_name,
+            only=self.only,
+            if_table_exists=self.if_table_exists,
+            sql=driver.validate_constraint_template.format(name=self.constraint_name),
+        )
+
+    def to_down_action(self, driver: DbDriver) -> AlterTableAction | None:
+        return None
@@ -22,6 +22,11 @@ def sanitize_name(name: str) -> str:
     return "".join([c for c in name if c in string.ascii_letters + string.digits])
 
 
+def truncate_name(name: str, max_bytes: int = 63) -> str:
+    # the server cuts longer identifiers, a name cut the same way still refers to the created object
+    return name.encode()[:max_bytes].decode(errors="ignore")
+
+
 @dataclasses.dataclass
 class IndexExpr:
     column: str
@@ -327,6 +332,11 @@ class Default:
             case _:
                 return f"'{self.value}'"
 
+    @property
+    def volatile(self) -> bool:
+        # literals and stable expressions like CURRENT_TIMESTAMP are evaluated once for all existing rows
+        return isinstance(self.value, Expr) and types.is_volatile_sql(self.value.value)
+
     @classmethod
     def new(cls, value: typing.Any) -> Default:
         return value if isinstance(value, Default) else Default(value)
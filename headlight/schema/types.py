@@ -1,16 +1,46 @@
 from __future__ import annotations
 
 import abc
+import re
 import typing
 
 if typing.TYPE_CHECKING:
     from headlight import DbDriver
 
 
+# functions that return a new value on every call, a column default calling one of them is computed for every row
+VOLATILE_FUNCTIONS = {
+    "clock_timestamp",
+    "gen_random_uuid",
+    "nextval",
+    "random",
+    "statement_timestamp",
+    "timeofday",
+    "txid_current",
+    "uuid_generate_v1",
+    "uuid_generate_v1mc",
+    "uuid_generate_v4",
+}
+FUNCTION_CALL_RE = re.compile(r"\b(\w+)\s*\(")
+
+
+def is_volatile_sql(expr: str) -> bool:
+    return any(name.lower() in VOLATILE_FUNCTIONS for name in FUNCTION_CALL_RE.findall(expr))
+
+
+def is_wider(old: int | None, new: int | None) -> bool:
+    # None is the widest limit
+    return new is None or (old is not None and new >= old)
+
+
 class Type(abc.ABC):
     def get_sql(self, driver: DbDriver) -> str:
         return driver.get_sql_for_type(self)
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        # True when stored values stay valid as they are and ALTER COLUMN TYPE does not rewrite the table
+        return type(other) is type(self) and vars(other) == vars(self)
+
 
 class CharType(Type):
     def __init__(self, length: int) -> None:
@@ -21,9 +51,15 @@ class VarCharType(Type):
     def __init__(self, length: int | None = None) -> None:
         self.length = length
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        if isinstance(other, VarCharType):
+            return is_wider(self.length, other.length)
+        return isinstance(other, TextType)
+
 
 class TextType(Type):
-    pass
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        return isinstance(other, TextType) or (isinstance(other, VarCharType) and other.length is None)
 
 
 class SmallIntegerType(Type):
@@ -59,6 +95,12 @@ class NumericType(Type):
         self.precision = precision
         self.scale = scale
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        # a changed scale changes the stored values
+        if not isinstance(other, NumericType):
+            return False
+        return other.precision is None or (self.scale == other.scale and is_wider(self.precision, other.precision))
+
 
 class MoneyType(Type):
     pass
@@ -76,6 +118,10 @@ class DateTimeType(Type):
         self.tz = tz
         self.precision = precision
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        # timestamp to timestamptz rewrites unless the session time zone is UTC, which is not known here
+        return isinstance(other, DateTimeType) and other.tz == self.tz and is_wider(self.precision, other.precision)
+
 
 class DateType(Type):
     def __init__(self, precision: int | None = None) -> None:
@@ -93,6 +139,9 @@ class TimeType(Type):
         self.tz = tz
         self.precision = precision
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        return isinstance(other, TimeType) and other.tz == self.tz and is_wider(self.precision, other.precision)
+
 
 IntervalField = typing.Literal[
     "YEAR",
@@ -176,6 +225,14 @@ class ArrayType(Type):
     def __init__(self, type_: Type) -> None:
         self.type_ = type_
 
+    def is_binary_coercible_to(self, other: Type) -> bool:
+        return isinstance(other, ArrayType) and self.type_.is_binary_coercible_to(other.type_)
+
 
 class UUIDType(Type):
     pass
+
+
+def is_serial(type_: Type) -> bool:
+    # SERIAL columns default to nextval() of their sequence
+    return isinstance(type_, (SmallIntegerType, IntegerType, BigIntegerType)) and type_.auto_increment
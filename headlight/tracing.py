@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import contextlib
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import typing
+
+AttributeValue = typing.Union[str, int, float, bool]
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_time: int = field(default_factory=time.time_ns)
+    end_time: int | None = None
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("headlight_span", default=None)
+
+
+class SpanExporter:
+    def export(self, spans: list[Span]) -> None:
+        ...
+
+
+def to_otlp_value(value: AttributeValue) -> dict[str, typing.Any]:
+    # bool goes first, it is a subclass of int
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64 bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_span(span: Span) -> dict[str, typing.Any]:
+    otlp_span: dict[str, typing.Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": [{"key": key, "value": to_otlp_value(value)} for key, value in span.attributes.items()],
+        # STATUS_CODE_OK and STATUS_CODE_ERROR
+        "status": {"code": 2, "message": span.error} if span.error is not None else {"code": 1},
+    }
+    if span.parent_id:
+        otlp_span["parentSpanId"] = span.parent_id
+    return otlp_span
+
+
+class JsonLinesExporter(SpanExporter):
+    # every line is an OTLP/JSON ExportTraceServiceRequest, the format of the collector file exporter
+    def __init__(self, path: str, service_name: str = "headlight") -> None:
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {"key": "service.name", "value": to_otlp_value(self.service_name)},
+                                {"key": "process.pid", "value": to_otlp_value(os.getpid())},
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "headlight"},
+                                "spans": [to_otlp_span(span) for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter | None = None) -> None:
+        self.exporter = exporter
+        self._finished: list[Span] = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, attributes: dict[str, AttributeValue] | None = None) -> Span:
+        parent = _current_span.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes or {},
+        )
+
+    def end_span(self, span: Span, exc: BaseException | None = None) -> None:
+        span.end_time = time.time_ns()
+        if exc is not None:
+            span.error = str(exc) or type(exc).__name__
+        if self.exporter is None:
+            return
+
+        # spans are buffered and exported together when the root span of a trace ends
+        with self._lock:
+            self._finished.append(span)
+            if span.parent_id is not None:
+                return
+            spans = [s for s in self._finished if s.trace_id == span.trace_id]
+            self._finished = [s for s in self._finished if s.trace_id != span.trace_id]
+        self.exporter.export(spans)
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: dict[str, AttributeValue] | None = None) -> typing.Iterator[Span]:
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as ex:
+            _current_span.reset(token)
+            self.end_span(span, ex)
+            raise
+        _current_span.reset(token)
+        self.end_span(span)
@@ -1,4 +1,7 @@
 import sys
+import typing
+
+T = typing.TypeVar("T")
 
 
 def supports_colors() -> bool:
@@ -16,3 +19,12 @@ def colorize_sql(sql: str) -> str:
         return sql
     except ImportError:
         return sql
+
+
+def chunked(items: list[T], size: int) -> typing.Iterator[list[T]]:
+    if size <= 0:
+        yield items
+        return
+
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
@@ -0,0 +1,72 @@
+import psycopg
+import pytest
+import typing
+from psycopg import errors
+from unittest import mock
+
+from headlight.drivers.async_postgresql import AsyncPgDriver
+from headlight.drivers.base import BATCH_SEPARATOR, StatementError
+
+
+class BatchDriver(AsyncPgDriver):
+    statements: list[str]
+    # statements that fail, and how many times each of them fails
+    failures: dict[str, int]
+    in_transaction: bool
+
+    def __init__(self, failures: dict[str, int], in_transaction: bool = True) -> None:
+        super().__init__(mock.Mock(spec=psycopg.AsyncConnection))
+        self.statements = []
+        self.failures = failures
+        self.in_transaction = in_transaction
+
+    def is_idle(self) -> bool:
+        return not self.in_transaction
+
+    async def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        self.statements.append(stmt)
+        for failed in stmt.split(BATCH_SEPARATOR):
+            if self.failures.get(failed):
+                self.failures[failed] -= 1
+                raise errors.UniqueViolation(f'duplicate key value in "{failed}"')
+
+
+@pytest.mark.asyncio
+async def test_execute_many_locates_runtime_error() -> None:
+    db = BatchDriver({"INSERT INTO users VALUES (2)": 2})
+    stmts = ["SET LOCAL lock_timeout = 1000", "INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    with pytest.raises(StatementError) as ex:
+        await db.execute_many(stmts)
+
+    assert ex.value.stmt == "INSERT INTO users VALUES (2)"
+    assert isinstance(ex.value.__cause__, errors.UniqueViolation)
+    assert db.statements == [
+        BATCH_SEPARATOR.join(["SAVEPOINT headlight_batch", *stmts, "RELEASE SAVEPOINT headlight_batch"]),
+        "ROLLBACK TO SAVEPOINT headlight_batch",
+        *stmts,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_execute_many_error_not_repeated() -> None:
+    db = BatchDriver({"INSERT INTO users VALUES (2)": 1})
+    stmts = ["INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    with pytest.raises(StatementError) as ex:
+        await db.execute_many(stmts)
+
+    assert ex.value.stmt == BATCH_SEPARATOR.join(stmts)
+    assert db.statements[1:] == ["ROLLBACK TO SAVEPOINT headlight_batch", *stmts]
+
+
+@pytest.mark.asyncio
+async def test_execute_many_outside_transaction() -> None:
+    db = BatchDriver({"INSERT INTO users VALUES (2)": 1}, in_transaction=False)
+    stmts = ["INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    with pytest.raises(StatementError) as ex:
+        await db.execute_many(stmts)
+
+    assert ex.value.stmt == BATCH_SEPARATOR.join(stmts)
+    assert db.statements == [BATCH_SEPARATOR.join(stmts)]
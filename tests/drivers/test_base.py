@@ -0,0 +1,108 @@
+from headlight import DbDriver
+from headlight.drivers.base import (
+    BATCH_SEPARATOR,
+    HISTORY_STATS_COLUMNS,
+    MigrationStats,
+    TableStats,
+    advisory_lock_id,
+    find_statement_at,
+)
+from headlight.drivers.postgresql import PgDriver
+
+stmts = ["CREATE TABLE users (id INTEGER)", "ALTER TABLE users ADD email TEXT", "DROP TABLE profiles"]
+sql = BATCH_SEPARATOR.join(stmts)
+
+
+def test_find_statement_at() -> None:
+    assert find_statement_at(stmts, 1) == stmts[0]
+    assert find_statement_at(stmts, sql.index("ADD email") + 1) == stmts[1]
+    assert find_statement_at(stmts, sql.index("profiles") + 1) == stmts[2]
+
+
+def test_find_statement_at_out_of_range() -> None:
+    assert find_statement_at(stmts, len(sql) + 100) == sql
+
+
+def test_advisory_lock_id() -> None:
+    lock_id = advisory_lock_id("headlight:migrations")
+
+    assert lock_id == advisory_lock_id("headlight:migrations")
+    assert lock_id != advisory_lock_id("headlight:other_migrations")
+    assert -(2**63) <= lock_id < 2**63
+
+
+def test_quote_identifier(postgres: DbDriver) -> None:
+    assert postgres.quote_identifier("tenant_1") == '"tenant_1"'
+    assert postgres.quote_identifier('we"ird') == '"we""ird"'
+
+
+def test_missing_revisions_query(postgres: DbDriver) -> None:
+    stmt, params = postgres.missing_revisions_query("migrations", ["0001", "0002"])
+
+    assert stmt == (
+        "SELECT pending.revision FROM unnest(%s::text[]) AS pending (revision) "
+        "WHERE NOT EXISTS (SELECT 1 FROM migrations WHERE migrations.revision = pending.revision)"
+    )
+    assert params == [["0001", "0002"]]
+
+
+def test_migrations_table_index_sql(postgres: DbDriver) -> None:
+    assert postgres.get_migrations_table_index_sql("public.migrations") == (
+        "CREATE INDEX IF NOT EXISTS migrations_applied_revision_idx ON public.migrations (applied, revision)"
+    )
+
+
+def test_migrations_table_upgrade_sql(postgres: DbDriver) -> None:
+    assert postgres.get_migrations_table_upgrade_sql("migrations", {"revision", "name", "applied", "duration"}) == (
+        "ALTER TABLE migrations ADD IF NOT EXISTS lock_wait DOUBLE PRECISION, "
+        "ADD IF NOT EXISTS statement_count INTEGER, ADD IF NOT EXISTS checksum TEXT, ADD IF NOT EXISTS applied_by TEXT"
+    )
+    columns = {"revision", "name", "applied", *HISTORY_STATS_COLUMNS}
+    assert postgres.get_migrations_table_upgrade_sql("migrations", columns) is None
+
+
+def test_add_applied_migrations_query_with_stats(postgres: DbDriver) -> None:
+    stats = MigrationStats(duration=1.5, lock_wait=0.5, statement_count=3, checksum="abc", applied_by="alex@host")
+    migrations = [("0001", "first"), ("0002", "second")]
+    stmt, params = postgres.add_applied_migrations_query("migrations", migrations, [stats, MigrationStats()])
+
+    assert stmt.startswith("INSERT INTO migrations (revision, name, applied, duration, lock_wait, statement_count")
+    assert params[:2] + params[3:8] == ["0001", "first", 1.5, 0.5, 3, "abc", "alex@host"]
+    assert params[8:10] + params[11:] == ["0002", "second", None, None, None, None, None]
+
+
+def test_history_query_slowest(postgres: DbDriver) -> None:
+    stmt, _ = postgres.history_query("migrations", slowest=True, limit=5)
+
+    assert stmt.endswith("FROM migrations ORDER BY duration DESC NULLS LAST, revision DESC LIMIT 5")
+
+
+def test_progress_query() -> None:
+    stmt, params = PgDriver.dialect().progress_query(42)
+
+    assert "LEFT JOIN pg_stat_progress_create_index ci ON ci.pid = a.pid" in stmt
+    assert "LEFT JOIN pg_stat_progress_cluster cl ON cl.pid = a.pid" in stmt
+    assert params == [42]
+
+
+def test_blocking_sessions_queries() -> None:
+    dialect = PgDriver.dialect()
+
+    blockers_stmt, params = dialect.blocking_sessions_query(42)
+    waiters_stmt, _ = dialect.waiting_sessions_query(42)
+
+    assert "WHERE a.pid = ANY(pg_blocking_pids(%s))" in blockers_stmt
+    assert "WHERE %s = ANY(pg_blocking_pids(a.pid))" in waiters_stmt
+    assert params == [42]
+
+
+def test_table_stats_query() -> None:
+    stmt, params = PgDriver.dialect().table_stats_query("public.users")
+
+    assert "LEFT JOIN pg_class t ON t.oid = c.reltoastrelid" in stmt
+    assert "WHERE c.oid = to_regclass(%s)" in stmt
+    assert params == ["public.users"]
+
+
+def test_table_stats_size() -> None:
+    assert TableStats(rows=10, pages=3).size == 3 * 8192
@@ -0,0 +1,73 @@
+import pytest
+import typing
+from psycopg2 import errors
+
+from headlight.drivers.base import BATCH_SEPARATOR, StatementError
+from headlight.drivers.postgresql import PgDriver
+
+
+class BatchDriver(PgDriver):
+    statements: list[str]
+    # statements that fail, and how many times each of them fails
+    failures: dict[str, int]
+    in_transaction: bool
+
+    def is_idle(self) -> bool:
+        return not self.in_transaction
+
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        self.statements.append(stmt)
+        for failed in stmt.split(BATCH_SEPARATOR):
+            if self.failures.get(failed):
+                self.failures[failed] -= 1
+                raise errors.UniqueViolation(f'duplicate key value in "{failed}"')
+
+
+def create_batch_driver(failures: dict[str, int], in_transaction: bool = True) -> BatchDriver:
+    db = BatchDriver.dialect()
+    db.statements = []
+    db.failures = failures
+    db.in_transaction = in_transaction
+    return db
+
+
+def test_execute_many_locates_runtime_error() -> None:
+    db = create_batch_driver({"INSERT INTO users VALUES (2)": 2})
+    stmts = ["SET LOCAL lock_timeout = 1000", "INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    with pytest.raises(StatementError) as ex:
+        db.execute_many(stmts)
+
+    assert ex.value.stmt == "INSERT INTO users VALUES (2)"
+    assert isinstance(ex.value.__cause__, errors.UniqueViolation)
+    # the batch is undone and replayed statement by statement, the lock timeout is set again
+    assert db.statements == [
+        BATCH_SEPARATOR.join(["SAVEPOINT headlight_batch", *stmts, "RELEASE SAVEPOINT headlight_batch"]),
+        "ROLLBACK TO SAVEPOINT headlight_batch",
+        *stmts,
+    ]
+
+
+def test_execute_many_error_not_repeated() -> None:
+    db = create_batch_driver({"INSERT INTO users VALUES (2)": 1})
+    stmts = ["INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    # a transient error is not hidden because the replay succeeded, the transaction is not committed
+    with pytest.raises(StatementError) as ex:
+        db.execute_many(stmts)
+
+    assert ex.value.stmt == BATCH_SEPARATOR.join(stmts)
+    assert isinstance(ex.value.__cause__, errors.UniqueViolation)
+    assert db.statements[1:] == ["ROLLBACK TO SAVEPOINT headlight_batch", *stmts]
+
+
+def test_execute_many_outside_transaction() -> None:
+    db = create_batch_driver({"INSERT INTO users VALUES (2)": 1}, in_transaction=False)
+    stmts = ["INSERT INTO users VALUES (1)", "INSERT INTO users VALUES (2)"]
+
+    # without a transaction there is nothing to roll back to, the whole batch is reported
+    with pytest.raises(StatementError) as ex:
+        db.execute_many(stmts)
+
+    assert ex.value.stmt == BATCH_SEPARATOR.join(stmts)
+    assert db.statements == [BATCH_SEPARATOR.join(stmts)]
@@ -0,0 +1,145 @@
+import psycopg
+import pytest
+import typing
+from psycopg import errors, pq
+from unittest import mock
+
+from headlight.database import drivers
+from headlight.drivers.base import StatementError
+from headlight.drivers.postgresql_psycopg import PsycopgDriver
+from headlight.migrator import LoadedMigration, MigrateHooks, Migration, MigrationError, Migrator, _loaded_migrations
+from headlight.schema import types
+from headlight.schema.ops import Operation, RunSQLOp
+
+
+def test_registered() -> None:
+    assert drivers["postgresql+psycopg"] is PsycopgDriver
+
+
+def test_uses_postgresql_dialect() -> None:
+    driver = PsycopgDriver.dialect()
+
+    assert driver.placeholder_mark == "%s"
+    assert driver.get_sql_for_type(types.JSONType()) == "JSONB"
+
+
+class FakeCursor:
+    def __init__(self, bound: bool) -> None:
+        self.bound = bound
+        self.pgresult: object | None = None
+        self.executed: list[tuple[str, list[typing.Any]]] = []
+
+    def execute(self, stmt: str, params: list[typing.Any]) -> None:
+        self.executed.append((stmt, params))
+
+
+class FakePipeline:
+    # reads the results of the queued statements in order, like psycopg does on sync
+    def __init__(self, db: "PipelineDriver") -> None:
+        self.db = db
+
+    def sync(self) -> None:
+        for stmt, cursor in self.db.pipelined or []:
+            if cursor.pgresult is None:
+                if stmt == self.db.fail_on:
+                    self.db.conn.info.transaction_status = pq.TransactionStatus.INERROR
+                    raise errors.UndefinedTable(f"relation in {stmt} does not exist")
+                typing.cast(FakeCursor, cursor).pgresult = object()
+
+    def __enter__(self) -> "FakePipeline":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        if args[1] is None:
+            self.sync()
+
+
+class PipelineDriver(PsycopgDriver):
+    fail_on: str | None
+
+    def create_cursor(self, bound: bool = False) -> psycopg.Cursor[typing.Any]:
+        return typing.cast(psycopg.Cursor[typing.Any], FakeCursor(bound))
+
+
+@pytest.fixture
+def pipeline_driver(monkeypatch: pytest.MonkeyPatch) -> PipelineDriver:
+    monkeypatch.setattr(psycopg.Pipeline, "is_supported", classmethod(lambda cls: True))
+    db = PipelineDriver.dialect()
+    db.conn = mock.MagicMock()
+    db.conn.closed = False
+    db.conn.info.transaction_status = pq.TransactionStatus.IDLE
+    db.conn.pipeline.return_value = FakePipeline(db)
+    db.pipelined = None
+    db.active_pipeline = None
+    db.fail_on = None
+    return db
+
+
+def test_pipeline_queues_every_statement_on_its_own_cursor(pipeline_driver: PipelineDriver) -> None:
+    with pipeline_driver.pipeline():
+        pipeline_driver.execute("CREATE TABLE users (id INTEGER)")
+        pipeline_driver.execute_bound("INSERT INTO migrations (revision) VALUES (%s)", ["20220101_000000"])
+        assert pipeline_driver.in_pipeline()
+        assert pipeline_driver.rowcount == -1
+        pipelined = list(pipeline_driver.pipelined or [])
+
+    assert not pipeline_driver.in_pipeline()
+    cursors = [typing.cast(FakeCursor, cursor) for _, cursor in pipelined]
+    # migration SQL is bound on the client, the history update on the server
+    assert [cursor.bound for cursor in cursors] == [False, True]
+    assert cursors[0].executed == [("CREATE TABLE users (id INTEGER)", [])]
+    assert cursors[1].executed == [("INSERT INTO migrations (revision) VALUES (%s)", ["20220101_000000"])]
+
+
+def test_pipeline_error_names_failed_statement(pipeline_driver: PipelineDriver) -> None:
+    pipeline_driver.fail_on = "ALTER TABLE profiles ADD bio TEXT"
+
+    with pytest.raises(StatementError) as ex, pipeline_driver.pipeline():
+        pipeline_driver.execute("BEGIN")
+        pipeline_driver.execute("ALTER TABLE users ADD email TEXT")
+        pipeline_driver.execute("ALTER TABLE profiles ADD bio TEXT")
+        pipeline_driver.execute("ALTER TABLE posts ADD title TEXT")
+        pipeline_driver.sync_pipeline()
+
+    assert ex.value.stmt == "ALTER TABLE profiles ADD bio TEXT"
+    assert isinstance(ex.value.__cause__, errors.UndefinedTable)
+    # the implicit transaction of the pipeline is rolled back
+    pipeline_driver.conn.execute.assert_called_once_with("ROLLBACK")
+
+
+class MigrationHooks(MigrateHooks):
+    def __init__(self) -> None:
+        self.migrated: list[str] = []
+        self.statements: list[str] = []
+
+    def after_migrate(self, migration: Migration, time_taken: float) -> None:
+        self.migrated.append(migration.name)
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        self.statements.append(stmt)
+
+
+def test_pipelined_migration_error(
+    database_url: str, pipeline_driver: PipelineDriver, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    migrations = []
+    for revision, name, stmt in [
+        ("20220110_000000", "add_email", "ALTER TABLE users ADD email TEXT"),
+        ("20220110_000001", "add_bio", "ALTER TABLE profiles ADD bio TEXT"),
+    ]:
+        monkeypatch.setitem(_loaded_migrations, name, LoadedMigration(transactional=True, ops=[RunSQLOp(stmt, "")]))
+        migrations.append(Migration(name=name, file=f"{revision}_{name}.py", revision=revision, module=name))
+    migrator = Migrator(database_url, "migrations", single_transaction=True, migrations=migrations)
+    migrator.db = pipeline_driver
+    pipeline_driver.fail_on = "ALTER TABLE profiles ADD bio TEXT"
+    hooks = MigrationHooks()
+
+    with pytest.raises(MigrationError) as ex:
+        migrator.apply_migrations(migrations, fake=False, dry_run=False, hooks=hooks)
+
+    # the pipeline is synced after every migration, the error is raised while the failed one is current
+    assert ex.value.migration is migrations[1]
+    assert ex.value.stmt == "ALTER TABLE profiles ADD bio TEXT"
+    assert hooks.migrated == ["add_email"]
+    # queued statements have no timing of their own
+    assert hooks.statements == []
@@ -1,7 +1,16 @@
 from headlight import DbDriver
 from headlight.schema import types
 from headlight.schema.ops import AddColumnOp
-from headlight.schema.schema import CheckConstraint, Column, Default, ForeignKey, GeneratedAs, UniqueConstraint
+from headlight.schema.schema import (
+    CheckConstraint,
+    Column,
+    Default,
+    Expr,
+    ForeignKey,
+    GeneratedAs,
+    UniqueConstraint,
+    expr,
+)
 
 column = Column(
     name="email",
@@ -156,3 +165,24 @@ def test_op_quotes_empty_string(postgres: DbDriver) -> None:
     ).to_up_sql(postgres)
 
     assert sql == "ALTER TABLE users ADD email VARCHAR NOT NULL DEFAULT ''"
+
+
+def test_op_impact() -> None:
+    op = AddColumnOp(table_name="users", column=Column(name="email", type=types.TextType(), null=True))
+    assert op.get_impact().table_effect == "none"
+
+    op.check("email is not null")
+    assert op.get_impact().table_effect == "scan"
+
+    op.generated_as("lower(name)", stored=True)
+    assert op.get_impact().table_effect == "rewrite"
+
+
+def test_op_impact_of_volatile_default() -> None:
+    stable = Column(name="created", type=types.DateTimeType(), default=Default(expr.now()))
+    volatile = Column(name="token", type=types.UUIDType(), default=Default(Expr("gen_random_uuid()")))
+    serial = Column(name="seq", type=types.BigIntegerType(auto_increment=True))
+
+    assert AddColumnOp(table_name="users", column=stable).get_impact().table_effect == "none"
+    assert AddColumnOp(table_name="users", column=volatile).get_impact().table_effect == "rewrite"
+    assert AddColumnOp(table_name="users", column=serial).get_impact().table_effect == "rewrite"
@@ -1,7 +1,7 @@
 import pytest
 
-from headlight import CheckConstraint, DbDriver
-from headlight.schema.ops import AddTableConstraintOp, OperationError
+from headlight import CheckConstraint, DbDriver, ForeignKey, UniqueConstraint
+from headlight.schema.ops import AddTableConstraintOp, Impact, OperationError
 
 
 def test_op_forward(postgres: DbDriver) -> None:
@@ -34,3 +34,14 @@ def test_op_reverse_requires_constraint_name(postgres: DbDriver) -> None:
             only=True,
             if_table_exists=True,
         ).to_down_sql(postgres)
+
+
+def test_op_impact() -> None:
+    check = AddTableConstraintOp(constraint=CheckConstraint(expr="email is not null"), table_name="users")
+    not_valid = AddTableConstraintOp(constraint=ForeignKey(target_table="profiles"), table_name="users", not_valid=True)
+    unique = AddTableConstraintOp(constraint=UniqueConstraint(columns=["email"]), table_name="users", not_valid=True)
+
+    assert check.get_impact() == Impact(table_name="users", lock_level="ACCESS EXCLUSIVE", table_effect="scan")
+    assert not_valid.get_impact() == Impact(table_name="users", lock_level="SHARE ROW EXCLUSIVE", table_effect="none")
+    # NOT VALID does not apply to unique constraints, the index is built anyway
+    assert unique.get_impact().table_effect == "scan"
@@ -21,3 +21,10 @@ def test_op_reverse(postgres: DbDriver) -> None:
     sql = DropIndexOp(name="perf_idx", current_index=index).to_down_sql(postgres)
 
     assert sql == "CREATE INDEX perf_idx ON users (first_name)"
+
+
+def test_op_concurrently(postgres: DbDriver) -> None:
+    op = DropIndexOp(name="perf_idx", current_index=index, concurrently=True, if_exists=True)
+
+    assert op.to_up_sql(postgres) == "DROP INDEX CONCURRENTLY IF EXISTS perf_idx"
+    assert op.to_down_sql(postgres) == "CREATE INDEX CONCURRENTLY perf_idx ON users (first_name)"
@@ -0,0 +1,42 @@
+from headlight import DbDriver
+from headlight.schema.ops import BackfillOp
+
+
+def test_op_forward(postgres: DbDriver) -> None:
+    sql = BackfillOp(
+        table_name="users",
+        set_sql="email = lower(email)",
+        where="email LIKE '%A%'",
+        key="user_id",
+    ).to_up_sql(postgres)
+
+    # a description, the batches are generated when the migration runs
+    assert sql == (
+        "-- backfill users in batches of 1000 ordered by user_id: SET email = lower(email) WHERE email LIKE '%A%'"
+    )
+
+
+def test_op_batch(postgres: DbDriver) -> None:
+    sql = BackfillOp(
+        table_name="users",
+        set_sql="email = lower(email)",
+        where="email LIKE '%A%'",
+        key="user_id",
+    ).to_batch_sql(postgres)
+
+    assert sql == (
+        "UPDATE users SET email = lower(email) WHERE user_id IN (SELECT user_id FROM batch) AND (email LIKE '%%A%%')"
+    )
+
+
+def test_op_reverse(postgres: DbDriver) -> None:
+    sql = BackfillOp(table_name="users", set_sql="email = lower(email)").to_down_sql(postgres)
+
+    assert sql == "-- noop"
+
+
+def test_op_is_not_transactional() -> None:
+    op = BackfillOp(table_name="users", set_sql="email = lower(email)")
+
+    assert not op.transactional
+    assert op.name == "users: email = lower(email)"
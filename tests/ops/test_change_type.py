@@ -35,3 +35,15 @@ def test_op_reverse(postgres: DbDriver) -> None:
     ).to_down_sql(postgres)
 
     assert sql == "ALTER TABLE IF EXISTS ONLY users ALTER amount TYPE VARCHAR(512) COLLATE none USING amount::varchar"
+
+
+def test_op_impact() -> None:
+    widen = ChangeTypeOp("users", "name", new_type=types.VarCharType(200), current_type=types.VarCharType(100))
+    retype = ChangeTypeOp("users", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType())
+    using = ChangeTypeOp(
+        "users", "name", new_type=types.TextType(), current_type=types.VarCharType(100), using="lower(name)"
+    )
+
+    assert widen.get_impact().table_effect == "none"
+    assert retype.get_impact().table_effect == "rewrite"
+    assert using.get_impact().table_effect == "rewrite"
@@ -0,0 +1,91 @@
+from headlight import DbDriver
+from headlight.schema import types
+from headlight.schema.builder import Blueprint
+from headlight.schema.ops import CoalescedAlterTableOp, RunSQLOp, coalesce_ops
+
+
+def build_ops() -> Blueprint:
+    blueprint = Blueprint()
+    with blueprint.alter_table("users") as table:
+        table.add_column("email", types.TextType(), null=True)
+        table.alter_column("name").set_default("root", current_default=None).set_nullable(False)
+        table.alter_column("age").change_type(types.BigIntegerType(), current_type=types.IntegerType())
+    blueprint.run_sql("SELECT 1", "SELECT 2")
+    with blueprint.alter_table("profiles") as table:
+        table.alter_column("bio").set_nullable(True)
+    return blueprint
+
+
+def test_coalesce_ops() -> None:
+    ops = coalesce_ops(build_ops().get_ops())
+
+    assert len(ops) == 3
+    assert isinstance(ops[0], CoalescedAlterTableOp)
+    assert isinstance(ops[1], RunSQLOp)
+    assert not isinstance(ops[2], CoalescedAlterTableOp)
+
+
+def test_coalesced_op_forward(postgres: DbDriver) -> None:
+    op = coalesce_ops(build_ops().get_ops())[0]
+
+    assert op.to_up_sql(postgres) == (
+        "ALTER TABLE users ADD email TEXT, ALTER name SET DEFAULT 'root', ALTER name SET NOT NULL, "
+        "ALTER age TYPE BIGINT"
+    )
+
+
+def test_coalesced_op_reverse(postgres: DbDriver) -> None:
+    op = coalesce_ops(build_ops().get_ops())[0]
+
+    assert op.to_down_sql(postgres) == (
+        "ALTER TABLE users ALTER age TYPE INTEGER, ALTER name DROP NOT NULL, ALTER name DROP DEFAULT, "
+        "DROP IF EXISTS email"
+    )
+
+
+def test_coalesced_op_reverse_keeps_lenient_table(postgres: DbDriver) -> None:
+    blueprint = Blueprint()
+    with blueprint.alter_table("users") as table:
+        table.add_column("email", types.TextType(), null=True)
+        table.add_column("phone", types.TextType(), null=True)
+
+    op = coalesce_ops(blueprint.get_ops())[0]
+
+    assert op.to_down_sql(postgres) == "ALTER TABLE IF EXISTS users DROP IF EXISTS phone, DROP IF EXISTS email"
+
+
+def test_coalesced_op_splits_repeated_type_change(postgres: DbDriver) -> None:
+    blueprint = Blueprint()
+    with blueprint.alter_table("users") as table:
+        table.alter_column("age").change_type(types.BigIntegerType(), current_type=types.IntegerType())
+        table.alter_column("age").change_type(types.NumericType(), current_type=types.BigIntegerType())
+
+    op = coalesce_ops(blueprint.get_ops())[0]
+
+    assert op.to_up_sql(postgres) == (
+        "ALTER TABLE users ALTER age TYPE BIGINT;\n" "ALTER TABLE users ALTER age TYPE NUMERIC"
+    )
+
+
+def test_coalesce_keeps_online_not_null_steps_apart(postgres: DbDriver) -> None:
+    blueprint = Blueprint()
+    with blueprint.alter_table("users") as table:
+        table.alter_column("email").set_nullable(False, online=True)
+
+    stmts = [op.to_up_sql(postgres) for op in coalesce_ops(blueprint.get_ops())]
+
+    assert stmts == [
+        "ALTER TABLE users DROP CONSTRAINT IF EXISTS users_email_not_null, "
+        "ADD CONSTRAINT users_email_not_null CHECK (email IS NOT NULL) NOT VALID",
+        "ALTER TABLE users VALIDATE CONSTRAINT users_email_not_null",
+        "ALTER TABLE users ALTER email SET NOT NULL",
+        "ALTER TABLE users DROP CONSTRAINT users_email_not_null",
+    ]
+
+
+def test_coalesced_op_impact() -> None:
+    impact = coalesce_ops(build_ops().get_ops())[0].get_impact()
+
+    assert impact.table_name == "users"
+    assert impact.lock_level == "ACCESS EXCLUSIVE"
+    assert impact.table_effect == "rewrite"
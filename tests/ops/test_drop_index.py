@@ -1,5 +1,5 @@
 from headlight import DbDriver
-from headlight.schema.ops import CreateIndexOp
+from headlight.schema.ops import CreateIndexOp, Impact
 from headlight.schema.schema import Index, IndexExpr
 
 index = Index(
@@ -42,4 +42,11 @@ def test_op_forward(postgres: DbDriver) -> None:
 def test_op_reverse(postgres: DbDriver) -> None:
     sql = CreateIndexOp(index=index, concurrently=True, if_not_exists=True, only=True).to_down_sql(postgres)
 
-    assert sql == "DROP INDEX perf_idx"
+    assert sql == "DROP INDEX CONCURRENTLY perf_idx"
+
+
+def test_op_impact() -> None:
+    assert CreateIndexOp(index=index).get_impact() == Impact(
+        table_name="users", lock_level="SHARE", table_effect="scan"
+    )
+    assert CreateIndexOp(index=index, concurrently=True).get_impact().lock_level == "SHARE UPDATE EXCLUSIVE"
@@ -0,0 +1,35 @@
+from headlight import CheckConstraint, DbDriver
+from headlight.schema.ops import AddTableConstraintOp, DropTableConstraintOp, ValidateConstraintOp
+
+
+def test_op_forward(postgres: DbDriver) -> None:
+    sql = ValidateConstraintOp(constraint_name="email_check", table_name="users", only=True).to_up_sql(postgres)
+
+    assert sql == "ALTER TABLE ONLY users VALIDATE CONSTRAINT email_check"
+
+
+def test_op_reverse(postgres: DbDriver) -> None:
+    sql = ValidateConstraintOp(constraint_name="email_check", table_name="users").to_down_sql(postgres)
+
+    assert sql == "-- noop"
+
+
+def test_add_not_valid_constraint(postgres: DbDriver) -> None:
+    sql = AddTableConstraintOp(
+        constraint=CheckConstraint(expr="email is not null", name="email_check"),
+        table_name="users",
+        not_valid=True,
+    ).to_up_sql(postgres)
+
+    assert sql == "ALTER TABLE users ADD CONSTRAINT email_check CHECK (email is not null) NOT VALID"
+
+
+def test_restore_not_valid_constraint(postgres: DbDriver) -> None:
+    sql = DropTableConstraintOp(
+        constraint_name="email_check",
+        table_name="users",
+        current_constraint=CheckConstraint(expr="email is not null", name="email_check"),
+        current_not_valid=True,
+    ).to_down_sql(postgres)
+
+    assert sql == "ALTER TABLE users ADD CONSTRAINT email_check CHECK (email is not null) NOT VALID"
@@ -172,3 +172,38 @@ def test_drop_constraint() -> None:
             assert True
         case _:
             assert False
+
+
+def test_operation_lock_timeout() -> None:
+    builder = AlterTableBuilder(table_name="users")
+    op = builder.add_column("id", types.BigIntegerType).with_lock_timeout(2)
+
+    assert op.lock_timeout == 2
+
+
+def test_add_check_constraint_online() -> None:
+    builder = AlterTableBuilder(table_name="users")
+    builder.add_check_constraint("name", expr="expr", online=True)
+    match builder.ops:
+        case [
+            ops.AddTableConstraintOp(
+                constraint=CheckConstraint(name="name", expr="expr"), not_valid=True, drop_existing=True
+            ),
+            ops.ValidateConstraintOp(constraint_name="name", table_name="users", transactional=False),
+        ]:
+            assert True
+        case _:
+            assert False
+
+
+def test_add_foreign_key_online() -> None:
+    builder = AlterTableBuilder(table_name="users")
+    builder.add_foreign_key(name="fk", target_table="profiles", self_columns=["profile_id"], online=True)
+    match builder.ops:
+        case [
+            ops.AddTableConstraintOp(constraint=ForeignKey(name="fk"), not_valid=True, drop_existing=True),
+            ops.ValidateConstraintOp(constraint_name="fk", table_name="users"),
+        ]:
+            assert True
+        case _:
+            assert False
@@ -0,0 +1,41 @@
+from headlight.schema import ops, types
+from headlight.schema.builder import Blueprint
+from headlight.schema.schema import Index, IndexExpr
+
+
+def test_alter_table_lock_timeout() -> None:
+    blueprint = Blueprint()
+    with blueprint.alter_table("users", lock_timeout=5) as table:
+        table.add_column("email", types.TextType)
+        table.add_column("name", types.TextType).with_lock_timeout(1)
+
+    assert [op.lock_timeout for op in blueprint.get_ops()] == [5, 1]
+
+
+def test_create_index_concurrently() -> None:
+    blueprint = Blueprint()
+    blueprint.create_index("users", ["email"], unique=True, concurrently=True)
+
+    match blueprint.get_ops():
+        case [
+            ops.CreateIndexOp(
+                index=Index(name="users_email_idx", table_name="users", unique=True),
+                concurrently=True,
+                transactional=False,
+            )
+        ]:
+            assert True
+        case _:
+            assert False
+
+
+def test_drop_index_concurrently() -> None:
+    blueprint = Blueprint()
+    index = Index(name="users_email_idx", table_name="users", columns=[IndexExpr("email")])
+    blueprint.drop_index("users_email_idx", current_index=index, concurrently=True)
+
+    match blueprint.get_ops():
+        case [ops.DropIndexOp(name="users_email_idx", concurrently=True, transactional=False)]:
+            assert True
+        case _:
+            assert False
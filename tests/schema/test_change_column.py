@@ -1,6 +1,6 @@
 from headlight.schema import ops, types
 from headlight.schema.builder import ChangeColumn
-from headlight.schema.schema import Default
+from headlight.schema.schema import CheckConstraint, Default
 
 
 def test_set_null() -> None:
@@ -83,3 +83,37 @@ def test_change_type() -> None:
             assert True
         case _:
             assert False
+
+
+def test_set_not_null_online() -> None:
+    op_list: list[ops.Operation] = []
+    ChangeColumn(ops=op_list, table_name="users", column_name="email").set_nullable(False, online=True)
+    match op_list:
+        case [
+            ops.AddTableConstraintOp(
+                constraint=CheckConstraint(expr="email IS NOT NULL", name="users_email_not_null"),
+                not_valid=True,
+                drop_existing=True,
+            ),
+            ops.ValidateConstraintOp(constraint_name="users_email_not_null"),
+            ops.SetNotNullOp(column_name="email"),
+            ops.DropTableConstraintOp(constraint_name="users_email_not_null", current_not_valid=True),
+        ]:
+            assert True
+        case _:
+            assert False
+
+
+def test_set_not_null_online_name() -> None:
+    op_list: list[ops.Operation] = []
+    column_name = "a_rather_long_column_name_that_fills_the_identifier"
+    ChangeColumn(ops=op_list, table_name="public.users", column_name=column_name).set_nullable(False, online=True)
+
+    # the schema is not part of the name, which is cut at the length limit of identifiers
+    match op_list[1]:
+        case ops.ValidateConstraintOp(
+            table_name="public.users", constraint_name="users_a_rather_long_column_name_that_fills_the_identifier_not_n"
+        ):
+            assert True
+        case _:
+            assert False
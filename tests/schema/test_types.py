@@ -0,0 +1,33 @@
+import pytest
+
+from headlight.schema import types
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        (types.VarCharType(100), types.VarCharType(200), True),
+        (types.VarCharType(100), types.VarCharType(), True),
+        (types.VarCharType(200), types.VarCharType(100), False),
+        (types.VarCharType(100), types.TextType(), True),
+        (types.TextType(), types.VarCharType(), True),
+        (types.TextType(), types.VarCharType(100), False),
+        (types.IntegerType(), types.BigIntegerType(), False),
+        (types.IntegerType(), types.IntegerType(), True),
+        (types.NumericType(10, 2), types.NumericType(12, 2), True),
+        (types.NumericType(10, 2), types.NumericType(12, 4), False),
+        (types.NumericType(10, 2), types.NumericType(), True),
+        (types.DateTimeType(precision=3), types.DateTimeType(), True),
+        (types.DateTimeType(), types.DateTimeType(tz=True), False),
+        (types.ArrayType(types.VarCharType(10)), types.ArrayType(types.TextType()), True),
+    ],
+)
+def test_binary_coercible(old: types.Type, new: types.Type, expected: bool) -> None:
+    assert old.is_binary_coercible_to(new) is expected
+
+
+def test_volatile_sql() -> None:
+    assert types.is_volatile_sql("gen_random_uuid()")
+    assert types.is_volatile_sql("(RANDOM() * 100)::int")
+    assert not types.is_volatile_sql("now()")
+    assert not types.is_volatile_sql("CURRENT_TIMESTAMP")
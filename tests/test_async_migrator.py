@@ -0,0 +1,146 @@
+import pytest
+import typing
+from pathlib import Path
+
+from headlight.async_migrator import AsyncMigrator
+from headlight.drivers.base import AsyncDbDriver, TableStats
+from headlight.drivers.postgresql import PgDriver
+from headlight.migrator import LoadedMigration, MigrateHooks, Migration, MigrationError, _loaded_migrations
+from headlight.schema import types
+from headlight.schema.ops import ChangeTypeOp, Operation
+from headlight.tracing import Span, SpanExporter, Tracer
+from tests.utils import write_migration
+
+
+class RecordingDriver(AsyncDbDriver):
+    def __init__(self) -> None:
+        self.dialect = PgDriver.dialect()
+        self.statements: list[str] = []
+        self.closed = False
+
+    @classmethod
+    async def from_url(cls, url: str) -> "RecordingDriver":
+        return cls()
+
+    async def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> list[typing.Any]:
+        self.statements.append(stmt)
+        if "unnest" in stmt and params:
+            # an empty history, every revision is missing
+            return [(revision,) for revision in params[0]]
+        if "pg_attribute" in stmt:
+            # the history table is up to date
+            columns = self.dialect.get_history_stats_columns()
+            return [("revision",), ("name",), ("applied",), *((column.name,) for column in columns)]
+        return []
+
+    async def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        self.statements.append(stmt)
+        self.rowcount = 1
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_async_upgrade(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220105_000000_async_first.py")
+    db = RecordingDriver()
+
+    async with AsyncMigrator(db, str(tmp_path)) as migrator:
+        applied = await migrator.upgrade()
+
+    assert [migration.name for migration in applied] == ["async_first"]
+    assert db.statements == [
+        "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped",
+        "SELECT pending.revision FROM unnest(%s::text[]) AS pending (revision) "
+        "WHERE NOT EXISTS (SELECT 1 FROM migrations WHERE migrations.revision = pending.revision)",
+        "BEGIN",
+        "SELECT 1",
+        "INSERT INTO migrations (revision, name, applied, duration, lock_wait, statement_count, checksum, applied_by) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        "COMMIT",
+    ]
+    assert db.closed
+
+
+@pytest.mark.asyncio
+async def test_async_status(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220105_000100_async_status.py")
+    migrator = AsyncMigrator(RecordingDriver(), str(tmp_path))
+
+    statuses = await migrator.status()
+
+    assert [(status.name, status.applied) for status in statuses] == [("async_status", False)]
+
+
+class StatementHooks(MigrateHooks):
+    def __init__(self) -> None:
+        self.events: list[tuple[str, str, int | None]] = []
+
+    def before_statement(self, migration: Migration, op: Operation, stmt: str) -> None:
+        self.events.append(("before", stmt, None))
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        assert elapsed >= 0
+        self.events.append(("after", stmt, rowcount))
+
+
+@pytest.mark.asyncio
+async def test_async_statement_hooks(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220105_000200_async_hooks.py")
+    hooks = StatementHooks()
+
+    async with AsyncMigrator(RecordingDriver(), str(tmp_path)) as migrator:
+        await migrator.upgrade(hooks=hooks)
+
+    assert hooks.events == [("before", "SELECT 1", None), ("after", "SELECT 1", 1)]
+
+
+class ListExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+
+@pytest.mark.asyncio
+async def test_async_tracing(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220105_000300_async_traced.py")
+    exporter = ListExporter()
+
+    async with AsyncMigrator(RecordingDriver(), str(tmp_path), tracer=Tracer(exporter)) as migrator:
+        await migrator.upgrade()
+
+    assert sorted(span.name for span in exporter.spans) == [
+        "headlight.execute",
+        "headlight.migration",
+        "headlight.statement",
+        "headlight.upgrade",
+    ]
+
+
+class LargeTablesDriver(RecordingDriver):
+    async def get_table_stats(self, table_name: str) -> TableStats | None:
+        return TableStats(rows=1_000_000, pages=10_000)
+
+
+@pytest.mark.asyncio
+async def test_async_refuses_rewrites(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ops: list[Operation] = [
+        ChangeTypeOp("users", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType()),
+    ]
+    monkeypatch.setitem(_loaded_migrations, "async_rewrite", LoadedMigration(transactional=True, ops=ops))
+    migration = Migration(
+        name="async_rewrite", file="async_rewrite.py", revision="20220105_000400", module="async_rewrite"
+    )
+    db = LargeTablesDriver()
+    migrator = AsyncMigrator(
+        db, str(tmp_path), migrations=[migration], rewrite_threshold=1024 * 1024, refuse_rewrites=True
+    )
+
+    with pytest.raises(MigrationError, match='rewrites table "users"'):
+        await migrator.upgrade()
+
+    # nothing runs when a rewrite is refused
+    assert "BEGIN" not in db.statements
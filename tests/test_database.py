@@ -0,0 +1,76 @@
+import threading
+import typing
+from pathlib import Path
+
+from headlight.database import ConnectionPool
+from headlight.drivers.postgresql import PgDriver
+from headlight.migrator import Migrator
+
+
+def test_pool_reuses_released_connection(database_url: str) -> None:
+    pool = ConnectionPool()
+    db = pool.acquire(database_url)
+    pool.release(database_url, db)
+
+    assert pool.acquire(database_url) is db
+
+
+def test_pool_keeps_limited_number_of_idle_connections(database_url: str) -> None:
+    pool = ConnectionPool(max_idle=1)
+    first, second = pool.acquire(database_url), pool.acquire(database_url)
+    pool.release(database_url, first)
+    pool.release(database_url, second)
+
+    assert pool.acquire(database_url) is first
+    assert pool.acquire(database_url) is not second
+
+
+class StaleDriver(PgDriver):
+    closed = False
+
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        if stmt == "SELECT 1":
+            raise RuntimeError("server closed the connection unexpectedly")
+
+    def is_idle(self) -> bool:
+        # the client does not know the server has gone until the connection is used
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_pool_discards_dead_connection(database_url: str) -> None:
+    pool = ConnectionPool()
+    stale = StaleDriver.dialect()
+    pool.release(database_url, stale)
+
+    assert pool.acquire(database_url) is not stale
+    assert stale.closed
+
+
+def test_pool_is_thread_safe(database_url: str) -> None:
+    pool = ConnectionPool(max_idle=8)
+    borrowed = []
+
+    def borrow() -> None:
+        with pool.connection(database_url) as db:
+            borrowed.append(db)
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    distinct = {id(db) for db in borrowed}
+    assert len(borrowed) == 8
+    assert {id(pool.acquire(database_url)) for _ in distinct} == distinct
+
+
+def test_migrator_returns_connection_on_close(database_url: str, tmp_path: Path) -> None:
+    pool = ConnectionPool()
+    with Migrator(database_url, str(tmp_path), pool=pool) as migrator:
+        db = migrator.db
+
+    assert Migrator(database_url, str(tmp_path), pool=pool).db is db
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from headlight.metrics import Histogram, PrometheusHooks, format_labels
+from headlight.migrator import Migration
+from headlight.schema.ops import RunSQLOp
+
+migration = Migration(name="first", file="20220105_000000_first.py", revision="20220105_000000", module="first")
+
+
+def test_format_labels_escapes_values() -> None:
+    assert format_labels((("database", 'we"ird\\db'),), le="+Inf") == '{database="we\\"ird\\\\db",le="+Inf"}'
+    assert format_labels(()) == ""
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    histogram = Histogram("duration_seconds", "Duration.", buckets=[0.1, 1.0])
+    histogram.observe((), 0.05)
+    histogram.observe((), 0.5)
+    histogram.observe((), 5.0)
+
+    assert histogram.render_samples() == [
+        'duration_seconds_bucket{le="0.1"} 1',
+        'duration_seconds_bucket{le="1.0"} 2',
+        'duration_seconds_bucket{le="+Inf"} 3',
+        "duration_seconds_sum 5.55",
+        "duration_seconds_count 3",
+    ]
+
+
+def test_prometheus_hooks_write_textfile(tmp_path: Path) -> None:
+    path = tmp_path / "headlight.prom"
+    hooks = PrometheusHooks(str(path), "app")
+    hooks.on_lock_retry(migration, "ALTER TABLE users ADD email TEXT", 1, 2.0)
+    hooks.after_statement(migration, RunSQLOp("SELECT 1", "SELECT 2"), "SELECT 1", 0.2, 1)
+    hooks.after_migrate(migration, 2.5)
+    hooks.after_run()
+
+    text = path.read_text()
+    labels = 'database="app",revision="20220105_000000"'
+    assert f'headlight_migrations_total{{{labels},direction="upgrade"}} 1.0' in text
+    assert f"headlight_lock_wait_seconds_total{{{labels}}} 2.0" in text
+    assert f"headlight_statement_duration_seconds_count{{{labels}}} 1" in text
+    assert "# TYPE headlight_migration_duration_seconds histogram" in text
+    assert 'headlight_last_run_timestamp_seconds{database="app"}' in text
+    assert [p.name for p in tmp_path.iterdir()] == ["headlight.prom"]
@@ -0,0 +1,27 @@
+import sys
+import typing
+from pathlib import Path
+
+from headlight.migrator import Migration
+from tests.utils import write_migration
+
+
+def test_from_filename_does_not_import(tmp_path: Path) -> None:
+    path = write_migration(tmp_path, "20220101_000000_lazy_initial.py")
+    migration = Migration.from_filename(path)
+
+    assert migration.revision == "20220101_000000"
+    assert migration.name == "lazy_initial"
+    assert migration.file == "20220101_000000_lazy_initial.py"
+    assert migration.module not in sys.modules
+
+
+def test_loads_on_demand_and_memoizes(tmp_path: Path, monkeypatch: typing.Any) -> None:
+    monkeypatch.syspath_prepend(str(tmp_path))
+    path = write_migration(tmp_path, "20220101_000001_lazy_memo.py", transactional=False)
+    migration = Migration.from_filename(path)
+
+    assert len(migration.ops) == 1
+    assert migration.transactional is False
+    assert Migration.from_filename(path).ops is migration.ops
+    assert sys.modules[migration.module].loaded == 1  # type: ignore[attr-defined]
@@ -0,0 +1,568 @@
+import pytest
+import typing
+from pathlib import Path
+
+from headlight.drivers.base import TableStats
+from headlight.drivers.postgresql import PgDriver
+from headlight.migrator import (
+    BaseMigrator,
+    LoadedMigration,
+    MigrateHooks,
+    Migration,
+    MigrationError,
+    Migrator,
+    MultiMigrator,
+    RetryPolicy,
+    SchemaMigrator,
+    SchemaNotFoundError,
+    TenantMigrator,
+    _loaded_migrations,
+    find_migrations,
+    group_migrations,
+)
+from headlight.schema import types
+from headlight.schema.ops import BackfillOp, ChangeTypeOp, CreateIndexOp, Operation, RunSQLOp, ValidateConstraintOp
+from headlight.schema.schema import Index, IndexExpr
+from tests.utils import write_migration
+
+
+def test_group_migrations(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220102_000000_group_first.py")
+    write_migration(tmp_path, "20220102_000001_group_second.py")
+    write_migration(tmp_path, "20220102_000002_group_concurrent.py", transactional=False)
+    write_migration(tmp_path, "20220102_000003_group_third.py")
+
+    groups = group_migrations(find_migrations(str(tmp_path)), single_transaction=True)
+
+    assert [[migration.name for migration in group] for group in groups] == [
+        ["group_first", "group_second"],
+        ["group_concurrent"],
+        ["group_third"],
+    ]
+
+
+def test_group_migrations_without_single_transaction(tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220102_000100_separate_first.py")
+    write_migration(tmp_path, "20220102_000101_separate_second.py")
+
+    groups = group_migrations(find_migrations(str(tmp_path)), single_transaction=False)
+
+    assert len(groups) == 2
+
+
+def test_is_up_to_date_without_migrations(database_url: str, tmp_path: Path) -> None:
+    migrator = Migrator(database_url, str(tmp_path))
+
+    assert migrator.is_up_to_date()
+
+
+def test_retry_policy_delay() -> None:
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+
+    assert 0.5 <= policy.get_delay(1) <= 1
+    assert 1 <= policy.get_delay(2) <= 2
+    assert 2.5 <= policy.get_delay(10) <= 5
+
+
+def test_multi_migrator_shares_migrations(database_url: str, tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220103_000000_fleet_first.py")
+    write_migration(tmp_path, "20220103_000001_fleet_second.py")
+
+    multi_migrator = MultiMigrator([database_url, database_url, database_url], str(tmp_path), concurrency=2)
+    results = multi_migrator.run(lambda migrator: migrator.get_migrations())
+
+    assert [result.database_url for result in results] == [database_url] * 3
+    assert all(result.done and result.error is None for result in results)
+    assert results[0].result is results[1].result is results[2].result
+
+
+def test_multi_migrator_continue_on_error(database_url: str, tmp_path: Path) -> None:
+    def callback(migrator: Migrator) -> None:
+        raise ValueError("boom")
+
+    multi_migrator = MultiMigrator([database_url, database_url], str(tmp_path), fail_fast=False)
+    results = multi_migrator.run(callback)
+
+    assert [str(result.error) for result in results] == ["boom", "boom"]
+    assert not any(result.skipped for result in results)
+
+
+@pytest.mark.parametrize("concurrency", [0, 1])
+def test_multi_migrator_concurrency(database_url: str, tmp_path: Path, concurrency: int) -> None:
+    multi_migrator = MultiMigrator([database_url], str(tmp_path), concurrency=concurrency)
+
+    assert multi_migrator.run(lambda migrator: 1)[0].result == 1
+
+
+def test_schema_migrators_share_compiled_sql(database_url: str, tmp_path: Path) -> None:
+    write_migration(tmp_path, "20220104_000000_tenant_first.py")
+    compiled: dict = {}
+    first = SchemaMigrator(database_url, str(tmp_path), compiled=compiled)
+    second = SchemaMigrator(database_url, str(tmp_path), compiled=compiled)
+    migration = first.get_migrations()[0]
+
+    statements = first.compile_migration(migration)
+
+    assert second.compile_migration(migration) is statements
+    assert second.compile_migration(migration, upgrade=False) is not statements
+    assert len(compiled) == 2
+
+
+def test_tenant_migrator_schemas(database_url: str, tmp_path: Path) -> None:
+    tenant_migrator = TenantMigrator(database_url, str(tmp_path), schemas=["tenant_b", "tenant_a"])
+
+    assert tenant_migrator.get_schemas(Migrator(database_url, str(tmp_path)).db) == ["tenant_b", "tenant_a"]
+
+
+def test_tenant_migrator_closes_pool_on_failure(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    tenant_migrator = TenantMigrator(database_url, str(tmp_path), schemas=["tenant_a", "tenant_b", "tenant_c"])
+    created: list[SchemaMigrator] = []
+    closed: list[SchemaMigrator] = []
+    monkeypatch.setattr(SchemaMigrator, "close", lambda migrator: closed.append(migrator))
+
+    def create_migrator(*args: typing.Any) -> SchemaMigrator:
+        if created:
+            raise RuntimeError("too many connections")
+        created.append(SchemaMigrator(database_url, str(tmp_path)))
+        return created[-1]
+
+    monkeypatch.setattr(tenant_migrator, "create_migrator", create_migrator)
+    with pytest.raises(RuntimeError, match="too many connections"):
+        tenant_migrator.status()
+
+    assert closed == created
+
+
+class SchemasDriver(PgDriver):
+    schemas: list[str]
+    search_path: list[str]
+
+    def schema_exists(self, schema: str) -> bool:
+        return schema in self.schemas
+
+    def set_search_path(self, schemas: list[str]) -> None:
+        self.search_path = schemas
+
+
+def test_schema_migrator_uses_tenant_schema(database_url: str, tmp_path: Path) -> None:
+    migrator = SchemaMigrator(database_url, str(tmp_path), shared_schemas=["extensions"])
+    migrator.db = db = SchemasDriver.dialect()
+    db.schemas = ["tenant_a", "extensions"]
+
+    migrator.use_schema("tenant_a")
+
+    assert migrator.schema == "tenant_a"
+    assert db.search_path == ["tenant_a", "extensions"]
+
+
+def test_schema_migrator_missing_schema(database_url: str, tmp_path: Path) -> None:
+    migrator = SchemaMigrator(database_url, str(tmp_path))
+    migrator.db = db = SchemasDriver.dialect()
+    db.schemas = ["tenant_a"]
+    db.search_path = ["public"]
+
+    # the history table and the DDL would silently go to the next schema of the search path
+    with pytest.raises(SchemaNotFoundError, match='"tenant_b" does not exist'):
+        migrator.use_schema("tenant_b")
+
+    assert migrator.schema == "public"
+    assert db.search_path == ["public"]
+
+
+class RewriteHooks(MigrateHooks):
+    def __init__(self) -> None:
+        self.rewrites: list[str] = []
+
+    def on_table_rewrite(self, migration: Migration, op: Operation, stmt: str, stats: TableStats) -> None:
+        self.rewrites.append(stmt)
+
+
+class LargeTablesDriver(PgDriver):
+    def get_table_stats(self, table_name: str) -> TableStats | None:
+        return TableStats(rows=1_000_000, pages=10_000)
+
+
+@pytest.mark.parametrize("refuse_rewrites", [False, True])
+def test_check_rewrites(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, refuse_rewrites: bool
+) -> None:
+    ops: list[Operation] = [
+        ChangeTypeOp("users", "name", new_type=types.TextType(), current_type=types.VarCharType(100)),
+        ChangeTypeOp("users", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType()),
+    ]
+    monkeypatch.setitem(_loaded_migrations, "rewrite_users", LoadedMigration(transactional=True, ops=ops))
+    migration = Migration(
+        name="rewrite_users", file="rewrite_users.py", revision="20220107_000000", module="rewrite_users"
+    )
+    migrator = Migrator(database_url, str(tmp_path), rewrite_threshold=1024 * 1024, refuse_rewrites=refuse_rewrites)
+    migrator.db = LargeTablesDriver.dialect()
+    hooks = RewriteHooks()
+
+    if refuse_rewrites:
+        with pytest.raises(MigrationError, match='rewrites table "users"'):
+            migrator.check_rewrites([migration], hooks)
+    else:
+        migrator.check_rewrites([migration], hooks)
+
+    # changing VARCHAR to TEXT does not touch the rows
+    assert hooks.rewrites == ["ALTER TABLE users ALTER id TYPE BIGINT"]
+
+
+class RecordingDriver(PgDriver):
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.statements: list[str] = []
+        self.fail_on = fail_on
+
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[typing.Any]:
+        self.statements.append(stmt)
+        if "unnest" in stmt and params:
+            # an empty history, every revision is missing
+            return [(revision,) for revision in params[0]]
+        if stmt.startswith("WITH batch"):
+            # one batch of rows, then nothing is left
+            return [("10", 10)] if params and len(params) == 2 else [(None, 0)]
+        if "pg_attribute" in stmt:
+            # the history table is up to date
+            return [
+                ("revision",),
+                ("name",),
+                ("applied",),
+                *((column.name,) for column in self.get_history_stats_columns()),
+            ]
+        return []
+
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        self.statements.append(stmt)
+        if stmt == self.fail_on:
+            raise RuntimeError(f"{stmt} failed")
+        self.rowcount = 1
+
+
+def make_migration(monkeypatch: pytest.MonkeyPatch, name: str, revision: str, **options: typing.Any) -> Migration:
+    monkeypatch.setitem(_loaded_migrations, name, LoadedMigration(**options))
+    return Migration(name=name, file=f"{revision}_{name}.py", revision=revision, module=name)
+
+
+def test_lock_timeout_reset_after_failure(database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ops: list[Operation] = [RunSQLOp("VACUUM users", ""), RunSQLOp("VACUUM posts", "")]
+    migration = make_migration(monkeypatch, "vacuum", "20220108_000000", transactional=False, ops=ops, lock_timeout=1)
+    migrator = Migrator(database_url, str(tmp_path))
+    migrator.db = db = RecordingDriver(fail_on="VACUUM posts")
+
+    with pytest.raises(MigrationError, match="VACUUM posts failed"):
+        migrator.apply_migration(migration, fake=False, dry_run=False)
+
+    # outside a transaction the timeout is set for the session, it must not outlive the failed migration
+    assert [stmt for stmt in db.statements if "migrations_backfill" not in stmt] == [
+        "SET lock_timeout = 1000",
+        "VACUUM users",
+        "SET lock_timeout = 1000",
+        "VACUUM posts",
+        "RESET lock_timeout",
+    ]
+
+
+def test_commit_inside_migration_is_recorded(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first = make_migration(
+        monkeypatch,
+        "add_email",
+        "20220109_000000",
+        transactional=True,
+        ops=[RunSQLOp("ALTER TABLE users ADD email TEXT", "")],
+    )
+    second = make_migration(
+        monkeypatch,
+        "email_not_null",
+        "20220109_000001",
+        transactional=True,
+        ops=[
+            RunSQLOp("ALTER TABLE users ADD CONSTRAINT email_check CHECK (email IS NOT NULL) NOT VALID", ""),
+            ValidateConstraintOp("email_check", "users"),
+            RunSQLOp("ALTER TABLE users ALTER email SET NOT NULL", ""),
+        ],
+    )
+    migrator = Migrator(database_url, str(tmp_path), single_transaction=True, migrations=[first, second])
+    migrator.db = db = RecordingDriver(fail_on="ALTER TABLE users ALTER email SET NOT NULL")
+
+    # validation commits the transaction, so the migration does not share it with others
+    assert migrator.group_migrations([first, second]) == [[first], [second]]
+    with pytest.raises(MigrationError, match="SET NOT NULL failed") as ex:
+        migrator.upgrade()
+
+    assert ex.value.migration is second
+    insert = db.statements[5]
+    assert insert.startswith("INSERT INTO migrations")
+    save_progress = (
+        "INSERT INTO migrations_backfill (revision, name, position) VALUES (%s, %s, %s) "
+        "ON CONFLICT (revision, name) DO UPDATE SET position = EXCLUDED.position"
+    )
+    # the first migration is recorded in its own transaction, the failed one is not recorded at all,
+    # but the statements it has committed are, so that the next run does not repeat them
+    assert db.statements[3:] == [
+        "BEGIN",
+        "ALTER TABLE users ADD email TEXT",
+        insert,
+        "COMMIT",
+        "BEGIN",
+        db.statements[8],
+        "SELECT position FROM migrations_backfill WHERE revision = %s AND name = %s",
+        "ALTER TABLE users ADD CONSTRAINT email_check CHECK (email IS NOT NULL) NOT VALID",
+        save_progress,
+        "COMMIT",
+        "ALTER TABLE users VALIDATE CONSTRAINT email_check",
+        save_progress,
+        "BEGIN",
+        "ALTER TABLE users ALTER email SET NOT NULL",
+        "ROLLBACK",
+        "SELECT pg_advisory_unlock(%s)",
+    ]
+
+
+def test_backfill_position_cleared_with_history(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    op = BackfillOp("users", "email = lower(email)", name="lower_email")
+    migration = make_migration(
+        monkeypatch, "lower_email", "20220109_000100", transactional=True, ops=[op, RunSQLOp("ANALYZE users", "")]
+    )
+    migrator = Migrator(database_url, str(tmp_path), migrations=[migration])
+    migrator.db = db = RecordingDriver()
+
+    migrator.upgrade()
+
+    history = [stmt for stmt in db.statements if stmt.startswith("INSERT INTO migrations ")]
+    clear = "DELETE FROM migrations_backfill WHERE revision = %s AND name = %s"
+    # a failure after the backfill leaves the position behind, the next run resumes the backfill from it
+    assert db.statements.index(clear) == db.statements.index(history[0]) + 1
+    assert db.statements[-3:] == [clear, "COMMIT", "SELECT pg_advisory_unlock(%s)"]
+
+
+class NewDatabaseDriver(RecordingDriver):
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[typing.Any]:
+        if "pg_attribute" in stmt:
+            # the history table does not exist yet
+            self.statements.append(stmt)
+            return []
+        return super().fetch_all(stmt, params)
+
+
+def test_migrations_table_created_under_run_lock(database_url: str, tmp_path: Path) -> None:
+    migrator = Migrator(database_url, str(tmp_path))
+    migrator.db = db = RecordingDriver()
+    columns_query = db.get_column_names_query("migrations")[0]
+
+    # an up to date table is only read, starting does not lock it
+    migrator.ensure_migrations_table()
+    assert db.statements == [columns_query]
+
+    # concurrent starts on a new database create the table one at a time
+    migrator.db = db = NewDatabaseDriver()
+    migrator.ensure_migrations_table()
+    assert db.statements == [
+        columns_query,
+        "SELECT pg_advisory_lock(%s)",
+        columns_query,
+        "BEGIN",
+        db.get_migrations_table_sql("migrations"),
+        db.get_migrations_table_index_sql("migrations"),
+        columns_query,
+        db.get_migrations_table_upgrade_sql("migrations", set()),
+        "COMMIT",
+        "SELECT pg_advisory_unlock(%s)",
+    ]
+
+
+class OldHistoryDriver(RecordingDriver):
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[typing.Any]:
+        if "pg_attribute" in stmt:
+            # a history table created before the stats columns were added
+            self.statements.append(stmt)
+            return [("revision",), ("name",), ("applied",)]
+        return super().fetch_all(stmt, params)
+
+
+def test_upgrade_updates_old_history_table(database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    migration = make_migration(
+        monkeypatch, "analyze", "20220109_000200", transactional=True, ops=[RunSQLOp("ANALYZE users", "")]
+    )
+    # constructed directly, new() did not prepare the table
+    migrator = Migrator(database_url, str(tmp_path), migrations=[migration])
+    migrator.db = db = OldHistoryDriver()
+
+    migrator.upgrade()
+
+    alter = db.get_migrations_table_upgrade_sql("migrations", {"revision", "name", "applied"})
+    assert alter is not None
+    history = next(stmt for stmt in db.statements if stmt.startswith("INSERT INTO migrations "))
+    assert db.statements[0] == "SELECT pg_advisory_lock(%s)"
+    assert db.statements.index(alter) < db.statements.index(history)
+
+
+class StatementHooks(MigrateHooks):
+    def __init__(self) -> None:
+        self.events: list[tuple[str, str, int | None]] = []
+
+    def before_statement(self, migration: Migration, op: Operation, stmt: str) -> None:
+        self.events.append(("before", stmt, None))
+
+    def after_statement(self, migration: Migration, op: Operation, stmt: str, elapsed: float, rowcount: int) -> None:
+        assert elapsed >= 0
+        self.events.append(("after", stmt, rowcount))
+
+
+def test_statement_timings(database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ops: list[Operation] = [RunSQLOp("ANALYZE users", ""), RunSQLOp("ANALYZE posts", "")]
+    migration = make_migration(monkeypatch, "analyze", "20220109_000200", transactional=True, ops=ops)
+    migrator = Migrator(database_url, str(tmp_path), migrations=[migration], batch_size=10, statement_timings=True)
+    migrator.db = db = RecordingDriver()
+    hooks = StatementHooks()
+
+    migrator.upgrade(hooks=hooks)
+
+    # the batch size is ignored, a batch has a single elapsed time and row count for all its statements
+    assert "ANALYZE users" in db.statements
+    assert "ANALYZE posts" in db.statements
+    assert hooks.events == [
+        ("before", "ANALYZE users", None),
+        ("after", "ANALYZE users", 1),
+        ("before", "ANALYZE posts", None),
+        ("after", "ANALYZE posts", 1),
+    ]
+
+
+class ResumingDriver(RecordingDriver):
+    def fetch_all(self, stmt: str, params: list[typing.Any] | None = None) -> typing.Iterable[typing.Any]:
+        if stmt.startswith("SELECT position") and params and params[1] == "headlight:upgrade":
+            # a previous run has committed the first statement before it failed
+            self.statements.append(stmt)
+            return [("1",)]
+        return super().fetch_all(stmt, params)
+
+
+def test_failed_run_resumes_after_committed_statements(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ops: list[Operation] = [
+        RunSQLOp("ALTER TABLE users ADD email TEXT", ""),
+        BackfillOp("users", "email = lower(name)", name="lower_name"),
+        RunSQLOp("ANALYZE users", ""),
+    ]
+    migration = make_migration(monkeypatch, "add_email", "20220109_000400", transactional=True, ops=ops)
+    migrator = Migrator(database_url, str(tmp_path), migrations=[migration])
+    migrator.db = db = ResumingDriver()
+
+    migrator.upgrade()
+
+    assert "ALTER TABLE users ADD email TEXT" not in db.statements
+    assert "ANALYZE users" in db.statements
+    # the progress is cleared together with the backfill position once the migration is recorded
+    clear = "DELETE FROM migrations_backfill WHERE revision = %s AND name = %s"
+    assert db.statements[-4:] == [clear, clear, "COMMIT", "SELECT pg_advisory_unlock(%s)"]
+
+
+class DialectMigrator(BaseMigrator):
+    # the planning part of the migrator, no connection is needed
+    @property
+    def dialect(self) -> PgDriver:
+        return PgDriver.dialect()
+
+
+@pytest.mark.parametrize("transactional", [True, False])
+def test_plan_batches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, transactional: bool) -> None:
+    ops: list[Operation] = [RunSQLOp("ANALYZE users", ""), RunSQLOp("ANALYZE posts", ""), RunSQLOp("ANALYZE tags", "")]
+    migration = make_migration(monkeypatch, "analyze", "20220109_000300", transactional=True, ops=ops, lock_timeout=2)
+    migrator = DialectMigrator(str(tmp_path), batch_size=2, lock_retry=RetryPolicy())
+
+    batches = migrator.plan_batches(migration, migrator.compile_migration(migration), transactional=transactional)
+
+    if transactional:
+        # the timeout shares the round trip of the batch, a retry rolls back the whole transaction
+        assert [batch.get_sql() for batch in batches] == [
+            ["SET lock_timeout = 2000", "ANALYZE users", "ANALYZE posts"],
+            ["SET lock_timeout = 2000", "ANALYZE tags"],
+        ]
+        assert all(batch.transactional and not batch.setup for batch in batches)
+    else:
+        assert [batch.get_sql() for batch in batches] == [["ANALYZE users"], ["ANALYZE posts"], ["ANALYZE tags"]]
+        assert all(batch.setup == ["SET lock_timeout = 2000"] and not batch.transactional for batch in batches)
+
+
+def test_retry_delay(tmp_path: Path) -> None:
+    migrator = DialectMigrator(str(tmp_path), lock_retry=RetryPolicy(attempts=2, base_delay=1))
+
+    assert 0.5 <= typing.cast(float, migrator.get_retry_delay(1, True)) <= 1
+    assert migrator.get_retry_delay(2, False) is None
+    assert migrator.get_retry_delay(3, True) is None
+
+
+class LockedDriver(RecordingDriver):
+    def __init__(self, locked: str, failures: int) -> None:
+        super().__init__()
+        self.locked = locked
+        self.failures = failures
+
+    def execute(self, stmt: str, params: list[typing.Any] | None = None) -> None:
+        super().execute(stmt, params)
+        if stmt == self.locked and self.failures:
+            self.failures -= 1
+            raise RuntimeError(f"{stmt} timed out")
+
+    def is_lock_timeout(self, exc: Exception) -> bool:
+        return True
+
+
+class RetryHooks(MigrateHooks):
+    def __init__(self) -> None:
+        self.retries: list[tuple[str, int]] = []
+
+    def on_lock_retry(self, migration: Migration, stmt: str, attempt: int, lock_wait: float) -> None:
+        self.retries.append((stmt, attempt))
+
+
+def test_lock_retry_restarts_transaction(database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ops: list[Operation] = [
+        RunSQLOp("ALTER TABLE users ADD email TEXT", ""),
+        RunSQLOp("ALTER TABLE posts ADD x INT", ""),
+    ]
+    migration = make_migration(monkeypatch, "add_columns", "20220109_000500", transactional=True, ops=ops)
+    migrator = Migrator(database_url, str(tmp_path), lock_retry=RetryPolicy(attempts=2, base_delay=0))
+    migrator.db = db = LockedDriver(locked="ALTER TABLE posts ADD x INT", failures=1)
+    hooks = RetryHooks()
+
+    migrator.apply_migration(migration, fake=False, dry_run=False, hooks=hooks)
+
+    # the locks taken by the statements before are released while waiting, the attempt starts over
+    insert = db.statements[-2]
+    assert db.statements == [
+        "BEGIN",
+        "ALTER TABLE users ADD email TEXT",
+        "ALTER TABLE posts ADD x INT",
+        "ROLLBACK",
+        "BEGIN",
+        "ALTER TABLE users ADD email TEXT",
+        "ALTER TABLE posts ADD x INT",
+        insert,
+        "COMMIT",
+    ]
+    assert insert.startswith("INSERT INTO migrations ")
+    assert hooks.retries == [("ALTER TABLE posts ADD x INT", 1)]
+
+
+def test_invalid_index_dropped_before_concurrent_build(
+    database_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index = Index(name="users_email_idx", table_name="users", columns=IndexExpr.from_specs(["email"]))
+    ops: list[Operation] = [CreateIndexOp(index=index, concurrently=True, if_not_exists=True)]
+    migration = make_migration(monkeypatch, "index_email", "20220109_000600", transactional=True, ops=ops)
+    migrator = Migrator(database_url, str(tmp_path))
+    migrator.db = db = RecordingDriver()
+
+    migrator.apply_migration(migration, fake=False, dry_run=False)
+
+    # a build killed by an earlier run is not taken for a finished index
+    check = db.statements.index("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)")
+    assert db.statements[check + 1] == "CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_idx ON users (email)"
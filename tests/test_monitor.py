@@ -0,0 +1,159 @@
+import threading
+
+from headlight.drivers.base import BlockingSession, LockWait, Progress
+from headlight.drivers.postgresql import PgDriver
+from headlight.monitor import LockWatchdog, LockWatchdogPolicy, ProgressMonitor
+
+
+class ProgressDriver(PgDriver):
+    progress: list[Progress]
+
+    def get_progress(self, pid: int) -> Progress | None:
+        return self.progress.pop(0) if self.progress else None
+
+
+def index_progress(blocks_done: int, phase: str = "building index: scanning table") -> Progress:
+    return Progress(
+        state="active",
+        wait_event=None,
+        elapsed=10.0,
+        command="CREATE INDEX CONCURRENTLY",
+        phase=phase,
+        blocks_done=blocks_done,
+        blocks_total=1000,
+    )
+
+
+def test_progress_fraction() -> None:
+    assert index_progress(250).fraction == 0.25
+    assert Progress(state="active", wait_event=None, elapsed=1.0, tuples_done=5, tuples_total=10).fraction == 0.5
+    assert Progress(state="active", wait_event="Lock:relation", elapsed=1.0).fraction is None
+
+
+def test_monitor_estimates_eta_per_phase() -> None:
+    monitor = ProgressMonitor(PgDriver.dialect(), 42, lambda progress: None)
+
+    assert monitor.estimate_eta(index_progress(100), now=0.0) is None
+    assert monitor.estimate_eta(index_progress(300), now=10.0) == 35.0
+    # a new phase starts measuring the rate again
+    assert monitor.estimate_eta(index_progress(100, phase="building index: loading tuples in tree"), now=20.0) is None
+
+
+def test_monitor_reports_active_backend_only() -> None:
+    db = ProgressDriver.dialect()
+    db.progress = [Progress(state="idle in transaction", wait_event=None, elapsed=0.0), index_progress(100)]
+    reported: list[Progress] = []
+    done = threading.Event()
+
+    def callback(progress: Progress) -> None:
+        reported.append(progress)
+        done.set()
+
+    with ProgressMonitor(db, 42, callback, interval=0.01):
+        assert done.wait(5)
+
+    assert reported == [index_progress(100)]
+
+
+class FlakyDriver(ProgressDriver):
+    def get_progress(self, pid: int) -> Progress | None:
+        if self.progress and self.progress[0].state is None:
+            self.progress.pop(0)
+            raise ConnectionError("server closed the connection unexpectedly")
+        return super().get_progress(pid)
+
+
+def test_monitor_keeps_polling_after_error() -> None:
+    db = FlakyDriver.dialect()
+    failed = Progress(state=None, wait_event=None, elapsed=0.0)
+    db.progress = [failed, failed, index_progress(100)]
+    errors: list[Exception] = []
+    reported: list[Progress] = []
+    done = threading.Event()
+
+    def callback(progress: Progress) -> None:
+        reported.append(progress)
+        done.set()
+
+    with ProgressMonitor(db, 42, callback, interval=0.01, on_error=errors.append):
+        assert done.wait(5)
+
+    assert reported == [index_progress(100)]
+    # consecutive failures are reported once
+    assert [str(error) for error in errors] == ["server closed the connection unexpectedly"]
+
+
+class BlockedDriver(PgDriver):
+    blockers: list[BlockingSession]
+    cancelled: list[int]
+    terminated: list[int]
+
+    def get_blocking_sessions(self, pid: int) -> list[BlockingSession]:
+        return self.blockers
+
+    def get_waiting_sessions(self, pid: int) -> list[BlockingSession]:
+        return [session(300, "active")]
+
+    def get_awaited_lock(self, pid: int) -> str | None:
+        return "AccessExclusiveLock on users"
+
+    def cancel_backend(self, pid: int) -> bool:
+        self.cancelled.append(pid)
+        return True
+
+    def terminate_backend(self, pid: int) -> bool:
+        self.terminated.append(pid)
+        return True
+
+
+def session(pid: int, state: str) -> BlockingSession:
+    return BlockingSession(pid, state, "app", "psql", 60.0, 30.0, "UPDATE users SET name = 'x'")
+
+
+def create_blocked_driver(*blockers: BlockingSession) -> BlockedDriver:
+    db = BlockedDriver.dialect()
+    db.blockers = list(blockers)
+    db.cancelled = []
+    db.terminated = []
+    return db
+
+
+def test_lock_watchdog_reports_blockers_and_waiters() -> None:
+    db = create_blocked_driver(session(100, "active"))
+    reported: list[LockWait] = []
+    watchdog = LockWatchdog(db, 42, reported.append, LockWatchdogPolicy(report_after=1.0))
+
+    lock_wait = watchdog.poll(now=10.0)
+    assert lock_wait
+    assert lock_wait.waited == 0.0
+    assert lock_wait.lock == "AccessExclusiveLock on users"
+    assert [blocker.pid for blocker in lock_wait.blockers] == [100]
+    assert [waiter.pid for waiter in lock_wait.waiters] == [300]
+
+    lock_wait = watchdog.poll(now=12.5)
+    assert lock_wait and lock_wait.waited == 2.5
+
+    db.blockers = []
+    assert watchdog.poll(now=13.0) is None
+
+
+def test_lock_watchdog_terminates_idle_blockers() -> None:
+    db = create_blocked_driver(session(100, "active"), session(200, "idle in transaction"))
+    watchdog = LockWatchdog(db, 42, lambda lock_wait: None, LockWatchdogPolicy(terminate_idle_blockers_after=5.0))
+    lock_wait = LockWait(lock=None, waited=1.0, blockers=db.blockers, waiters=[])
+
+    assert watchdog.apply_policy(lock_wait) is None
+    lock_wait.waited = 5.0
+    assert watchdog.apply_policy(lock_wait) == "terminated idle in transaction session(s) 200"
+    assert watchdog.apply_policy(lock_wait) is None
+    assert db.terminated == [200]
+    assert db.cancelled == []
+
+
+def test_lock_watchdog_aborts_migration() -> None:
+    db = create_blocked_driver(session(100, "active"))
+    watchdog = LockWatchdog(db, 42, lambda lock_wait: None, LockWatchdogPolicy(abort_after=10.0))
+
+    assert watchdog.apply_policy(LockWait(lock=None, waited=10.0, blockers=db.blockers, waiters=[]))
+    assert watchdog.aborted
+    assert db.cancelled == [42]
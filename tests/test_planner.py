@@ -0,0 +1,87 @@
+import pytest
+from pathlib import Path
+
+from headlight.drivers.base import TableStats
+from headlight.drivers.postgresql import PgDriver
+from headlight.migrator import LoadedMigration, Migration, Migrator, _loaded_migrations
+from headlight.planner import Planner
+from headlight.schema import types
+from headlight.schema.ops import ChangeTypeOp, CreateIndexOp, CreateTableOp, RunSQLOp, SetNotNullOp
+from headlight.schema.schema import Column, Index, IndexExpr, Table
+
+GB = 1024 * 1024 * 1024
+
+
+class StatsDriver(PgDriver):
+    stats: dict[str, TableStats]
+
+    def get_table_stats(self, table_name: str) -> TableStats | None:
+        return self.stats.get(table_name)
+
+
+@pytest.fixture
+def planner(database_url: str, tmp_path: Path) -> Planner:
+    migrator = Migrator(database_url, str(tmp_path), lock_timeout=2)
+    db = StatsDriver.dialect()
+    db.stats = {
+        "users": TableStats(rows=10_000_000, pages=GB // 8192),
+        "tags": TableStats(rows=100, pages=1),
+    }
+    migrator.db = db
+    return Planner(migrator)
+
+
+def create_migration(monkeypatch: pytest.MonkeyPatch, module: str, loaded: LoadedMigration) -> Migration:
+    monkeypatch.setitem(_loaded_migrations, module, loaded)
+    return Migration(name=module, file=f"{module}.py", revision="20220106_000000", module=module)
+
+
+def test_planner_estimates_statements(planner: Planner, monkeypatch: pytest.MonkeyPatch) -> None:
+    users_email = Index(name="users_email_idx", table_name="users", columns=[IndexExpr(column="email")])
+    migration = create_migration(
+        monkeypatch,
+        "plan_statements",
+        LoadedMigration(
+            transactional=True,
+            ops=[
+                ChangeTypeOp("users", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType()),
+                CreateIndexOp(users_email, concurrently=True),
+                SetNotNullOp("tags", "name"),
+                RunSQLOp("UPDATE users SET name = lower(name)", "SELECT 1"),
+            ],
+        ),
+    )
+
+    rewrite, index, not_null, raw_sql = planner.plan_migration(migration)
+
+    assert rewrite.impact.table_effect == "rewrite"
+    assert rewrite.estimate == pytest.approx(GB / planner.rewrite_rate)
+    assert rewrite.risk == "high"
+    assert rewrite.lock_timeout == 2
+    assert index.risk == "low"  # the table stays writable during a concurrent build
+    assert not_null.risk == "low"
+    assert raw_sql.risk == "unknown"
+
+
+def test_planner_treats_created_tables_as_empty(planner: Planner, monkeypatch: pytest.MonkeyPatch) -> None:
+    table = Table(name="posts", columns=[Column(name="id", type=types.IntegerType())])
+    migration = create_migration(
+        monkeypatch,
+        "plan_created_table",
+        LoadedMigration(
+            transactional=True,
+            ops=[
+                CreateTableOp(table),
+                ChangeTypeOp("posts", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType()),
+                ChangeTypeOp("missing", "id", new_type=types.BigIntegerType(), current_type=types.IntegerType()),
+            ],
+        ),
+    )
+
+    create, change, unknown = planner.plan_migration(migration)
+
+    assert create.risk == "none"
+    assert change.estimate == 0
+    assert change.risk == "low"
+    assert unknown.stats is None
+    assert unknown.risk == "unknown"
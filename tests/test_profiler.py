@@ -0,0 +1,42 @@
+import json
+import pstats
+import tracemalloc
+from pathlib import Path
+
+from headlight.migrator import Migration
+from headlight.profiler import PHASES, Profiler
+
+migration = Migration(name="first", file="20220105_000000_first.py", revision="20220105_000000", module="first")
+
+
+def test_profiler_records_phases() -> None:
+    profiler = Profiler()
+    with profiler.phase(migration, "compile"):
+        pass
+    profiler.add(migration, "execute", 1.5)
+    profiler.add(migration, "execute", 0.5)
+
+    profile = profiler.profiles[migration.revision]
+    assert set(profile.phases) == {"compile", "execute"}
+    assert profile.phases["execute"] == 2.0
+    assert profile.memory_peak == {}
+    assert list(profiler.get_totals()) == PHASES
+
+
+def test_profiler_writes_report(tmp_path: Path) -> None:
+    report_path = str(tmp_path / "profile.json")
+    profiler = Profiler(report_path, python=True)
+    with profiler.phase(migration, "build"):
+        [str(i) for i in range(1000)]
+    with profiler.phase(migration, "execute"):
+        pass
+
+    assert tracemalloc.is_tracing()
+    assert profiler.write_report() == report_path
+    assert not tracemalloc.is_tracing()
+
+    report = json.loads(Path(report_path).read_text())
+    assert report["pstats"] == report_path + ".pstats"
+    assert report["migrations"][0]["revision"] == migration.revision
+    assert set(report["migrations"][0]["memory_peak"]) == {"build"}
+    assert pstats.Stats(report["pstats"]).get_stats_profile().func_profiles
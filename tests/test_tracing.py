@@ -0,0 +1,70 @@
+import json
+import pytest
+from pathlib import Path
+
+from headlight.tracing import JsonLinesExporter, Span, SpanExporter, Tracer, to_otlp_value
+
+
+class ListExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.exported: list[list[Span]] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.exported.append(spans)
+
+
+def test_tracer_nests_spans_and_exports_on_root_end() -> None:
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.span("headlight.upgrade") as run:
+        with tracer.span("headlight.migration", {"headlight.revision": "0001"}) as migration:
+            with tracer.span("headlight.statement") as statement:
+                pass
+        assert exporter.exported == []
+
+    [spans] = exporter.exported
+    assert [span.name for span in spans] == ["headlight.statement", "headlight.migration", "headlight.upgrade"]
+    assert statement.parent_id == migration.span_id
+    assert migration.parent_id == run.span_id
+    assert run.parent_id is None
+    assert {span.trace_id for span in spans} == {run.trace_id}
+
+
+def test_tracer_records_errors() -> None:
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+
+    with pytest.raises(ValueError):
+        with tracer.span("headlight.migration"):
+            raise ValueError("boom")
+
+    assert exporter.exported[0][0].error == "boom"
+
+
+def test_to_otlp_value() -> None:
+    assert to_otlp_value(True) == {"boolValue": True}
+    assert to_otlp_value(10) == {"intValue": "10"}
+    assert to_otlp_value(1.5) == {"doubleValue": 1.5}
+    assert to_otlp_value("sql") == {"stringValue": "sql"}
+
+
+def test_json_lines_exporter(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(JsonLinesExporter(str(path)))
+
+    for _ in range(2):
+        with tracer.span("headlight.upgrade"):
+            with tracer.span("headlight.migration", {"headlight.revision": "0001"}):
+                pass
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    [resource_spans] = lines[0]["resourceSpans"]
+    [scope_spans] = resource_spans["scopeSpans"]
+    migration, run = scope_spans["spans"]
+    assert migration["parentSpanId"] == run["spanId"]
+    assert "parentSpanId" not in run
+    assert migration["attributes"] == [{"key": "headlight.revision", "value": {"stringValue": "0001"}}]
+    assert run["status"] == {"code": 1}
+    assert int(run["endTimeUnixNano"]) >= int(run["startTimeUnixNano"])
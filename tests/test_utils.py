@@ -0,0 +1,9 @@
+from headlight.utils import chunked
+
+
+def test_chunked() -> None:
+    assert list(chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+
+def test_chunked_without_size() -> None:
+    assert list(chunked([1, 2, 3], 0)) == [[1, 2, 3]]
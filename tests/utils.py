@@ -0,0 +1,15 @@
+from pathlib import Path
+
+
+def write_migration(directory: Path, filename: str, transactional: bool = True) -> str:
+    path = directory / filename
+    path.write_text(
+        "from headlight import Blueprint\n"
+        f"transactional = {transactional}\n"
+        "loaded = 0\n"
+        "def migrate(schema: Blueprint) -> None:\n"
+        "    global loaded\n"
+        "    loaded += 1\n"
+        "    schema.run_sql('SELECT 1', 'SELECT 2')\n"
+    )
+    return str(path)